@@ -0,0 +1,77 @@
+"""
+Shared helpers for the benchmark scripts
+Latency percentiles, result files and comparison with a previous run
+"""
+
+import os
+import json
+import subprocess
+from datetime import datetime
+from src.instrumentation import percentile
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+
+def summarize_latencies(seconds):
+    """p50/p95/p99/mean/max of latencies given in seconds, reported in milliseconds."""
+    if not seconds:
+        return {"count": 0}
+    return {
+        "count": len(seconds),
+        "p50_ms": round(percentile(seconds, 50) * 1000, 3),
+        "p95_ms": round(percentile(seconds, 95) * 1000, 3),
+        "p99_ms": round(percentile(seconds, 99) * 1000, 3),
+        "mean_ms": round(sum(seconds) / len(seconds) * 1000, 3),
+        "max_ms": round(max(seconds) * 1000, 3)
+    }
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def save_results(name, results, results_dir=RESULTS_DIR):
+    """Save a run as results/<name>-<revision>-<timestamp>.json and return the path."""
+    os.makedirs(results_dir, exist_ok=True)
+    results = {
+        "benchmark": name,
+        "revision": git_revision(),
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        **results
+    }
+    path = os.path.join(results_dir, f"{name}-{results['revision']}-{datetime.now():%Y%m%d-%H%M%S}.json")
+    with open(path, "w", encoding="utf-8") as file:
+        json.dump(results, file, indent=2)
+    print(f"[OK] Results saved to {path}")
+    return path
+
+
+def _flatten(results, prefix=""):
+    flat = {}
+    for key, value in results.items():
+        if isinstance(value, dict):
+            flat.update(_flatten(value, f"{prefix}{key}."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[f"{prefix}{key}"] = value
+    return flat
+
+
+def compare_results(current, baseline_path):
+    """Print every numeric metric of the current run next to a saved baseline run."""
+    with open(baseline_path, "r", encoding="utf-8") as file:
+        baseline = json.load(file)
+    current_metrics, baseline_metrics = _flatten(current), _flatten(baseline)
+
+    print(f"\nComparison with {os.path.basename(baseline_path)} (revision {baseline.get('revision')})")
+    print(f"{'metric':<45} {'baseline':>14} {'current':>14} {'change':>9}")
+    for metric, value in current_metrics.items():
+        if metric.startswith("config.") or metric not in baseline_metrics:
+            continue
+        old = baseline_metrics[metric]
+        change = f"{(value - old) / old * 100:+.1f}%" if old else "n/a"
+        print(f"{metric:<45} {old:>14.3f} {value:>14.3f} {change:>9}")
@@ -0,0 +1,406 @@
+"""
+Outreach pipeline benchmark
+Runs N synthetic leads through OutReachAutomation with every external provider
+(LLM, Serper search and news, website scraping, YouTube, RAG, CRM, Gmail) replaced
+by deterministic local fakes, and reports throughput, per-node latency percentiles,
+peak memory and CPU time, so regressions in graph and state handling show up offline
+
+Fake providers sleep for a latency drawn from a log-normal distribution (median ms and
+sigma, scaled by --time-scale) and return payloads of configurable size. Everything is
+seeded: the same arguments produce the same calls, payloads and qualification decisions.
+
+Run with: python -m benchmarks.pipeline_benchmark --leads 50
+"""
+
+import io
+import os
+import math
+import time
+import zlib
+import random
+import resource
+import argparse
+import tempfile
+import threading
+import functools
+import tracemalloc
+import contextlib
+from collections import Counter, defaultdict
+from benchmarks.common import summarize_latencies, save_results, compare_results
+
+# Median latency (ms) and log-normal sigma of each fake provider
+DEFAULT_LATENCIES = "llm=1200:0.5,search=350:0.4,news=450:0.4,scrape=600:0.6,youtube=400:0.4,rag=40:0.3,crm=150:0.3"
+
+WORDS = (
+    "growth marketing automation content strategy audience engagement campaign analytics "
+    "conversion brand pipeline revenue platform customers insights workflow personalization "
+    "social video blog launch funding hiring expansion product team market channel data"
+).split()
+
+
+def parse_latencies(spec):
+    """'llm=1200:0.5,search=350:0.4' -> {'llm': (1200.0, 0.5), 'search': (350.0, 0.4)}"""
+    latencies = {}
+    for item in spec.split(","):
+        name, value = item.split("=")
+        median, _, sigma = value.partition(":")
+        latencies[name.strip()] = (float(median), float(sigma or 0))
+    return latencies
+
+
+class FakeProviders:
+    """
+    Deterministic stand-ins for the pipeline's external calls.
+
+    Each call gets its own random generator seeded from the run seed, the provider
+    and the call input, so latencies and payloads do not depend on thread scheduling.
+    Simulated latency and call counts are recorded per provider.
+
+    Args:
+        latencies: Provider -> (median ms, sigma)
+        time_scale: Multiplier applied to every simulated latency (0 disables sleeping)
+        llm_words: Words in a generated LLM answer
+        page_kb: Size of a scraped page in KB
+        search_results: Organic results per search query
+        news_items: News items per company
+        qualified_ratio: Share of leads scored as qualified
+        seed: Run seed
+    """
+
+    def __init__(self, latencies, time_scale, llm_words, page_kb, search_results,
+                 news_items, qualified_ratio, seed):
+        from src.prompts import SCORE_LEAD_PROMPT
+
+        self.latencies = latencies
+        self.time_scale = time_scale
+        self.llm_words = llm_words
+        self.page_kb = page_kb
+        self.search_results = search_results
+        self.news_items = news_items
+        self.qualified_ratio = qualified_ratio
+        self.seed = seed
+        self.score_prompt = SCORE_LEAD_PROMPT
+        self.calls = Counter()
+        self.simulated = defaultdict(list)
+        self._lock = threading.Lock()
+
+        # Payload text is sliced from one pre-generated corpus, so building
+        # responses costs next to nothing compared to the pipeline itself
+        rng = random.Random(seed)
+        corpus_words = max(llm_words, page_kb * 200) * 2
+        self.corpus = " ".join(rng.choice(WORDS) for _ in range(corpus_words))
+
+    def _call(self, provider, key):
+        """Record and simulate one provider call, return its random generator."""
+        rng = random.Random(zlib.crc32(f"{self.seed}|{provider}|{key}".encode()))
+        median, sigma = self.latencies.get(provider, (0.0, 0.0))
+        latency = rng.lognormvariate(math.log(median), sigma) / 1000 if median > 0 else 0.0
+        with self._lock:
+            self.calls[provider] += 1
+            self.simulated[provider].append(latency)
+        if latency and self.time_scale:
+            time.sleep(latency * self.time_scale)
+        return rng
+
+    def _text(self, rng, chars):
+        start = rng.randrange(max(1, len(self.corpus) - chars))
+        return self.corpus[start:start + chars]
+
+    def invoke_llm(self, system_prompt, user_message, model=None, llm_provider=None, response_format=None):
+        from src.structured_outputs import WebsiteData, EmailResponse
+
+        rng = self._call("llm", f"{system_prompt[:200]}|{user_message}")
+        answer = self._text(rng, self.llm_words * 6)
+        if system_prompt == self.score_prompt:
+            score = 8.5 if rng.random() < self.qualified_ratio else 4.0
+            return f"**Final Score: {score}**"
+        if response_format is WebsiteData:
+            slug = rng.randrange(10 ** 6)
+            return WebsiteData(
+                summary=answer,
+                blog_url=f"https://blog.example.com/{slug}",
+                youtube=f"https://www.youtube.com/@company{slug}",
+                twitter=f"https://twitter.com/company{slug}",
+                facebook=f"https://facebook.com/company{slug}"
+            )
+        if response_format is EmailResponse:
+            return EmailResponse(subject=self._text(rng, 60), email=answer)
+        return answer
+
+    def google_search(self, query):
+        rng = self._call("search", query)
+        # The lead's email domain is in the query, return its website and LinkedIn page
+        # like real results would, so the website and company research paths run
+        domain = next((word for word in query.replace('"', "").split() if "." in word), "example.com")
+        name = domain.split(".")[0]
+        results = [
+            {"title": f"{name} | LinkedIn", "snippet": self._text(rng, 160),
+             "link": f"https://www.linkedin.com/company/{name}"},
+            {"title": f"About {name}", "snippet": self._text(rng, 160), "link": f"https://{domain}/about"}
+        ]
+        results += [
+            {"title": self._text(rng, 50), "snippet": self._text(rng, 160), "link": f"https://news.example.com/{i}"}
+            for i in range(max(0, self.search_results - len(results)))
+        ]
+        return results[:self.search_results]
+
+    def get_recent_news(self, company):
+        rng = self._call("news", company)
+        return "".join(
+            f"Title: {self._text(rng, 60)}\nSnippet: {self._text(rng, 160)}\nDate: {i + 1} days ago\n"
+            f"URL: https://news.example.com/{company}/{i}\n\n"
+            for i in range(self.news_items)
+        )
+
+    def scrape_website_to_markdown(self, url):
+        rng = self._call("scrape", url)
+        return self._text(rng, self.page_kb * 1024)
+
+    def get_youtube_stats(self, channel_url):
+        rng = self._call("youtube", channel_url)
+        return "\n".join(
+            f"Title: {self._text(rng, 60)} | Views: {rng.randrange(10 ** 6)} | Likes: {rng.randrange(10 ** 4)}"
+            for _ in range(10)
+        )
+
+    def fetch_case_study(self, description):
+        rng = self._call("rag", description)
+        return self._text(rng, 3000)
+
+    def update_crm_record(self, lead_id, data):
+        self._call("crm", lead_id)
+
+
+class FakeCaseStudyBatcher:
+    def __init__(self, providers):
+        self.providers = providers
+
+    def fetch(self, description):
+        return self.providers.fetch_case_study(description)
+
+
+class FakeGmailOutbox:
+    def __init__(self):
+        self.queued = 0
+        self._lock = threading.Lock()
+
+    def enqueue_draft(self, recipient, subject, email_content):
+        with self._lock:
+            self.queued += 1
+
+    def enqueue_send(self, recipient, subject, email_content):
+        self.enqueue_draft(recipient, subject, email_content)
+
+    def pending_count(self):
+        return 0
+
+
+def make_lead_loader(providers, leads):
+    """In-memory lead loader serving `leads` synthetic leads, CRM updates go to the fakes."""
+    from src.tools.leads_loader.lead_loader_base import LeadLoaderBase
+
+    class BenchmarkLeadLoader(LeadLoaderBase):
+        def fetch_records(self, status_filter="NEW"):
+            return [
+                {
+                    "id": f"lead-{i}",
+                    "First Name": f"Lead{i}",
+                    "Last Name": "Benchmark",
+                    "Email": f"lead{i}@company{i}.com",
+                    "Phone": f"+1555{i:07d}",
+                    "Address": f"{i} Benchmark Street"
+                }
+                for i in range(leads)
+            ]
+
+        def update_record(self, lead_id, status):
+            providers.update_crm_record(lead_id, status)
+
+    return BenchmarkLeadLoader()
+
+
+def install_fakes(providers, reports_dir):
+    """Point every external call of the pipeline at the fakes. Returns (gmail outbox, report stores)."""
+    import src.nodes as nodes
+    import src.tools.lead_research as lead_research
+    import src.tools.company_research as company_research
+    from src.tools.report_store import LocalReportStore
+
+    for module in (nodes, lead_research, company_research):
+        module.invoke_llm = providers.invoke_llm
+    lead_research.google_search = providers.google_search
+    company_research.google_search = providers.google_search
+    nodes.get_recent_news = providers.get_recent_news
+    nodes.scrape_website_to_markdown = providers.scrape_website_to_markdown
+    nodes.get_youtube_stats = providers.get_youtube_stats
+    nodes.case_study_batcher = FakeCaseStudyBatcher(providers)
+    nodes.warm_up_vector_store = lambda: True
+    nodes.gmail_outbox = FakeGmailOutbox()
+
+    # Reports are still written by the real store, in a throwaway folder
+    stores = []
+
+    def report_store(*args, **kwargs):
+        store = LocalReportStore(root=reports_dir)
+        stores.append(store)
+        return store
+
+    nodes.LocalReportStore = report_store
+    return nodes.gmail_outbox, stores
+
+
+def graph_node_names(loader):
+    """Names of the nodes added by OutReachAutomation.build_graph."""
+    from src.graph import OutReachAutomation
+
+    graph = OutReachAutomation(loader).app.get_graph()
+    return [name for name in graph.nodes if not name.startswith("__")]
+
+
+class NodeTimer:
+    """Wraps OutReachAutomationNodes methods to record wall and CPU time per node."""
+
+    def __init__(self):
+        self.wall = defaultdict(list)
+        self.cpu = defaultdict(float)
+        self._lock = threading.Lock()
+
+    def wrap(self, node_names):
+        from src.nodes import OutReachAutomationNodes
+
+        for name in node_names:
+            raw = OutReachAutomationNodes.__dict__.get(name)
+            if raw is None:
+                continue
+            is_static = isinstance(raw, staticmethod)
+            setattr(OutReachAutomationNodes, name, self._timed(name, raw.__func__ if is_static else raw, is_static))
+
+    def _timed(self, name, func, is_static):
+        @functools.wraps(func)
+        def timed(*args, **kwargs):
+            # Parallel branches run on worker threads, thread CPU time stays per node
+            started, cpu_started = time.perf_counter(), time.thread_time()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                elapsed, cpu = time.perf_counter() - started, time.thread_time() - cpu_started
+                with self._lock:
+                    self.wall[name].append(elapsed)
+                    self.cpu[name] += cpu
+
+        return staticmethod(timed) if is_static else timed
+
+
+def run_benchmark(args):
+    from src.graph import OutReachAutomation
+
+    providers = FakeProviders(
+        latencies=parse_latencies(args.latencies),
+        time_scale=args.time_scale,
+        llm_words=args.llm_words,
+        page_kb=args.page_kb,
+        search_results=args.search_results,
+        news_items=args.news_items,
+        qualified_ratio=args.qualified_ratio,
+        seed=args.seed
+    )
+    reports_dir = tempfile.mkdtemp(prefix="pipeline-bench-")
+    # Run records are part of the pipeline's cost, but go to the throwaway folder
+    from src.instrumentation import instrumentation
+    instrumentation.path = os.path.join(reports_dir, "run_metrics.jsonl")
+    gmail_outbox, stores = install_fakes(providers, reports_dir)
+    loader = make_lead_loader(providers, args.leads)
+
+    timer = NodeTimer()
+    timer.wrap(graph_node_names(loader))
+    app = OutReachAutomation(loader).app
+    store = stores[-1]
+    providers.calls.clear()
+    providers.simulated.clear()
+
+    if args.trace_memory:
+        tracemalloc.start()
+    output = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(io.StringIO())
+    with output:
+        cpu_started, started = time.process_time(), time.perf_counter()
+        app.invoke({"leads_ids": []}, {"recursion_limit": 100 + args.leads * 50})
+        # Local report writes are part of a lead's cost
+        store.flush()
+        elapsed, cpu = time.perf_counter() - started, time.process_time() - cpu_started
+    peak_traced = tracemalloc.get_traced_memory()[1] if args.trace_memory else None
+    if args.trace_memory:
+        tracemalloc.stop()
+
+    simulated_wait = sum(sum(latencies) for latencies in providers.simulated.values()) * args.time_scale
+    qualified = len(timer.wall.get("generate_custom_outreach_report", []))
+    results = {
+        "config": {
+            "leads": args.leads,
+            "latencies": args.latencies,
+            "time_scale": args.time_scale,
+            "llm_words": args.llm_words,
+            "page_kb": args.page_kb,
+            "search_results": args.search_results,
+            "news_items": args.news_items,
+            "qualified_ratio": args.qualified_ratio,
+            "seed": args.seed
+        },
+        "wall_seconds": round(elapsed, 3),
+        "throughput_leads_per_s": round(args.leads / elapsed, 3),
+        "leads_qualified": qualified,
+        "cpu_seconds": round(cpu, 3),
+        "cpu_ms_per_lead": round(cpu / args.leads * 1000, 3),
+        "simulated_provider_seconds": round(simulated_wait, 3),
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "provider_calls": dict(providers.calls),
+        "emails_queued": gmail_outbox.queued,
+        "nodes": {
+            name: {**summarize_latencies(latencies), "cpu_ms": round(timer.cpu[name] * 1000, 3)}
+            for name, latencies in timer.wall.items()
+        }
+    }
+    if peak_traced is not None:
+        results["peak_traced_mb"] = round(peak_traced / 1024 / 1024, 2)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the outreach pipeline with fake providers")
+    parser.add_argument("--leads", type=int, default=50)
+    parser.add_argument("--latencies", default=DEFAULT_LATENCIES,
+                        help="Provider latency as median_ms:sigma, e.g. llm=1200:0.5,search=350:0.4")
+    parser.add_argument("--time-scale", type=float, default=0.01,
+                        help="Multiplier on simulated latencies, 0 measures pure pipeline overhead")
+    parser.add_argument("--llm-words", type=int, default=400, help="Words per LLM answer")
+    parser.add_argument("--page-kb", type=int, default=40, help="Scraped page size in KB")
+    parser.add_argument("--search-results", type=int, default=10, help="Results per search query")
+    parser.add_argument("--news-items", type=int, default=20, help="News items per company")
+    parser.add_argument("--qualified-ratio", type=float, default=0.5, help="Share of leads scored as qualified")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--trace-memory", action="store_true", help="Also report the tracemalloc peak (slower)")
+    parser.add_argument("--verbose", action="store_true", help="Keep the pipeline's console output")
+    parser.add_argument("--compare", help="Saved results file to compare with")
+    parser.add_argument("--no-save", action="store_true")
+    args = parser.parse_args()
+
+    results = run_benchmark(args)
+
+    print(f"\nPipeline benchmark: {args.leads} leads ({results['leads_qualified']} qualified), time scale {args.time_scale}")
+    print(f"  throughput   {results['throughput_leads_per_s']} leads/s ({results['wall_seconds']} s)")
+    print(f"  cpu time     {results['cpu_seconds']} s ({results['cpu_ms_per_lead']} ms per lead)")
+    print(f"  provider wait {results['simulated_provider_seconds']} s simulated")
+    print(f"  peak memory  {results['peak_rss_mb']} MB RSS"
+          + (f", {results['peak_traced_mb']} MB traced" if "peak_traced_mb" in results else ""))
+    print(f"\n  {'node':<38} {'calls':>6} {'p50 ms':>10} {'p95 ms':>10} {'p99 ms':>10} {'cpu ms':>10}")
+    for name, stats in sorted(results["nodes"].items(), key=lambda item: -item[1]["mean_ms"] * item[1]["count"]):
+        print(f"  {name:<38} {stats['count']:>6} {stats['p50_ms']:>10.3f} {stats['p95_ms']:>10.3f} "
+              f"{stats['p99_ms']:>10.3f} {stats['cpu_ms']:>10.1f}")
+
+    if not args.no_save:
+        save_results("pipeline", results)
+    if args.compare:
+        compare_results(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
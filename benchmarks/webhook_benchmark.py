@@ -0,0 +1,256 @@
+"""
+Brevo webhook ingestion benchmark
+Replays synthetic Brevo event streams against the FastAPI app in-process and
+reports acknowledgement latency, throughput and database round trips per event
+
+Uses the database in --database-url, or starts a throwaway embedded Postgres
+(pip install pgserver). Never point it at a production database: tables are truncated.
+
+Run with: python -m benchmarks.webhook_benchmark --events 20000 --concurrency 64
+"""
+
+import os
+import time
+import random
+import asyncio
+import argparse
+import tempfile
+import threading
+from datetime import datetime
+import httpx
+from psycopg2.extensions import cursor as base_cursor
+from psycopg2.extras import execute_values
+from psycopg2.pool import ThreadedConnectionPool
+from benchmarks.common import summarize_latencies, save_results, compare_results
+
+DEFAULT_MIX = "delivered=0.35,opened=0.4,click=0.15,soft_bounce=0.04,hard_bounce=0.03,spam=0.02,unsubscribe=0.01"
+
+# Tables used by the webhook, as documented in CORE_ENGINE_BUILD.md
+BENCHMARK_SCHEMA = """
+CREATE TABLE IF NOT EXISTS email_sends (
+    send_id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    lead_id VARCHAR(255) NOT NULL,
+    lead_email VARCHAR(255) NOT NULL,
+    subject VARCHAR(500),
+    body_html TEXT,
+    tracking_pixel_token VARCHAR(100) UNIQUE,
+    sendgrid_message_id VARCHAR(255),
+    status VARCHAR(50) DEFAULT 'queued',
+    sent_at TIMESTAMP,
+    delivered_at TIMESTAMP,
+    opened_at TIMESTAMP,
+    open_count INT DEFAULT 0,
+    clicked_at TIMESTAMP,
+    click_count INT DEFAULT 0,
+    replied_at TIMESTAMP,
+    created_at TIMESTAMP DEFAULT NOW()
+);
+CREATE TABLE IF NOT EXISTS email_events (
+    event_id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    send_id UUID NOT NULL REFERENCES email_sends(send_id) ON DELETE CASCADE,
+    event_type VARCHAR(50) NOT NULL,
+    event_timestamp TIMESTAMP DEFAULT NOW(),
+    user_agent TEXT,
+    ip_address VARCHAR(50),
+    link_url TEXT
+);
+CREATE TABLE IF NOT EXISTS leads (
+    email VARCHAR(255) PRIMARY KEY,
+    outreach_status VARCHAR(50) DEFAULT 'new'
+);
+"""
+
+
+class RoundTripCounter:
+    def __init__(self):
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def increment(self):
+        with self._lock:
+            self.count += 1
+
+
+round_trips = RoundTripCounter()
+
+
+class CountingCursor(base_cursor):
+    """Cursor counting every statement sent to the database."""
+
+    def execute(self, query, vars=None):
+        round_trips.increment()
+        return super().execute(query, vars)
+
+
+def start_database(database_url):
+    """Return (database url, embedded server or None)."""
+    if database_url:
+        return database_url, None
+    try:
+        import pgserver
+    except ImportError:
+        raise SystemExit("No --database-url given and pgserver is not installed (pip install pgserver)")
+    server = pgserver.get_server(tempfile.mkdtemp(prefix="webhook-bench-"), cleanup_mode="stop")
+    return server.get_uri(), server
+
+
+def prepare_database(database_url, sends):
+    """Create the tables, apply the migrations and seed `sends` email sends."""
+    from src.tools.email import db
+    from src.tools.email.schema import apply_migrations
+
+    os.environ["DATABASE_URL"] = database_url
+    db.get_db_pool(database_url)
+    with db.db_connection() as conn, conn.cursor() as cur:
+        cur.execute(BENCHMARK_SCHEMA)
+    apply_migrations()
+
+    message_ids = [f"<bench-{i}@smtp-relay.brevo.com>" for i in range(sends)]
+    sent_at = datetime.now()
+    with db.db_connection() as conn, conn.cursor() as cur:
+        cur.execute("TRUNCATE email_events, email_sends, email_stats_daily, leads CASCADE")
+        execute_values(cur, """
+            INSERT INTO email_sends (lead_id, lead_email, subject, sendgrid_message_id, status, sent_at, campaign)
+            VALUES %s
+        """, [
+            (f"lead-{i}", f"lead{i}@example{i % 50}.com", "Benchmark", message_id, "sent", sent_at, "bench")
+            for i, message_id in enumerate(message_ids)
+        ], page_size=1000)
+    db.close_db_pool()
+    return message_ids
+
+
+def generate_events(message_ids, count, mix, seed):
+    """Synthetic Brevo events: a popular subset of emails gets most opens and clicks."""
+    rng = random.Random(seed)
+    event_types, weights = zip(*mix.items())
+    popularity = [1 / (rank + 1) ** 0.8 for rank in range(len(message_ids))]
+    now = int(time.time())
+    events = []
+    for event_type, index in zip(
+        rng.choices(event_types, weights=weights, k=count),
+        rng.choices(range(len(message_ids)), weights=popularity, k=count)
+    ):
+        event = {
+            "event": event_type,
+            "email": f"lead{index}@example{index % 50}.com",
+            "message-id": message_ids[index],
+            "ts": now + rng.randint(0, 3600),
+            "tag": "bench",
+            "ip": f"203.0.113.{rng.randint(1, 254)}",
+            "user_agent": "Mozilla/5.0 (benchmark)"
+        }
+        if event_type == "click":
+            event["link"] = f"https://example.com/offer?lead={index}"
+        events.append(event)
+    return events
+
+
+async def replay(app, events, concurrency, burst_size, burst_gap):
+    """POST the events in bursts, at most `concurrency` requests in flight. Returns the latencies."""
+    latencies = []
+    semaphore = asyncio.Semaphore(concurrency)
+    transport = httpx.ASGITransport(app=app)
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://benchmark") as client:
+        async def post(event):
+            async with semaphore:
+                started = time.perf_counter()
+                response = await client.post("/webhooks/brevo", json=event)
+                latencies.append(time.perf_counter() - started)
+                response.raise_for_status()
+
+        for start in range(0, len(events), burst_size):
+            await asyncio.gather(*(post(event) for event in events[start:start + burst_size]))
+            if burst_gap:
+                await asyncio.sleep(burst_gap)
+    return latencies
+
+
+async def run_benchmark(args, database_url, message_ids):
+    from src.tools.email import db
+    from src.api.brevo_webhooks import app
+    from src.api.event_ingestion import brevo_event_buffer
+
+    mix = {name: float(share) for name, share in (item.split("=") for item in args.mix.split(","))}
+    events = generate_events(message_ids, args.events, mix, args.seed)
+
+    # Pool with counting cursors, picked up by the app instead of creating its own
+    db._pool = ThreadedConnectionPool(1, db.DB_POOL_MAX_CONNECTIONS, database_url, cursor_factory=CountingCursor)
+
+    async with app.router.lifespan_context(app):
+        round_trips.count = 0
+        started = time.perf_counter()
+        latencies = await replay(app, events, args.concurrency, args.burst_size, args.burst_gap)
+        acknowledged = time.perf_counter() - started
+
+        # Ingestion is done once the buffer is empty and the last flush committed
+        while brevo_event_buffer.pending_count():
+            await asyncio.sleep(0.01)
+        await asyncio.to_thread(brevo_event_buffer.flush)
+        ingested = time.perf_counter() - started
+        statements = round_trips.count
+
+    db.get_db_pool(database_url)
+    with db.db_connection() as conn, conn.cursor() as cur:
+        cur.execute("SELECT COUNT(*) FROM email_events")
+        written = cur.fetchone()[0]
+    db.close_db_pool()
+
+    return {
+        "config": {
+            "events": args.events,
+            "sends": args.sends,
+            "concurrency": args.concurrency,
+            "burst_size": args.burst_size,
+            "burst_gap_s": args.burst_gap,
+            "mix": args.mix,
+            "seed": args.seed
+        },
+        "ack_latency": summarize_latencies(latencies),
+        "ack_throughput_eps": round(len(events) / acknowledged, 1),
+        "ingest_throughput_eps": round(len(events) / ingested, 1),
+        "ingest_seconds": round(ingested, 3),
+        "events_written": written,
+        "db_round_trips": statements,
+        "db_round_trips_per_event": round(statements / len(events), 4)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark Brevo webhook ingestion")
+    parser.add_argument("--events", type=int, default=20000)
+    parser.add_argument("--sends", type=int, default=2000, help="Email sends the events refer to")
+    parser.add_argument("--concurrency", type=int, default=64, help="Requests in flight")
+    parser.add_argument("--burst-size", type=int, default=500, help="Events posted per burst")
+    parser.add_argument("--burst-gap", type=float, default=0.05, help="Seconds between bursts")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="Event type shares, e.g. opened=0.5,click=0.5")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--database-url", default=os.getenv("BENCHMARK_DATABASE_URL"))
+    parser.add_argument("--compare", help="Saved results file to compare with")
+    parser.add_argument("--no-save", action="store_true")
+    args = parser.parse_args()
+
+    database_url, server = start_database(args.database_url)
+    try:
+        message_ids = prepare_database(database_url, args.sends)
+        results = asyncio.run(run_benchmark(args, database_url, message_ids))
+    finally:
+        if server is not None:
+            server.cleanup()
+
+    latency = results["ack_latency"]
+    print(f"\nWebhook benchmark: {args.events} events, concurrency {args.concurrency}")
+    print(f"  ack latency      p50 {latency['p50_ms']} ms, p95 {latency['p95_ms']} ms, p99 {latency['p99_ms']} ms")
+    print(f"  ack throughput   {results['ack_throughput_eps']} events/s")
+    print(f"  ingest throughput {results['ingest_throughput_eps']} events/s ({results['events_written']} events written)")
+    print(f"  db round trips   {results['db_round_trips_per_event']} per event")
+
+    if not args.no_save:
+        save_results("webhook", results)
+    if args.compare:
+        compare_results(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,8 @@
 import os
 from dotenv import load_dotenv
 from src.graph import OutReachAutomation
+from src.instrumentation import instrumentation
+from src.metrics import start_metrics_server
 from src.state import *
 from src.tools.leads_loader.apollo import ApolloLeadLoader
 from src.tools.leads_loader.supabase_loader import SupabaseLeadLoader
@@ -9,6 +11,9 @@ from src.tools.leads_loader.supabase_loader import SupabaseLeadLoader
 load_dotenv()
 
 if __name__ == "__main__":
+    # Prometheus metrics on http://<host>:METRICS_PORT/metrics (disabled if unset)
+    start_metrics_server()
+
     # Option 1: Use Apollo.io with CSV export
     lead_loader = ApolloLeadLoader(
         csv_file_path=os.getenv("APOLLO_CSV_PATH")
@@ -38,4 +43,7 @@ if __name__ == "__main__":
     # Run the outreach automation with the provided lead name and email
     config = {'recursion_limit': 1000}
     output = app.invoke(inputs, config)
-    print(output)
\ No newline at end of file
+    print(output)
+
+    # Per node and per provider timings, tokens and estimated cost of the run
+    instrumentation.print_summary()
\ No newline at end of file
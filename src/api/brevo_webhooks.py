@@ -3,14 +3,39 @@ Brevo Webhook Handler
 Processes email events: delivered, opened, clicked, bounced, etc.
 """
 
-from fastapi import FastAPI, Request, HTTPException
-import psycopg2
-from datetime import datetime
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request, HTTPException, Response
+from starlette.concurrency import run_in_threadpool
 import os
 import hmac
 import hashlib
+from src.tools.email.db import get_db_pool, close_db_pool
+from src.tools.email.schema import check_message_id_index
+from src.api.event_ingestion import brevo_event_buffer, InvalidEventError, BufferFullError
+from src.metrics import registry, queue_depth, webhook_events, CONTENT_TYPE
 
-app = FastAPI()
+# Event types Brevo sends, anything else is counted as "other" to bound label values
+BREVO_EVENT_TYPES = {
+    'request', 'delivered', 'hard_bounce', 'soft_bounce', 'invalid_email', 'deferred',
+    'click', 'opened', 'unique_opened', 'spam', 'blocked', 'unsubscribe', 'error'
+}
+
+queue_depth.labels("brevo_events").set_function(brevo_event_buffer.pending_count)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Open the connection pool at startup so requests never pay for a connection
+    await run_in_threadpool(get_db_pool)
+    await run_in_threadpool(check_message_id_index)
+    brevo_event_buffer.start()
+    yield
+    # Write the events still buffered before closing the pool
+    await run_in_threadpool(brevo_event_buffer.stop)
+    close_db_pool()
+
+
+app = FastAPI(lifespan=lifespan)
 
 
 def verify_brevo_signature(payload: bytes, signature: str, secret: str) -> bool:
@@ -59,116 +84,30 @@ async def brevo_webhook(request: Request):
     if webhook_secret and not verify_brevo_signature(payload, signature, webhook_secret):
         raise HTTPException(status_code=401, detail="Invalid signature")
 
-    # Parse event
+    # Parse event (Brevo can also post a list of events)
     event_data = await request.json()
+    events = event_data if isinstance(event_data, list) else [event_data]
 
-    conn = psycopg2.connect(os.getenv('DATABASE_URL'))
-    cur = conn.cursor()
-
+    # Acknowledge right away, events are written in bulk by the background flusher
     try:
-        # Brevo webhook structure
-        event_type = event_data.get('event')
-        email = event_data.get('email')
-        message_id = event_data.get('message-id')  # Brevo message ID
-        timestamp = datetime.fromtimestamp(event_data.get('ts', 0))
-
-        # Optional fields
-        link = event_data.get('link')  # For click events
-        reason = event_data.get('reason')  # For bounces
-        tag = event_data.get('tag')  # Custom tag
-
-        # Find email send record by Brevo message ID
-        cur.execute("""
-            SELECT send_id FROM email_sends
-            WHERE sendgrid_message_id = %s
-        """, (message_id,))
-
-        result = cur.fetchone()
-        if not result:
-            print(f"⚠️ Email send not found for message_id: {message_id}")
-            return {"status": "ignored", "reason": "send_id not found"}
-
-        send_id = result[0]
-
-        # Log event to email_events table
-        cur.execute("""
-            INSERT INTO email_events
-            (send_id, event_type, event_timestamp, link_url, user_agent, ip_address)
-            VALUES (%s, %s, %s, %s, %s, %s)
-        """, (
-            send_id,
-            event_type,
-            timestamp,
-            link,
-            event_data.get('user_agent'),
-            event_data.get('ip')
-        ))
-
-        # Update email_sends table based on event type
-        if event_type == 'delivered':
-            cur.execute("""
-                UPDATE email_sends
-                SET status = 'delivered', delivered_at = %s
-                WHERE send_id = %s
-            """, (timestamp, send_id))
-
-        elif event_type == 'opened':
-            # Brevo tracks opens if enabled
-            cur.execute("""
-                UPDATE email_sends
-                SET opened_at = COALESCE(opened_at, %s),
-                    open_count = open_count + 1
-                WHERE send_id = %s
-            """, (timestamp, send_id))
-
-        elif event_type == 'click':
-            cur.execute("""
-                UPDATE email_sends
-                SET clicked_at = COALESCE(clicked_at, %s),
-                    click_count = click_count + 1
-                WHERE send_id = %s
-            """, (timestamp, send_id))
-
-        elif event_type in ['hard_bounce', 'soft_bounce', 'invalid_email', 'blocked']:
-            cur.execute("""
-                UPDATE email_sends
-                SET status = 'bounced'
-                WHERE send_id = %s
-            """, (send_id,))
-
-        elif event_type == 'spam':
-            cur.execute("""
-                UPDATE email_sends
-                SET status = 'spam'
-                WHERE send_id = %s
-            """, (send_id,))
-
-        elif event_type == 'unsubscribe':
-            # Mark lead as unsubscribed
-            cur.execute("""
-                UPDATE leads
-                SET outreach_status = 'unsubscribed'
-                WHERE email = %s
-            """, (email,))
-
-        conn.commit()
-
-        print(f"✅ Processed Brevo event: {event_type} for {email}")
-
-        return {
-            "status": "success",
-            "event": event_type,
-            "send_id": str(send_id)
-        }
-
-    except Exception as e:
-        conn.rollback()
-        print(f"❌ Error processing webhook: {str(e)}")
-        raise HTTPException(status_code=500, detail=str(e))
-
-    finally:
-        cur.close()
-        conn.close()
+        brevo_event_buffer.add_many(events)
+    except InvalidEventError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid event: {e}")
+    except BufferFullError:
+        # Brevo retries failed deliveries, so the events are not lost
+        raise HTTPException(status_code=503, detail="Event buffer full, retry later")
+
+    for event in events:
+        event_type = event.get("event")
+        webhook_events.labels(event_type if event_type in BREVO_EVENT_TYPES else "other").inc()
+
+    return {"status": "queued", "events": len(events)}
+
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus metrics"""
+    return Response(registry.render(), media_type=CONTENT_TYPE)
 
 
 @app.get("/health")
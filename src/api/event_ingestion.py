@@ -0,0 +1,303 @@
+"""
+Batched Brevo event ingestion
+Webhook events are queued in memory and written by a background flusher:
+one bulk message id lookup, one multi-row event insert and one aggregated
+email_sends update per flush
+"""
+
+import os
+import json
+import math
+import time
+import threading
+from collections import defaultdict
+from datetime import datetime
+from psycopg2.extras import execute_values
+from src.tools.email.db import db_connection
+from src.tools.email.message_ids import message_id_cache
+from src.tools.email.rollups import increment_rollups, new_increments
+from src.metrics import webhook_flush_duration
+
+EVENT_FLUSH_SIZE = int(os.getenv("WEBHOOK_EVENT_FLUSH_SIZE", "500"))
+EVENT_FLUSH_INTERVAL = float(os.getenv("WEBHOOK_EVENT_FLUSH_INTERVAL", "1"))
+EVENT_MAX_BUFFERED = int(os.getenv("WEBHOOK_EVENT_MAX_BUFFERED", "100000"))
+# Events whose batch failed to write this many times are moved to the dead letter file
+EVENT_MAX_WRITE_ATTEMPTS = int(os.getenv("WEBHOOK_EVENT_MAX_WRITE_ATTEMPTS", "5"))
+EVENT_DEAD_LETTER_FILE = os.getenv("WEBHOOK_DEAD_LETTER_FILE", "brevo_dead_letters.jsonl")
+# Flushes an event waits for its email send to be logged before it is dropped
+EVENT_MAX_RESOLVE_ATTEMPTS = 3
+
+BOUNCE_EVENTS = {'hard_bounce', 'soft_bounce', 'invalid_email', 'blocked'}
+
+
+class InvalidEventError(ValueError):
+    """A webhook event the buffer cannot store (rejected with a 4xx)."""
+
+
+class BufferFullError(Exception):
+    """The buffer holds EVENT_MAX_BUFFERED events, e.g. while the database is down."""
+
+
+def validate_event(event):
+    """
+    Check a Brevo event before it is buffered, so a bad payload can never fail a flush.
+
+    Args:
+        event: The decoded webhook event
+
+    Returns:
+        The event with `ts` parsed to a number of seconds
+
+    Raises:
+        InvalidEventError: If a field has the wrong type or `ts` is not a valid timestamp
+    """
+    if not isinstance(event, dict):
+        raise InvalidEventError("event must be a JSON object")
+    if not isinstance(event.get('event'), str):
+        raise InvalidEventError("'event' must be a string")
+    for field in ('message-id', 'email', 'link', 'user_agent', 'ip'):
+        if event.get(field) is not None and not isinstance(event[field], str):
+            raise InvalidEventError(f"'{field}' must be a string")
+
+    ts = event.get('ts', time.time())
+    try:
+        ts = float(ts)
+        if not math.isfinite(ts):
+            raise ValueError(ts)
+        datetime.fromtimestamp(ts)
+    except (TypeError, ValueError, OverflowError, OSError):
+        raise InvalidEventError(f"'ts' is not a valid timestamp: {event.get('ts')!r}")
+    return {**event, 'ts': ts}
+
+
+class BrevoEventBuffer:
+    """
+    Buffers Brevo webhook events and writes them in bulk.
+
+    `add` only appends to memory, so the webhook acknowledges right away.
+    A flusher thread writes the buffer every `flush_interval` seconds, or as soon
+    as `flush_size` events are waiting, in a single transaction. Database load
+    grows with the number of flushes, not the number of events.
+
+    A batch that fails to write is re-queued; events whose batch failed
+    EVENT_MAX_WRITE_ATTEMPTS times are appended to the dead letter file instead.
+    """
+
+    def __init__(self, flush_size=EVENT_FLUSH_SIZE, flush_interval=EVENT_FLUSH_INTERVAL,
+                 max_buffered=EVENT_MAX_BUFFERED, dead_letter_file=EVENT_DEAD_LETTER_FILE):
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.max_buffered = max_buffered
+        self.dead_letter_file = dead_letter_file
+        # (event, resolve attempts, write attempts)
+        self._events = []
+        self._cond = threading.Condition()
+        self._flush_lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name="brevo-events", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop the flusher after writing what is buffered."""
+        self._stopping.set()
+        with self._cond:
+            self._cond.notify()
+        if self._thread:
+            self._thread.join()
+        self.flush()
+
+    def add(self, event):
+        """
+        Validate and buffer an event.
+
+        Raises:
+            InvalidEventError: If the event is malformed
+            BufferFullError: If `max_buffered` events are already waiting
+        """
+        self.add_many([event])
+
+    def add_many(self, events):
+        """Validate and buffer events, none are buffered if one of them is invalid."""
+        events = [validate_event(event) for event in events]
+        with self._cond:
+            if len(self._events) + len(events) > self.max_buffered:
+                raise BufferFullError(f"{len(self._events)} Brevo events already buffered")
+            self._events.extend((event, 0, 0) for event in events)
+            if len(self._events) >= self.flush_size:
+                self._cond.notify()
+
+    def pending_count(self):
+        with self._cond:
+            return len(self._events)
+
+    def _run(self):
+        while not self._stopping.is_set():
+            with self._cond:
+                self._cond.wait_for(
+                    lambda: len(self._events) >= self.flush_size or self._stopping.is_set(),
+                    timeout=self.flush_interval
+                )
+            self.flush()
+
+    def flush(self):
+        """Write every buffered event now. Returns the number of events written."""
+        with self._flush_lock:
+            with self._cond:
+                batch, self._events = self._events, []
+            if not batch:
+                return 0
+            started = time.perf_counter()
+            try:
+                written, unresolved = self._write(batch)
+                webhook_flush_duration.observe(time.perf_counter() - started)
+            except Exception as e:
+                retry = [(event, attempts, writes + 1) for event, attempts, writes in batch]
+                failed = [event for event, _, writes in retry if writes >= EVENT_MAX_WRITE_ATTEMPTS]
+                retry = [item for item in retry if item[2] < EVENT_MAX_WRITE_ATTEMPTS]
+                print(f"❌ Failed to write {len(batch)} Brevo events, will retry {len(retry)}: {e}")
+                if failed:
+                    self._dead_letter(failed, e)
+                with self._cond:
+                    self._events[:0] = retry
+                return 0
+
+            # The send may not be logged yet (send records are buffered too), retry a few times
+            retry = [(event, attempts + 1, writes) for event, attempts, writes in unresolved
+                     if attempts + 1 < EVENT_MAX_RESOLVE_ATTEMPTS]
+            dropped = len(unresolved) - len(retry)
+            if dropped:
+                print(f"⚠️ Ignored {dropped} Brevo events with unknown message ids")
+            if retry:
+                with self._cond:
+                    self._events[:0] = retry
+            return written
+
+    def _dead_letter(self, events, error):
+        """Append events that keep failing to the dead letter file, to be replayed by hand."""
+        try:
+            with open(self.dead_letter_file, "a", encoding="utf-8") as f:
+                for event in events:
+                    f.write(json.dumps({"error": str(error), "event": event}, default=str) + "\n")
+            print(f"⚠️ Moved {len(events)} Brevo events to {self.dead_letter_file} after {EVENT_MAX_WRITE_ATTEMPTS} failed writes")
+        except OSError as e:
+            print(f"❌ Dropped {len(events)} Brevo events, could not write the dead letter file: {e}")
+
+    def _resolve_send_ids(self, cur, message_ids):
+        """Map Brevo message ids to send ids from the cache, with one query for the misses."""
+        send_ids, missing = message_id_cache.get_many(message_ids)
+        if missing:
+            cur.execute("""
+                SELECT sendgrid_message_id, send_id FROM email_sends
+                WHERE sendgrid_message_id = ANY(%s)
+            """, (list(missing),))
+            found = dict(cur.fetchall())
+            message_id_cache.put_many(found)
+            send_ids.update(found)
+        return send_ids
+
+    def _write(self, batch):
+        with db_connection() as conn, conn.cursor() as cur:
+            message_ids = {event.get('message-id') for event, _, _ in batch if event.get('message-id')}
+            send_ids = self._resolve_send_ids(cur, message_ids) if message_ids else {}
+
+            event_rows = []
+            unresolved = []
+            unsubscribed = set()
+            # send_id -> aggregated changes of this batch
+            changes = defaultdict(lambda: {
+                "status": None, "delivered_at": None, "bounced_at": None,
+                "opens": 0, "first_open": None, "clicks": 0, "first_click": None
+            })
+
+            for event, attempts, writes in batch:
+                event_type = event.get('event')
+                if event_type == 'unsubscribe' and event.get('email'):
+                    # Mark lead as unsubscribed
+                    unsubscribed.add(event['email'])
+
+                send_id = send_ids.get(event.get('message-id'))
+                if not send_id:
+                    unresolved.append((event, attempts, writes))
+                    continue
+
+                timestamp = datetime.fromtimestamp(event['ts'])
+                event_rows.append((
+                    send_id, event_type, timestamp, event.get('link'),
+                    event.get('user_agent'), event.get('ip')
+                ))
+
+                change = changes[send_id]
+                if event_type == 'delivered':
+                    change["delivered_at"] = min(filter(None, (change["delivered_at"], timestamp)))
+                    change["status"] = change["status"] or 'delivered'
+                elif event_type == 'opened':
+                    change["opens"] += 1
+                    change["first_open"] = min(filter(None, (change["first_open"], timestamp)))
+                elif event_type == 'click':
+                    change["clicks"] += 1
+                    change["first_click"] = min(filter(None, (change["first_click"], timestamp)))
+                elif event_type in BOUNCE_EVENTS:
+                    change["bounced_at"] = min(filter(None, (change["bounced_at"], timestamp)))
+                    if change["status"] != 'spam':
+                        change["status"] = 'bounced'
+                elif event_type == 'spam':
+                    change["status"] = 'spam'
+
+            if event_rows:
+                execute_values(cur, """
+                    INSERT INTO email_events
+                    (send_id, event_type, event_timestamp, link_url, user_agent, ip_address)
+                    VALUES %s
+                """, event_rows, page_size=len(event_rows))
+
+            if changes:
+                # One statement applies every send's aggregated counters and status.
+                # `old` is read before the update, to count first deliveries/opens/clicks/bounces in the rollups
+                updated = execute_values(cur, """
+                    UPDATE email_sends AS s
+                    SET status = COALESCE(v.status, s.status),
+                        delivered_at = COALESCE(v.delivered_at, s.delivered_at),
+                        bounced_at = COALESCE(s.bounced_at, v.bounced_at),
+                        opened_at = COALESCE(s.opened_at, v.first_open),
+                        open_count = s.open_count + v.opens,
+                        clicked_at = COALESCE(s.clicked_at, v.first_click),
+                        click_count = s.click_count + v.clicks
+                    FROM (VALUES %s) AS v(send_id, status, delivered_at, bounced_at, opens, first_open, clicks, first_click),
+                         email_sends AS old
+                    WHERE s.send_id = v.send_id::uuid AND old.send_id = s.send_id
+                    RETURNING s.campaign,
+                        CASE WHEN old.delivered_at IS NULL THEN v.delivered_at END,
+                        CASE WHEN old.opened_at IS NULL THEN v.first_open END,
+                        CASE WHEN old.clicked_at IS NULL THEN v.first_click END,
+                        CASE WHEN old.bounced_at IS NULL THEN v.bounced_at END
+                """, [
+                    (str(send_id), c["status"], c["delivered_at"], c["bounced_at"],
+                     c["opens"], c["first_open"], c["clicks"], c["first_click"])
+                    for send_id, c in changes.items()
+                ], template="(%s, %s, %s::timestamp, %s::timestamp, %s, %s::timestamp, %s, %s::timestamp)",
+                   page_size=len(changes), fetch=True)
+
+                increments = new_increments()
+                for campaign, delivered_at, opened_at, clicked_at, bounced_at in updated:
+                    for metric, at in (("delivered", delivered_at), ("opened", opened_at),
+                                       ("clicked", clicked_at), ("bounced", bounced_at)):
+                        if at:
+                            increments[(at.date(), campaign)][metric] += 1
+                increment_rollups(cur, increments)
+
+            if unsubscribed:
+                cur.execute("""
+                    UPDATE leads
+                    SET outreach_status = 'unsubscribed'
+                    WHERE email = ANY(%s)
+                """, (list(unsubscribed),))
+
+        return len(event_rows), unresolved
+
+
+# Shared by the webhook app
+brevo_event_buffer = BrevoEventBuffer()
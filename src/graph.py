@@ -1,5 +1,6 @@
 from langgraph.graph import END, StateGraph
 from .nodes import OutReachAutomationNodes
+from .instrumentation import instrumentation
 from .state import GraphState
 from .tools.leads_loader.lead_loader_base import LeadLoaderBase
 
@@ -19,32 +20,36 @@ class OutReachAutomation:
         # Initialize the nodes with the provided lead loader
         nodes = OutReachAutomationNodes(loader)
 
+        # Every node is timed and attributed to the lead being processed
+        def add_node(name, action):
+            graph.add_node(name, instrumentation.node(name, action))
+
         # **Step 1: Adding nodes to the graph**
         # Fetch new leads from the CRM
-        graph.add_node("get_new_leads", nodes.get_new_leads)
-        graph.add_node("check_for_remaining_leads", nodes.check_for_remaining_leads)
+        add_node("get_new_leads", nodes.get_new_leads)
+        add_node("check_for_remaining_leads", nodes.check_for_remaining_leads)
 
         # Research phase: gather data and insights about the lead
-        graph.add_node("fetch_linkedin_profile_data", nodes.fetch_linkedin_profile_data)
-        graph.add_node("review_company_website", nodes.review_company_website)
-        graph.add_node("collect_company_information", nodes.collect_company_information)
-        graph.add_node("analyze_blog_content", nodes.analyze_blog_content)
-        graph.add_node("analyze_social_media_content", nodes.analyze_social_media_content)
-        graph.add_node("analyze_recent_news", nodes.analyze_recent_news)
-        graph.add_node("generate_full_lead_research_report", nodes.generate_full_lead_research_report)
-        graph.add_node("generate_digital_presence_report", nodes.generate_digital_presence_report)
-        graph.add_node("score_lead", nodes.score_lead)
+        add_node("fetch_linkedin_profile_data", nodes.fetch_linkedin_profile_data)
+        add_node("review_company_website", nodes.review_company_website)
+        add_node("collect_company_information", nodes.collect_company_information)
+        add_node("analyze_blog_content", nodes.analyze_blog_content)
+        add_node("analyze_social_media_content", nodes.analyze_social_media_content)
+        add_node("analyze_recent_news", nodes.analyze_recent_news)
+        add_node("generate_full_lead_research_report", nodes.generate_full_lead_research_report)
+        add_node("generate_digital_presence_report", nodes.generate_digital_presence_report)
+        add_node("score_lead", nodes.score_lead)
 
         # Outreach preparation phase
-        graph.add_node("create_outreach_materials", nodes.create_outreach_materials)
-        graph.add_node("generate_custom_outreach_report", nodes.generate_custom_outreach_report)
-        graph.add_node("generate_personalized_email", nodes.generate_personalized_email)
-        graph.add_node("generate_interview_script", nodes.generate_interview_script)
+        add_node("create_outreach_materials", nodes.create_outreach_materials)
+        add_node("generate_custom_outreach_report", nodes.generate_custom_outreach_report)
+        add_node("generate_personalized_email", nodes.generate_personalized_email)
+        add_node("generate_interview_script", nodes.generate_interview_script)
 
         # Reporting and finalization
-        graph.add_node("save_reports_to_google_docs", nodes.save_reports_to_google_docs)
-        graph.add_node("await_reports_creation", nodes.await_reports_creation)
-        graph.add_node("update_CRM", nodes.update_CRM)
+        add_node("save_reports_to_google_docs", nodes.save_reports_to_google_docs)
+        add_node("await_reports_creation", nodes.await_reports_creation)
+        add_node("update_CRM", nodes.update_CRM)
 
         # **Step 2: Setting up edges between nodes**
 
@@ -0,0 +1,351 @@
+"""
+Run instrumentation
+Times every graph node and external call (LLM, Serper, scraping, YouTube, RAG,
+CRM, Google Docs, Gmail) and records token usage, estimated cost, cache hits
+and retries. The run is summarized in a table at the end; set RUN_METRICS_FILE
+to also append each record as a JSON line (tagged with the run and lead ids)
+"""
+
+import os
+import json
+import time
+import uuid
+import threading
+import functools
+from collections import Counter, defaultdict
+from langchain_core.callbacks import BaseCallbackHandler
+
+# JSON lines file the records are appended to (disabled if empty)
+RUN_METRICS_FILE = os.getenv("RUN_METRICS_FILE", "")
+
+# Estimated USD price per 1M input / output tokens
+MODEL_PRICES = {
+    "gpt-4o": (2.50, 10.00),
+    "gpt-4o-mini": (0.15, 0.60),
+    "gemini-2.0-flash-exp": (0.10, 0.40),
+    "gemini-2.0-flash-thinking-exp": (0.10, 0.40),
+    "claude-3-5-sonnet-20241022": (3.00, 15.00),
+}
+# Estimated USD price per call of paid non-LLM APIs
+CALL_PRICES = {
+    "serper": 0.001,
+}
+
+
+def percentile(values, p):
+    """Linear interpolated percentile (p in 0-100) of a list of numbers."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * p / 100
+    low = int(rank)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+
+def _status_code(error):
+    """HTTP status of a provider error (requests, googleapiclient, OpenAI/Anthropic SDKs), or None."""
+    for status in (
+        getattr(error, "status_code", None),
+        getattr(getattr(error, "resp", None), "status", None),
+        getattr(getattr(error, "response", None), "status_code", None)
+    ):
+        if status is not None:
+            try:
+                return int(status)
+            except (TypeError, ValueError):
+                continue
+    return None
+
+
+def estimate_cost(provider, model=None, input_tokens=0, output_tokens=0):
+    """Estimated USD cost of a call, 0 for unpriced providers and models."""
+    if model in MODEL_PRICES:
+        input_price, output_price = MODEL_PRICES[model]
+        return (input_tokens * input_price + output_tokens * output_price) / 1_000_000
+    return CALL_PRICES.get(provider, 0.0)
+
+
+class LLMUsageCallback(BaseCallbackHandler):
+    """Collects the token usage reported by chat models into a call record."""
+
+    def __init__(self, record):
+        self.record = record
+
+    def on_llm_end(self, response, **kwargs):
+        for generations in response.generations:
+            for generation in generations:
+                usage = getattr(getattr(generation, "message", None), "usage_metadata", None)
+                if usage:
+                    self.record["input_tokens"] += usage.get("input_tokens", 0)
+                    self.record["output_tokens"] += usage.get("output_tokens", 0)
+                    self.record["tokens_reported"] = True
+
+
+class RunInstrumentation:
+    """
+    Collects node and external call records for one process run.
+
+    Node wrappers set the lead being processed on their thread, so calls made
+    by the node are attributed to it. Records are written to a JSON lines file
+    as they complete and aggregated per node and per provider/model.
+
+    Args:
+        path: JSON lines file records are appended to, None to only aggregate
+    """
+
+    def __init__(self, path=RUN_METRICS_FILE):
+        self.path = path
+        self.run_id = uuid.uuid4().hex[:12]
+        self.started = time.time()
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._file = None
+        self._node_durations = defaultdict(list)
+        self._node_errors = Counter()
+        self._providers = defaultdict(Counter)
+        self._provider_seconds = defaultdict(float)
+        self._leads = defaultdict(Counter)
+        self._listeners = []
+
+    def add_listener(self, listener):
+        """Call `listener(record)` for every node and call record (e.g. to export metrics)."""
+        self._listeners.append(listener)
+
+    @property
+    def current_lead(self):
+        return getattr(self._local, "lead_id", None)
+
+    def node(self, name, func):
+        """Wrap a graph node so each execution is timed and attributed to the current lead."""
+
+        @functools.wraps(func)
+        def instrumented_node(state, *args, **kwargs):
+            lead = state.get("current_lead") if isinstance(state, dict) else None
+            previous_node, previous_lead = getattr(self._local, "node", None), self.current_lead
+            self._local.node, self._local.lead_id = name, getattr(lead, "id", previous_lead)
+            record = {"type": "node", "node": name, "lead_id": self.current_lead, "error": None}
+            started = time.perf_counter()
+            try:
+                result = func(state, *args, **kwargs)
+                # The node that picks the next lead returns it
+                next_lead = result.get("current_lead") if isinstance(result, dict) else None
+                if next_lead is not None:
+                    record["lead_id"] = getattr(next_lead, "id", record["lead_id"])
+                return result
+            except Exception as e:
+                record["error"] = type(e).__name__
+                raise
+            finally:
+                record["duration_ms"] = round((time.perf_counter() - started) * 1000, 3)
+                self._local.node, self._local.lead_id = previous_node, previous_lead
+                self._record(record)
+
+        return instrumented_node
+
+    def track(self, provider, model=None):
+        """
+        Context manager timing one external call. The yielded record can be updated
+        with "input_tokens"/"output_tokens", "cache_hit" and "retries".
+        """
+        return _TrackedCall(self, provider, model)
+
+    def tracked(self, provider, model=None):
+        """Decorator timing every call of a function to an external provider."""
+
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                # Nested calls to the same provider (e.g. a loader method calling another) count once
+                if self._active_call(provider) is not None:
+                    return func(*args, **kwargs)
+                with self.track(provider, model):
+                    return func(*args, **kwargs)
+            return wrapper
+
+        return decorator
+
+    def record_cache_hit(self, provider):
+        """Mark the running call to `provider` as served from a cache."""
+        call = self._active_call(provider)
+        if call is not None:
+            call["cache_hit"] = True
+        else:
+            with self._lock:
+                self._providers[(provider, None)]["cache_hits"] += 1
+
+    def record_retry(self, provider, count=1):
+        """Count a retry of a call to `provider` (also outside of a tracked call, e.g. background queues)."""
+        call = self._active_call(provider)
+        if call is not None:
+            call["retries"] += count
+        else:
+            with self._lock:
+                self._providers[(provider, None)]["retries"] += count
+
+    def record_status(self, provider, status):
+        """Set the HTTP status of the running call to `provider`, for providers that return errors instead of raising."""
+        call = self._active_call(provider)
+        if call is not None:
+            call["status"] = status
+            if status >= 400:
+                call["error"] = call["error"] or f"HTTP {status}"
+
+    def finish_lead(self, lead_id):
+        """Write the totals of a processed lead as a "lead" record."""
+        with self._lock:
+            totals = self._leads.pop(lead_id, Counter())
+        record = {"type": "lead", "lead_id": lead_id}
+        record.update({key: round(value, 6) if isinstance(value, float) else value for key, value in totals.items()})
+        self._write(record)
+
+    def summary(self):
+        """Aggregated run statistics per node and per provider/model."""
+        with self._lock:
+            nodes = {
+                name: {
+                    "calls": len(durations),
+                    "total_s": round(sum(durations) / 1000, 3),
+                    "p50_ms": round(percentile(durations, 50), 1),
+                    "p95_ms": round(percentile(durations, 95), 1),
+                    "errors": self._node_errors[name]
+                }
+                for name, durations in self._node_durations.items()
+            }
+            providers = {
+                f"{provider}/{model}" if model else provider: {
+                    **{key: counts.get(key, 0) for key in (
+                        "calls", "errors", "retries", "cache_hits", "input_tokens", "output_tokens")},
+                    "cost_usd": round(counts.get("cost_micro_usd", 0) / 1_000_000, 4),
+                    "total_s": round(self._provider_seconds[(provider, model)], 3)
+                }
+                for (provider, model), counts in self._providers.items()
+            }
+        return {
+            "run_id": self.run_id,
+            "duration_s": round(time.time() - self.started, 3),
+            "nodes": nodes,
+            "providers": providers,
+            "total_cost_usd": round(sum(p["cost_usd"] for p in providers.values()), 4)
+        }
+
+    def print_summary(self):
+        """Print the end-of-run summary tables and write the summary as the last record."""
+        summary = self.summary()
+        self._write({"type": "summary", **summary})
+
+        print(f"\n===== Run {summary['run_id']} summary ({summary['duration_s']} s) =====")
+        print(f"{'Node':<38} {'Calls':>6} {'Total s':>9} {'p50 ms':>9} {'p95 ms':>9} {'Errors':>7}")
+        for name, stats in sorted(summary["nodes"].items(), key=lambda item: -item[1]["total_s"]):
+            print(f"{name:<38} {stats['calls']:>6} {stats['total_s']:>9.2f} {stats['p50_ms']:>9.1f} "
+                  f"{stats['p95_ms']:>9.1f} {stats['errors']:>7}")
+
+        print(f"\n{'Provider/model':<38} {'Calls':>6} {'Total s':>9} {'In tok':>9} {'Out tok':>9} "
+              f"{'Cost $':>8} {'Cache':>6} {'Retry':>6} {'Errors':>7}")
+        for name, stats in sorted(summary["providers"].items(), key=lambda item: -item[1]["total_s"]):
+            print(f"{name:<38} {stats['calls']:>6} {stats['total_s']:>9.2f} {stats['input_tokens']:>9} "
+                  f"{stats['output_tokens']:>9} {stats['cost_usd']:>8.4f} {stats['cache_hits']:>6} "
+                  f"{stats['retries']:>6} {stats['errors']:>7}")
+        print(f"\nEstimated total cost: ${summary['total_cost_usd']:.4f}")
+        if self.path:
+            print(f"[INFO] Run records written to {self.path}")
+        return summary
+
+    def _active_call(self, provider):
+        for call in reversed(getattr(self._local, "calls", [])):
+            if call["provider"] == provider:
+                return call
+        return None
+
+    def _record(self, record):
+        lead_id = record.get("lead_id")
+        with self._lock:
+            if record["type"] == "node":
+                self._node_durations[record["node"]].append(record["duration_ms"])
+                if record["error"]:
+                    self._node_errors[record["node"]] += 1
+            else:
+                key = (record["provider"], record["model"])
+                counts = self._providers[key]
+                counts["calls"] += 1
+                counts["errors"] += bool(record["error"])
+                counts["retries"] += record["retries"]
+                counts["cache_hits"] += record["cache_hit"]
+                counts["input_tokens"] += record["input_tokens"]
+                counts["output_tokens"] += record["output_tokens"]
+                counts["cost_micro_usd"] += round(record["cost_usd"] * 1_000_000)
+                self._provider_seconds[key] += record["duration_ms"] / 1000
+                if lead_id is not None:
+                    lead = self._leads[lead_id]
+                    lead["calls"] += 1
+                    lead["input_tokens"] += record["input_tokens"]
+                    lead["output_tokens"] += record["output_tokens"]
+                    lead["cost_usd"] += record["cost_usd"]
+            if record["type"] == "node" and lead_id is not None:
+                self._leads[lead_id]["duration_ms"] += record["duration_ms"]
+        for listener in self._listeners:
+            try:
+                listener(record)
+            except Exception as e:
+                print(f"[WARNING] Instrumentation listener failed: {e}")
+        self._write(record)
+
+    def _write(self, record):
+        if not self.path:
+            return
+        line = json.dumps({"run_id": self.run_id, "ts": round(time.time(), 3), **record}, default=str)
+        with self._lock:
+            try:
+                if self._file is None:
+                    self._file = open(self.path, "a", encoding="utf-8", buffering=1)
+                self._file.write(line + "\n")
+            except OSError as e:
+                print(f"[WARNING] Could not write run record, disabling the run log: {e}")
+                self.path = None
+
+
+class _TrackedCall:
+    def __init__(self, instrumentation, provider, model):
+        self.instrumentation = instrumentation
+        self.record = {
+            "type": "call",
+            "provider": provider,
+            "model": model,
+            "node": None,
+            "lead_id": None,
+            "input_tokens": 0,
+            "output_tokens": 0,
+            "tokens_reported": False,
+            "cache_hit": False,
+            "retries": 0,
+            "status": None,
+            "error": None
+        }
+
+    def __enter__(self):
+        local = self.instrumentation._local
+        self.record["node"] = getattr(local, "node", None)
+        self.record["lead_id"] = getattr(local, "lead_id", None)
+        if not hasattr(local, "calls"):
+            local.calls = []
+        local.calls.append(self.record)
+        self._started = time.perf_counter()
+        return self.record
+
+    def __exit__(self, exc_type, exc, tb):
+        record = self.record
+        record["duration_ms"] = round((time.perf_counter() - self._started) * 1000, 3)
+        if exc_type is not None:
+            record["error"] = exc_type.__name__
+            record["status"] = record["status"] or _status_code(exc)
+        record["rate_limited"] = record["status"] == 429 or "RateLimit" in (record["error"] or "")
+        record["cost_usd"] = 0.0 if record["cache_hit"] else estimate_cost(
+            record["provider"], record["model"], record["input_tokens"], record["output_tokens"]
+        )
+        self.instrumentation._local.calls.remove(record)
+        self.instrumentation._record(record)
+        return False
+
+
+# Shared by the whole process, nodes and tools report to it
+instrumentation = RunInstrumentation()
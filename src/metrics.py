@@ -0,0 +1,267 @@
+"""
+Prometheus metrics
+Small in-process registry of counters, gauges and histograms rendered in the
+Prometheus text format. The outreach process serves it with `start_metrics_server`
+(set METRICS_PORT), the webhook app on GET /metrics.
+
+Recording is a dict lookup for the label values and an add under a per-series
+lock; nothing is computed until the endpoint is scraped.
+"""
+
+import os
+import bisect
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from .instrumentation import instrumentation
+
+METRICS_PORT = os.getenv("METRICS_PORT", "")
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+# Seconds, from in-process nodes up to slow LLM calls
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value))
+
+
+class _Series:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.value = 0.0
+        self.function = None
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount=1):
+        with self._lock:
+            self.value -= amount
+
+    def set(self, value):
+        with self._lock:
+            self.value = value
+
+    def set_function(self, function):
+        """Read the value from `function()` at scrape time (e.g. a queue length)."""
+        self.function = function
+
+    def samples(self):
+        if self.function is not None:
+            try:
+                return [("", {}, self.function())]
+            except Exception:
+                return []
+        return [("", {}, self.value)]
+
+
+class _HistogramSeries:
+    def __init__(self, buckets):
+        self._lock = threading.Lock()
+        self.buckets = buckets
+        # Per bucket counts, the last one is +Inf; made cumulative when rendered
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+
+    def samples(self):
+        with self._lock:
+            counts, total = list(self.counts), self.sum
+        samples, cumulative = [], 0
+        for bound, count in zip((*self.buckets, float("inf")), counts):
+            cumulative += count
+            samples.append(("_bucket", {"le": _format_value(bound)}, cumulative))
+        samples.append(("_sum", {}, total))
+        samples.append(("_count", {}, cumulative))
+        return samples
+
+
+class Metric:
+    """
+    A named metric with optional labels. `labels(...)` returns the series for
+    the label values (created on first use and cached); metrics without labels
+    can be recorded on directly.
+    """
+
+    def __init__(self, kind, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.kind = kind
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+        if not self.labelnames:
+            # Exported as 0 before the first recording
+            self.labels()
+
+    def labels(self, *values):
+        series = self._series.get(values)
+        if series is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}, got {values}")
+            with self._lock:
+                series = self._series.setdefault(
+                    values, _HistogramSeries(self.buckets) if self.kind == "histogram" else _Series()
+                )
+        return series
+
+    def inc(self, amount=1):
+        self.labels().inc(amount)
+
+    def dec(self, amount=1):
+        self.labels().dec(amount)
+
+    def set(self, value):
+        self.labels().set(value)
+
+    def set_function(self, function):
+        self.labels().set_function(function)
+
+    def observe(self, value):
+        self.labels().observe(value)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            series = list(self._series.items())
+        for values, item in series:
+            for suffix, extra_labels, value in item.samples():
+                labels = {**dict(zip(self.labelnames, values)), **extra_labels}
+                label_text = ",".join(f'{key}="{_escape(val)}"' for key, val in labels.items())
+                lines.append(f"{self.name}{suffix}{{{label_text}}} {_format_value(value)}" if label_text
+                             else f"{self.name}{suffix} {_format_value(value)}")
+        return "\n".join(lines)
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = []
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._register(Metric("counter", name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=()):
+        return self._register(Metric("gauge", name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self._register(Metric("histogram", name, documentation, labelnames, buckets))
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format."""
+        return "\n".join(metric.render() for metric in self._metrics) + "\n"
+
+    def _register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+
+registry = MetricsRegistry()
+
+leads_processed = registry.counter("outreach_leads_processed_total", "Leads that went through the whole pipeline")
+leads_qualified = registry.counter("outreach_leads_qualified_total", "Leads scored as qualified")
+leads_failed = registry.counter("outreach_leads_failed_total", "Leads whose processing failed, by failing node", ("node",))
+leads_in_flight = registry.gauge("outreach_leads_in_flight", "Leads currently being processed")
+node_duration = registry.histogram("outreach_node_duration_seconds", "Graph node execution time", ("node",))
+provider_duration = registry.histogram(
+    "outreach_provider_call_duration_seconds", "External provider call time, by calling node", ("provider", "node")
+)
+provider_errors = registry.counter(
+    "outreach_provider_errors_total", "Failed provider calls, reason is rate_limited (429) or error",
+    ("provider", "node", "reason")
+)
+queue_depth = registry.gauge("outreach_queue_depth", "Items waiting in background queues", ("queue",))
+webhook_events = registry.counter("outreach_webhook_events_received_total", "Brevo webhook events received", ("event",))
+webhook_flush_duration = registry.histogram(
+    "outreach_webhook_flush_duration_seconds", "Time to write one batch of buffered webhook events"
+)
+
+_leads_lock = threading.Lock()
+_active_leads = set()
+leads_in_flight.set_function(lambda: len(_active_leads))
+
+
+def lead_started(lead_id):
+    with _leads_lock:
+        _active_leads.add(lead_id)
+
+
+def lead_finished(lead_id):
+    """Count a lead as processed, unless it already finished or failed."""
+    with _leads_lock:
+        if lead_id not in _active_leads:
+            return
+        _active_leads.discard(lead_id)
+    leads_processed.inc()
+
+
+def lead_failed(lead_id, node):
+    """Count a lead as failed once, even if several parallel branches fail."""
+    with _leads_lock:
+        if lead_id in _active_leads:
+            _active_leads.discard(lead_id)
+        elif lead_id is not None:
+            return
+    leads_failed.labels(node).inc()
+
+
+def observe_record(record):
+    """Instrumentation listener turning node and provider call records into metrics."""
+    seconds = record.get("duration_ms", 0) / 1000
+    if record["type"] == "node":
+        node_duration.labels(record["node"]).observe(seconds)
+        if record["error"]:
+            lead_failed(record["lead_id"], record["node"])
+    elif record["type"] == "call":
+        node = record["node"] or "none"
+        provider_duration.labels(record["provider"], node).observe(seconds)
+        if record["rate_limited"]:
+            provider_errors.labels(record["provider"], node, "rate_limited").inc()
+        elif record["error"]:
+            provider_errors.labels(record["provider"], node, "error").inc()
+
+
+instrumentation.add_listener(observe_record)
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = registry.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # No access log line per scrape
+        pass
+
+
+def start_metrics_server(port=METRICS_PORT, host="0.0.0.0"):
+    """
+    Serve /metrics from a background thread.
+
+    Returns:
+        The HTTP server, or None when no port is configured
+    """
+    if not port:
+        return None
+    server = ThreadingHTTPServer((host, int(port)), _MetricsHandler)
+    threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True).start()
+    print(f"[OK] Metrics served on http://{host}:{port}/metrics")
+    return server
@@ -1,16 +1,20 @@
 from colorama import Fore, Style
 from .tools.base.markdown_scraper_tool import scrape_website_to_markdown
 from .tools.base.search_tools import get_recent_news
-from .tools.base.gmail_tools import GmailTools
+from .tools.base.gmail_tools import gmail_outbox
 from .tools.google_docs_tools import GoogleDocsManager
+from .tools.report_uploader import ReportUploader
+from .tools.report_store import LocalReportStore
+from .instrumentation import instrumentation
+from . import metrics
 from .tools.lead_research import research_lead_on_linkedin
 from .tools.company_research import research_lead_company, generate_company_profile
 from .tools.youtube_tools import get_youtube_stats
-from .tools.rag_tool import fetch_similar_case_study
+from .tools.rag_tool import case_study_batcher, warm_up_vector_store
 from .prompts import *
 from .state import LeadData, CompanyData, Report, GraphInputState, GraphState
 from .structured_outputs import WebsiteData, EmailResponse
-from .utils import invoke_llm, get_report, get_current_date, save_reports_locally, GEMINI_FLASH_MODEL, GEMINI_PRO_MODEL
+from .utils import invoke_llm, get_report, get_current_date, GEMINI_FLASH_MODEL, GEMINI_PRO_MODEL
 
 # Enable or disable sending emails directly using GMAIL
 # Should be confident about the quality of the email
@@ -18,6 +22,9 @@ SEND_EMAIL_DIRECTLY = False
 # Enable or disable saving emails to Google Docs
 # By defauly all reports are save locally in `reports` folder
 SAVE_TO_GOOGLE_DOCS = False
+# Enable or disable incremental lead fetching
+# When enabled, only leads added or changed since the last completed run are fetched
+INCREMENTAL_LEAD_FETCH = False
 
 class OutReachAutomationNodes:
     def __init__(self, loader):
@@ -28,17 +35,30 @@ class OutReachAutomationNodes:
         if SAVE_TO_GOOGLE_DOCS:
             print("[INFO] Initializing Google Docs Manager (SAVE_TO_GOOGLE_DOCS enabled)...")
             self.docs_manager = GoogleDocsManager()
+            # Reports are uploaded from a durable background queue so the next lead can start right away
+            self.report_uploader = ReportUploader(self.docs_manager)
+            self.report_uploader.start()
+            metrics.queue_depth.labels("report_uploads").set_function(self.report_uploader.pending_count)
         else:
             print("[INFO] Google Docs Manager disabled (SAVE_TO_GOOGLE_DOCS=False)")
             self.docs_manager = None
 
         self.drive_folder_name = ""
+        self.report_store = LocalReportStore()
+        metrics.queue_depth.labels("local_reports").set_function(self.report_store.pending_count)
+        metrics.queue_depth.labels("gmail").set_function(gmail_outbox.pending_count)
+
+        # Build the case study vector store once, so per-lead RAG is a single query
+        warm_up_vector_store()
 
     def get_new_leads(self, state: GraphInputState):
         print(Fore.YELLOW + "----- Fetching new leads -----\n" + Style.RESET_ALL)
         
         # Fetch new leads using the provided loader
-        raw_leads = self.lead_loader.fetch_records()
+        if INCREMENTAL_LEAD_FETCH:
+            raw_leads = self.lead_loader.fetch_incremental_leads()
+        else:
+            raw_leads = self.lead_loader.fetch_records()
         
         # Structure the leads
         leads = [
@@ -64,16 +84,19 @@ class OutReachAutomationNodes:
         current_lead = None
         if state["leads_data"]:
             current_lead = state["leads_data"].pop()
+            metrics.lead_started(current_lead.id)
         return {"current_lead": current_lead}
 
-    @staticmethod
-    def check_if_there_more_leads(state: GraphState):
+    def check_if_there_more_leads(self, state: GraphState):
         # Number of leads remaining
         num_leads = state["number_leads"]
         if num_leads > 0:
             print(Fore.YELLOW + f"----- Found {num_leads} more leads -----\n" + Style.RESET_ALL)
             return "Found leads"
         else:
+            # All fetched leads are processed, next run can start from the new watermark
+            if INCREMENTAL_LEAD_FETCH:
+                self.lead_loader.commit_watermark()
             print(Fore.GREEN + "----- Finished, No more leads -----\n" + Style.RESET_ALL)
             return "No more leads"
 
@@ -438,6 +461,7 @@ class OutReachAutomationNodes:
 
         is_qualified = score >= 7
         if is_qualified:
+            metrics.leads_qualified.inc()
             print(Fore.GREEN + "Lead is qualified\n" + Style.RESET_ALL)
             return "qualified"
         else:
@@ -458,7 +482,8 @@ class OutReachAutomationNodes:
         
         # TODO Create better description to fetch accurate similar case study using RAG
         # get relevant case study
-        case_study_report = fetch_similar_case_study(general_lead_search_report)
+        # Lookups from leads processed concurrently share one embedding call
+        case_study_report = case_study_batcher.fetch(general_lead_search_report)
         
         inputs = f"""
         **Research Report:**
@@ -502,17 +527,23 @@ class OutReachAutomationNodes:
         folder_link = None
 
         if SAVE_TO_GOOGLE_DOCS and self.docs_manager:
-            new_doc = self.docs_manager.add_document(
-                content=revised_outreach_report,
-                doc_title="Outreach Report",
+            # The link is needed for the email now, the upload itself happens in the background
+            reserved_doc = self.report_uploader.reserve_document(
                 folder_name=self.drive_folder_name,
-                make_shareable=True,
-                folder_shareable=True, # Set to false if only personal or true if with a team
-                markdown=True
+                title="Outreach Report",
+                folder_shareable=True # Set to false if only personal or true if with a team
             )
-            if new_doc:
-                custom_report_link = new_doc.get("shareable_url")
-                folder_link = new_doc.get("folder_url")
+            if reserved_doc:
+                self.report_uploader.enqueue_report(
+                    lead_id=state["current_lead"].id,
+                    folder_name=self.drive_folder_name,
+                    title="Outreach Report",
+                    content=revised_outreach_report,
+                    markdown=True,
+                    file_id=reserved_doc["file_id"]
+                )
+                custom_report_link = reserved_doc.get("shareable_url")
+                folder_link = reserved_doc.get("folder_url")
         else:
             print("[INFO] Skipping Google Docs upload (feature disabled or not configured)")
 
@@ -556,9 +587,8 @@ class OutReachAutomationNodes:
         # Get lead email
         email = state["current_lead"].email
         
-        # Create draft email
-        gmail = GmailTools()
-        gmail.create_draft_email(
+        # Queue draft email, drafts are created in Gmail batch requests
+        gmail_outbox.enqueue_draft(
             recipient=email,
             subject=subject,
             email_content=personalized_email
@@ -566,7 +596,7 @@ class OutReachAutomationNodes:
         
         # Send email directly
         if SEND_EMAIL_DIRECTLY:
-            gmail.send_email(
+            gmail_outbox.enqueue_send(
                 recipient=email,
                 subject=subject,
                 email_content=personalized_email
@@ -627,19 +657,26 @@ class OutReachAutomationNodes:
         # Load all reports
         reports = state["reports"]
         
-        # Ensure reports are saved locally
-        save_reports_locally(reports)
+        # Ensure reports are saved locally (written in the background)
+        self.report_store.save(
+            lead_id=state["current_lead"].id,
+            lead_name=state["current_lead"].name,
+            company_name=state["company_data"].name,
+            reports=reports
+        )
 
         # Save all reports to Google docs (if enabled and configured)
         if SAVE_TO_GOOGLE_DOCS and self.docs_manager:
-            print("[INFO] Uploading reports to Google Docs...")
+            print("[INFO] Uploading reports to Google Docs in the background...")
             for report in reports:
-                self.docs_manager.add_document(
-                    content=report.content,
-                    doc_title=report.title,
-                    folder_name=self.drive_folder_name,
-                    markdown=report.is_markdown
-                )
+                if report and not isinstance(report, str):
+                    self.report_uploader.enqueue_report(
+                        lead_id=state["current_lead"].id,
+                        folder_name=self.drive_folder_name,
+                        title=report.title,
+                        content=report.content,
+                        markdown=report.is_markdown
+                    )
         else:
             print("[INFO] Reports saved locally only (Google Docs disabled)")
 
@@ -657,6 +694,10 @@ class OutReachAutomationNodes:
             "Last Contacted": get_current_date()
         }
         self.lead_loader.update_record(state["current_lead"].id, new_data)
+
+        # Lead is done, write its totals to the run records
+        instrumentation.finish_lead(state["current_lead"].id)
+        metrics.lead_finished(state["current_lead"].id)
         
         # reset reports list
         state["reports"] = []
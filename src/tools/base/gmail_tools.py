@@ -1,43 +1,223 @@
+import time
 import base64
+import random
+import threading
+import atexit
+import httplib2
+from google_auth_httplib2 import AuthorizedHttp
 from googleapiclient.discovery import build
 from email.mime.text import MIMEText
 from src.utils import get_google_credentials
+from src.instrumentation import instrumentation
+
+# Drafts/emails sent per Gmail batch request (Gmail recommends at most 50)
+GMAIL_BATCH_SIZE = 50
+# Seconds queued emails wait for more to fill a batch
+GMAIL_FLUSH_INTERVAL = 5
+GMAIL_MAX_RETRIES = 5
+# Rate limit and transient server errors worth retrying
+RETRYABLE_STATUSES = {429, 500, 502, 503}
+
+_service = None
+_credentials = None
+_service_lock = threading.Lock()
+# httplib2 is not thread safe: every thread gets its own authorized connection
+_thread_local = threading.local()
+
+
+def get_gmail_service():
+    """Shared Gmail API client, built on first use."""
+    global _service, _credentials
+    with _service_lock:
+        if _service is None:
+            _credentials = get_google_credentials()
+            _service = build('gmail', 'v1', credentials=_credentials)
+    return _service
+
+
+def _http():
+    """Authorized HTTP connection for the current thread."""
+    get_gmail_service()
+    http = getattr(_thread_local, "http", None)
+    if http is None:
+        http = AuthorizedHttp(_credentials, http=httplib2.Http())
+        _thread_local.http = http
+    return http
+
+
+def _create_message(recipient, subject, text):
+    message = MIMEText(text)
+    message['to'] = recipient
+    message['subject'] = subject
+    return message
+
+
+def _encode_message(message):
+    return base64.urlsafe_b64encode(message.as_bytes()).decode()
+
+
+def _is_retryable(error):
+    status = getattr(getattr(error, "resp", None), "status", None)
+    return int(status or 0) in RETRYABLE_STATUSES or "rateLimitExceeded" in str(error)
+
 
 class GmailTools:
     def __init__(self):
-        self.service = build('gmail', 'v1', credentials=get_google_credentials())
+        self.service = get_gmail_service()
 
     def create_draft_email(self, recipient, subject, email_content):
         try:
-            message = self._create_message(recipient, subject, email_content)
+            message = _create_message(recipient, subject, email_content)
             draft = self.service.users().drafts().create(userId='me', body={
                 'message': {
-                    'raw': self._encode_message(message)
+                    'raw': _encode_message(message)
                 }
-            }).execute()
+            }).execute(http=_http())
             print(f"Draft created for email for {recipient} with subject '{subject}'")
             return draft
         except Exception as error:
             print(f"An error occurred while creating draft: {error}")
             return None
-        
+
     def send_email(self, recipient, subject, email_content):
         try:
-            message = self._create_message(recipient, subject, email_content)
+            message = _create_message(recipient, subject, email_content)
             sent_message = self.service.users().messages().send(userId='me', body={
-                'raw': self._encode_message(message)
-            }).execute()
+                'raw': _encode_message(message)
+            }).execute(http=_http())
             print(f"Email sent to {recipient} with subject '{subject}'")
             return sent_message
         except Exception as error:
             print(f"An error occurred while sending reply: {error}")
             return None
 
-    def _create_message(self, recipient, subject, text):
-        message = MIMEText(text)
-        message['to'] = recipient
-        message['subject'] = subject
-        return message
 
-    def _encode_message(self, message):
-        return base64.urlsafe_b64encode(message.as_bytes()).decode()
\ No newline at end of file
+class GmailOutbox:
+    """
+    Queues drafts and emails and creates them with Gmail HTTP batch requests.
+
+    A background thread sends a batch once `batch_size` emails are queued or
+    `flush_interval` seconds passed. Emails rejected with a rate limit or a
+    transient server error are re-queued with exponential backoff.
+    """
+
+    def __init__(self, batch_size=GMAIL_BATCH_SIZE, flush_interval=GMAIL_FLUSH_INTERVAL):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._pending = []
+        self._in_flight = 0
+        self._flushing = False
+        self._cond = threading.Condition()
+        self._thread = None
+
+    def enqueue_draft(self, recipient, subject, email_content):
+        """Queue a draft email. Returns immediately."""
+        self._put("draft", recipient, subject, email_content)
+
+    def enqueue_send(self, recipient, subject, email_content):
+        """Queue an email to send. Returns immediately."""
+        self._put("send", recipient, subject, email_content)
+
+    def pending_count(self):
+        with self._cond:
+            return len(self._pending) + self._in_flight
+
+    def flush(self):
+        """Block until every queued email is processed."""
+        with self._cond:
+            if self._thread is None:
+                return
+            self._flushing = True
+            self._cond.notify_all()
+            self._cond.wait_for(lambda: not self._pending and not self._in_flight)
+            self._flushing = False
+
+    def _put(self, kind, recipient, subject, email_content):
+        with self._cond:
+            self._pending.append({
+                "kind": kind,
+                "recipient": recipient,
+                "subject": subject,
+                "content": email_content,
+                "attempts": 0,
+                "not_before": 0
+            })
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="gmail-outbox", daemon=True)
+                self._thread.start()
+                atexit.register(self.flush)
+            if len(self._pending) >= self.batch_size:
+                self._cond.notify_all()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._pending)
+                if len(self._pending) < self.batch_size and not self._flushing:
+                    self._cond.wait(self.flush_interval)
+                now = time.time()
+                batch = [item for item in self._pending if item["not_before"] <= now][:self.batch_size]
+                for item in batch:
+                    self._pending.remove(item)
+                self._in_flight = len(batch)
+
+            if batch:
+                retries = self._send_batch(batch)
+            else:
+                # Everything queued is backing off
+                time.sleep(0.5)
+                retries = []
+
+            with self._cond:
+                self._pending.extend(retries)
+                self._in_flight = 0
+                self._cond.notify_all()
+
+    @instrumentation.tracked("gmail")
+    def _send_batch(self, batch):
+        """Send one batch request, returning the emails to retry later."""
+        retries = []
+        answered = set()
+
+        def retry(item, error):
+            item["attempts"] += 1
+            instrumentation.record_retry("gmail")
+            if item["attempts"] > GMAIL_MAX_RETRIES:
+                print(f"[ERROR] Giving up on email for {item['recipient']}: {error}")
+                return
+            item["not_before"] = time.time() + 2 ** item["attempts"] + random.random()
+            retries.append(item)
+
+        def on_response(request_id, response, exception):
+            answered.add(int(request_id))
+            item = batch[int(request_id)]
+            if exception is None:
+                action = "Draft created for email" if item["kind"] == "draft" else "Email sent"
+                print(f"{action} for {item['recipient']} with subject '{item['subject']}'")
+            elif _is_retryable(exception):
+                retry(item, exception)
+            else:
+                print(f"An error occurred while creating email for {item['recipient']}: {exception}")
+
+        try:
+            service = get_gmail_service()
+            http_batch = service.new_batch_http_request(callback=on_response)
+            for i, item in enumerate(batch):
+                raw = _encode_message(_create_message(item["recipient"], item["subject"], item["content"]))
+                if item["kind"] == "draft":
+                    request = service.users().drafts().create(userId='me', body={'message': {'raw': raw}})
+                else:
+                    request = service.users().messages().send(userId='me', body={'raw': raw})
+                http_batch.add(request, request_id=str(i))
+            http_batch.execute(http=_http())
+        except Exception as error:
+            # The batch request itself failed, retry the emails it did not answer
+            print(f"[WARNING] Gmail batch request failed: {error}")
+            for i, item in enumerate(batch):
+                if i not in answered:
+                    retry(item, error)
+        return retries
+
+
+# Shared outbox: the workflow only enqueues, drafts are created in batches
+gmail_outbox = GmailOutbox()
@@ -1,8 +1,128 @@
 import os
+import json
+import time
+import threading
 import requests
 from src.utils import invoke_llm, GEMINI_FLASH_MODEL
+from src.instrumentation import instrumentation
 from linkedin_api import Linkedin
 
+# Directory where the linkedin-api session cookies are persisted between runs
+LINKEDIN_COOKIES_DIR = os.getenv("LINKEDIN_COOKIES_DIR", ".linkedin_session/")
+# Minimum delay (seconds) between two LinkedIn requests to avoid account throttling
+LINKEDIN_MIN_REQUEST_INTERVAL = float(os.getenv("LINKEDIN_MIN_REQUEST_INTERVAL", "2"))
+# Scraped profiles cache, shared by the linkedin-api and RapidAPI paths
+LINKEDIN_CACHE_FILE = os.getenv("LINKEDIN_CACHE_FILE", ".linkedin_session/profiles_cache.json")
+LINKEDIN_CACHE_TTL = int(os.getenv("LINKEDIN_CACHE_TTL", str(7 * 24 * 3600)))
+
+
+class LinkedInSession:
+    """
+    Process-wide linkedin-api client.
+    Logs in once (reusing cookies persisted on disk when they are still valid)
+    and serializes requests with a minimum interval between them.
+    """
+
+    def __init__(self, cookies_dir=LINKEDIN_COOKIES_DIR, min_interval=LINKEDIN_MIN_REQUEST_INTERVAL):
+        self.cookies_dir = cookies_dir
+        self.min_interval = min_interval
+        self._client = None
+        self._lock = threading.Lock()
+        self._last_request = 0.0
+
+    def _get_client(self):
+        if self._client is None:
+            email = os.getenv("LINKEDIN_EMAIL")
+            password = os.getenv("LINKEDIN_PASSWORD")
+            if not email or not password:
+                return None
+            os.makedirs(self.cookies_dir, exist_ok=True)
+            # linkedin-api loads cookies from cookies_dir and only re-authenticates when they expired
+            self._client = Linkedin(email, password, cookies_dir=self.cookies_dir)
+        return self._client
+
+    def call(self, method_name, *args, **kwargs):
+        """
+        Call a linkedin-api client method under the session lock and rate limit.
+        Returns None if LinkedIn credentials are not configured.
+        """
+        with self._lock:
+            client = self._get_client()
+            if client is None:
+                print("LinkedIn credentials not found in environment variables")
+                return None
+
+            wait = self.min_interval - (time.monotonic() - self._last_request)
+            if wait > 0:
+                time.sleep(wait)
+            try:
+                return getattr(client, method_name)(*args, **kwargs)
+            finally:
+                self._last_request = time.monotonic()
+
+
+class LinkedInProfileCache:
+    """
+    JSON file cache of scraped profiles keyed by LinkedIn public id, with a TTL.
+    """
+
+    def __init__(self, cache_file=LINKEDIN_CACHE_FILE, ttl=LINKEDIN_CACHE_TTL):
+        self.cache_file = cache_file
+        self.ttl = ttl
+        self._entries = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        if self._entries is None:
+            self._entries = {}
+            if os.path.exists(self.cache_file):
+                try:
+                    with open(self.cache_file, "r", encoding="utf-8") as file:
+                        self._entries = json.load(file)
+                except (OSError, ValueError) as e:
+                    print(f"[WARNING] Could not read LinkedIn cache, starting empty: {e}")
+        return self._entries
+
+    def get(self, key):
+        with self._lock:
+            entry = self._load().get(key)
+            if entry and time.time() - entry["cached_at"] < self.ttl:
+                return entry["data"]
+            return None
+
+    def set(self, key, data):
+        with self._lock:
+            entries = self._load()
+            entries[key] = {"cached_at": time.time(), "data": data}
+            # Drop expired entries while we rewrite the file
+            now = time.time()
+            self._entries = {k: v for k, v in entries.items() if now - v["cached_at"] < self.ttl}
+
+            cache_dir = os.path.dirname(self.cache_file)
+            if cache_dir:
+                os.makedirs(cache_dir, exist_ok=True)
+            temp_path = f"{self.cache_file}.tmp"
+            with open(temp_path, "w", encoding="utf-8") as file:
+                json.dump(self._entries, file)
+            os.replace(temp_path, self.cache_file)
+
+
+linkedin_session = LinkedInSession()
+linkedin_cache = LinkedInProfileCache()
+
+
+def get_linkedin_public_id(linkedin_url):
+    """
+    Extracts the public id from a LinkedIn URL.
+    URL format: https://www.linkedin.com/in/profile-id/ or https://www.linkedin.com/company/company-id/
+    """
+    return linkedin_url.split("?")[0].rstrip('/').split('/')[-1]
+
+
+def get_linkedin_cache_key(linkedin_url, is_company=False):
+    kind = "company" if is_company else "person"
+    return f"{kind}:{get_linkedin_public_id(linkedin_url).lower()}"
+
 def extract_linkedin_url_base(search_results):
     """
     Extracts the LinkedIn URL from the search results.
@@ -34,6 +154,7 @@ def extract_linkedin_url(search_results):
     return result
     
     
+@instrumentation.tracked("linkedin")
 def scrape_linkedin_with_api(linkedin_url, is_company=False):
     """
     Scrapes LinkedIn profile data using the linkedin-api package.
@@ -41,25 +162,31 @@ def scrape_linkedin_with_api(linkedin_url, is_company=False):
     @param linkedin_url: The LinkedIn URL to scrape.
     @param is_company: Boolean indicating whether to scrape a company profile or a person profile.
     @return: The scraped LinkedIn profile data in a standardized format.
+
+    Requests go through the shared `linkedin_session`, results are cached by public id.
     """
-    try:
-        # Initialize LinkedIn API client
-        email = os.getenv("LINKEDIN_EMAIL")
-        password = os.getenv("LINKEDIN_PASSWORD")
+    cache_key = get_linkedin_cache_key(linkedin_url, is_company)
+    cached = linkedin_cache.get(cache_key)
+    if cached is not None:
+        instrumentation.record_cache_hit("linkedin")
+        return cached
 
-        if not email or not password:
-            print("LinkedIn credentials not found in environment variables")
-            return None
+    data = _scrape_linkedin_with_api(linkedin_url, is_company)
+    if data:
+        linkedin_cache.set(cache_key, data)
+    return data
 
-        api = Linkedin(email, password)
 
+def _scrape_linkedin_with_api(linkedin_url, is_company=False):
+    try:
         # Extract profile ID from URL
-        # URL format: https://www.linkedin.com/in/profile-id/ or https://www.linkedin.com/company/company-id/
-        profile_id = linkedin_url.rstrip('/').split('/')[-1]
+        profile_id = get_linkedin_public_id(linkedin_url)
 
         if is_company:
-            # Get company profile
-            company_data = api.get_company(profile_id)
+            # Get company profile through the shared session
+            company_data = linkedin_session.call("get_company", profile_id)
+            if company_data is None:
+                return None
             # Transform to match the expected format
             return {
                 "data": {
@@ -75,8 +202,10 @@ def scrape_linkedin_with_api(linkedin_url, is_company=False):
                 }
             }
         else:
-            # Get person profile
-            profile_data = api.get_profile(profile_id)
+            # Get person profile through the shared session
+            profile_data = linkedin_session.call("get_profile", profile_id)
+            if profile_data is None:
+                return None
 
             # Debug: Print available keys to understand structure
             print(f"[DEBUG] LinkedIn profile keys: {list(profile_data.keys())[:20]}")
@@ -163,6 +292,12 @@ def scrape_linkedin(linkedin_url, is_company=False, use_rapidapi=False):
     """
     # Check if we should use RapidAPI or linkedin-api
     if use_rapidapi and os.getenv("RAPIDAPI_KEY") and os.getenv("RAPIDAPI_KEY") != "rapid-api-key":
+        # Both paths return the same format, so they share one cache
+        cache_key = get_linkedin_cache_key(linkedin_url, is_company)
+        cached = linkedin_cache.get(cache_key)
+        if cached is not None:
+            return cached
+
         # Use RapidAPI method
         if is_company:
             url = "https://fresh-linkedin-profile-data.p.rapidapi.com/get-company-by-linkedinurl"
@@ -178,6 +313,7 @@ def scrape_linkedin(linkedin_url, is_company=False, use_rapidapi=False):
         response = requests.get(url, headers=headers, params=querystring)
         if response.status_code == 200:
             data = response.json()
+            linkedin_cache.set(cache_key, data)
             return data
         else:
             print(f"RapidAPI request failed with status code: {response.status_code}")
@@ -2,7 +2,9 @@ import re
 import html2text
 import requests
 from bs4 import BeautifulSoup
+from src.instrumentation import instrumentation
 
+@instrumentation.tracked("scrape")
 def scrape_website_to_markdown(url: str) -> str:
     headers = {
         "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.77 Safari/537.36",
@@ -12,6 +14,7 @@ def scrape_website_to_markdown(url: str) -> str:
 
     # Make the HTTP request
     response = requests.get(url, headers=headers)
+    instrumentation.record_status("scrape", response.status_code)
     if response.status_code != 200:
         raise Exception(f"Failed to fetch the URL. Status code: {response.status_code}")
 
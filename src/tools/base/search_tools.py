@@ -1,7 +1,9 @@
 import os
 import json
 import requests
+from src.instrumentation import instrumentation
 
+@instrumentation.tracked("serper")
 def google_search(query):
     """
     Performs a Google search using the provided query.
@@ -13,9 +15,11 @@ def google_search(query):
         'content-type': 'application/json'
     }
     response = requests.request("POST", url, headers=headers, data=payload)
+    instrumentation.record_status("serper", response.status_code)
     results = response.json().get('organic', [])
     return results
 
+@instrumentation.tracked("serper")
 def get_recent_news(company: str) -> str:
     url = "https://google.serper.dev/news"
     
@@ -34,6 +38,7 @@ def get_recent_news(company: str) -> str:
     
     # Make the POST request to the API
     response = requests.post(url, headers=headers, data=payload)
+    instrumentation.record_status("serper", response.status_code)
     
     # Check if the response is successful
     if response.status_code == 200:
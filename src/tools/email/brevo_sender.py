@@ -6,10 +6,11 @@ Handles transactional email sending with tracking via Brevo API
 import os
 import sib_api_v3_sdk
 from sib_api_v3_sdk.rest import ApiException
-import uuid
-from datetime import datetime
-import psycopg2
 from psycopg2.extras import RealDictCursor
+from .db import db_connection
+from .send_log import email_send_logger
+from .outbox import enqueue_email, OutboxDispatcher, OUTBOX_SEND_HOLD
+from .rollups import get_daily_stats
 
 
 class BrevoEmailSender:
@@ -18,21 +19,25 @@ class BrevoEmailSender:
         configuration = sib_api_v3_sdk.Configuration()
         configuration.api_key['api-key'] = os.getenv('BREVO_API_KEY')
 
-        self.api_instance = sib_api_v3_sdk.TransactionalEmailsApi(
-            sib_api_v3_sdk.ApiClient(configuration)
-        )
+        self.api_client = sib_api_v3_sdk.ApiClient(configuration)
+        self.api_instance = sib_api_v3_sdk.TransactionalEmailsApi(self.api_client)
 
         # Email config
         self.sender_email = os.getenv('SENDER_EMAIL')
         self.sender_name = os.getenv('SENDER_NAME', 'AI SDR')
         self.tracking_domain = os.getenv('TRACKING_DOMAIN')
+        # Brevo tag the sends are grouped under in the daily stats
+        self.campaign_tag = os.getenv('BREVO_CAMPAIGN_TAG', 'cold_outreach')
 
-        # Database connection
+        # Database connection (pooled, shared by the process)
         self.db_url = os.getenv('DATABASE_URL')
+        self.send_logger = email_send_logger
+        # Sends the emails this sender queues, in the calling thread
+        self.outbox = OutboxDispatcher(sender=self)
 
     def _get_db_connection(self):
-        """Get database connection"""
-        return psycopg2.connect(self.db_url)
+        """Borrow a pooled database connection (use as a context manager)"""
+        return db_connection(self.db_url)
 
     def generate_tracking_pixel(self, tracking_token):
         """Generate tracking pixel HTML"""
@@ -43,6 +48,11 @@ class BrevoEmailSender:
         """
         Send email via Brevo with tracking.
 
+        The email is queued in the outbox and sent right away from it, so the send
+        record is written in the same transaction that marks it sent. If this process
+        dies before sending, an outbox dispatcher sends it after OUTBOX_SEND_HOLD seconds;
+        if delivery fails, dispatchers retry it with backoff.
+
         Args:
             lead_id: Lead identifier
             to_email: Recipient email
@@ -54,10 +64,34 @@ class BrevoEmailSender:
         Returns:
             tuple: (send_id, success)
         """
+        send_id = self.queue_email(
+            lead_id, to_email, to_name, subject, html_content, reply_to_email, hold_seconds=OUTBOX_SEND_HOLD
+        )
+        return send_id, self.outbox.send(send_id)
+
+    def queue_email(self, lead_id, to_email, to_name, subject, html_content, reply_to_email=None, conn=None,
+                    hold_seconds=0):
+        """
+        Queue an email in the transactional outbox instead of sending it now.
+        It is sent by an outbox dispatcher (python -m src.tools.email.outbox).
+
+        Args:
+            conn: Optional open connection, to write the email in the caller's transaction
+            hold_seconds: Seconds before dispatchers may pick it up, when the caller sends it itself
+
+        Returns:
+            str: send_id of the email
+        """
+        return enqueue_email(lead_id, to_email, to_name, subject, html_content, reply_to_email,
+                             conn=conn, hold_seconds=hold_seconds)
 
-        # Generate unique tracking token
-        tracking_token = str(uuid.uuid4())[:16]
+    def deliver(self, lead_id, to_email, to_name, subject, html_content, tracking_token, reply_to_email=None):
+        """
+        Send one email through the Brevo API, without logging it.
 
+        Returns:
+            str: Brevo message id (raises ApiException on failure)
+        """
         # Add tracking pixel to email
         tracking_pixel = self.generate_tracking_pixel(tracking_token)
         html_with_tracking = html_content + tracking_pixel
@@ -68,7 +102,7 @@ class BrevoEmailSender:
             to=[{"email": to_email, "name": to_name}],
             subject=subject,
             html_content=html_with_tracking,
-            tags=["ai_sdr", "cold_outreach", f"lead_{lead_id}"],
+            tags=["ai_sdr", self.campaign_tag, f"lead_{lead_id}"],
             # Enable tracking
             params={
                 "tracking_token": tracking_token,
@@ -80,141 +114,53 @@ class BrevoEmailSender:
         if reply_to_email:
             send_smtp_email.reply_to = {"email": reply_to_email}
 
-        try:
-            # Send via Brevo
-            api_response = self.api_instance.send_transac_email(send_smtp_email)
-
-            # Brevo returns message-id
-            brevo_message_id = api_response.message_id
-
-            print(f"✅ Email sent via Brevo. Message ID: {brevo_message_id}")
-
-            # Log to database
-            send_id = self._log_email_send(
-                lead_id=lead_id,
-                lead_email=to_email,
-                subject=subject,
-                body_html=html_content,
-                tracking_token=tracking_token,
-                brevo_message_id=brevo_message_id,
-                status='sent'
-            )
-
-            return send_id, True
+        api_response = self.api_instance.send_transac_email(send_smtp_email)
 
-        except ApiException as e:
-            print(f"❌ Brevo API Error: {e}")
-
-            # Log failure
-            send_id = self._log_email_send(
-                lead_id=lead_id,
-                lead_email=to_email,
-                subject=subject,
-                body_html=html_content,
-                tracking_token=tracking_token,
-                status='failed'
-            )
-
-            return send_id, False
-
-    def _log_email_send(self, lead_id, lead_email, subject, body_html,
-                       tracking_token, brevo_message_id=None, status='queued'):
-        """Log email send to database"""
-        conn = self._get_db_connection()
-        cur = conn.cursor()
+        # Brevo returns message-id
+        brevo_message_id = api_response.message_id
 
-        try:
-            cur.execute("""
-                INSERT INTO email_sends
-                (lead_id, lead_email, subject, body_html, tracking_pixel_token,
-                 sendgrid_message_id, status, sent_at)
-                VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-                RETURNING send_id
-            """, (
-                lead_id, lead_email, subject, body_html, tracking_token,
-                brevo_message_id,  # Using same column for Brevo ID
-                status,
-                datetime.now() if status == 'sent' else None
-            ))
-
-            send_id = cur.fetchone()[0]
-            conn.commit()
-            return send_id
-
-        finally:
-            cur.close()
-            conn.close()
+        print(f"✅ Email sent via Brevo. Message ID: {brevo_message_id}")
+        return brevo_message_id
 
     def get_send_status(self, send_id):
         """Get email send status and engagement"""
-        conn = self._get_db_connection()
-        cur = conn.cursor(cursor_factory=RealDictCursor)
-
-        try:
-            cur.execute("""
-                SELECT
-                    send_id, lead_id, lead_email, subject, status,
-                    sent_at, delivered_at, opened_at, clicked_at, replied_at,
-                    open_count, click_count
-                FROM email_sends
-                WHERE send_id = %s
-            """, (send_id,))
-
-            return cur.fetchone()
-
-        finally:
-            cur.close()
-            conn.close()
-
-    def get_account_stats(self, days=7):
+        # The record may still be buffered
+        if self.send_logger.is_pending(send_id):
+            self.send_logger.flush()
+
+        with self._get_db_connection() as conn:
+            with conn.cursor(cursor_factory=RealDictCursor) as cur:
+                cur.execute("""
+                    SELECT
+                        send_id, lead_id, lead_email, subject, status,
+                        sent_at, delivered_at, opened_at, clicked_at, replied_at,
+                        open_count, click_count
+                    FROM email_sends
+                    WHERE send_id = %s
+                """, (send_id,))
+
+                return cur.fetchone()
+
+    def get_account_stats(self, days=7, campaign=None):
         """
-        Get sending statistics from Brevo API.
+        Get sending statistics from the daily rollups (one row per day and campaign tag).
+
+        Args:
+            days: Number of days to cover, today included
+            campaign: Optional campaign tag to restrict the stats to
 
         Returns:
             dict: Statistics including sent, delivered, opened, clicked
         """
         try:
-            # Use Brevo's statistics API
-            from datetime import timedelta
-
-            end_date = datetime.now().strftime("%Y-%m-%d")
-            start_date = (datetime.now() - timedelta(days=days)).strftime("%Y-%m-%d")
-
-            stats_api = sib_api_v3_sdk.EmailCampaignsApi(
-                sib_api_v3_sdk.ApiClient(configuration)
-            )
-
-            # Note: Brevo's stats API is primarily for campaigns
-            # For transactional emails, use webhook data or database queries
-            conn = self._get_db_connection()
-            cur = conn.cursor(cursor_factory=RealDictCursor)
-
-            cur.execute("""
-                SELECT
-                    COUNT(*) as total_sent,
-                    SUM(CASE WHEN status = 'delivered' THEN 1 ELSE 0 END) as delivered,
-                    SUM(CASE WHEN opened_at IS NOT NULL THEN 1 ELSE 0 END) as opened,
-                    SUM(CASE WHEN clicked_at IS NOT NULL THEN 1 ELSE 0 END) as clicked,
-                    SUM(CASE WHEN replied_at IS NOT NULL THEN 1 ELSE 0 END) as replied,
-                    SUM(CASE WHEN status = 'bounced' THEN 1 ELSE 0 END) as bounced
-                FROM email_sends
-                WHERE sent_at >= NOW() - INTERVAL '%s days'
-            """, (days,))
-
-            stats = cur.fetchone()
-            cur.close()
-            conn.close()
+            stats = get_daily_stats(days, campaign)
+            sent = stats['sent']
 
             return {
-                'sent': stats['total_sent'],
-                'delivered': stats['delivered'],
-                'opened': stats['opened'],
-                'clicked': stats['clicked'],
-                'replied': stats['replied'],
-                'bounced': stats['bounced'],
-                'open_rate': (stats['opened'] / stats['total_sent'] * 100) if stats['total_sent'] > 0 else 0,
-                'click_rate': (stats['clicked'] / stats['total_sent'] * 100) if stats['total_sent'] > 0 else 0,
-                'reply_rate': (stats['replied'] / stats['total_sent'] * 100) if stats['total_sent'] > 0 else 0
+                **stats,
+                'open_rate': (stats['opened'] / sent * 100) if sent > 0 else 0,
+                'click_rate': (stats['clicked'] / sent * 100) if sent > 0 else 0,
+                'reply_rate': (stats['replied'] / sent * 100) if sent > 0 else 0
             }
 
         except Exception as e:
@@ -227,9 +173,7 @@ class BrevoEmailSender:
         This is required before sending.
         """
         try:
-            senders_api = sib_api_v3_sdk.SendersApi(
-                sib_api_v3_sdk.ApiClient(configuration)
-            )
+            senders_api = sib_api_v3_sdk.SendersApi(self.api_client)
 
             senders = senders_api.get_senders()
 
@@ -0,0 +1,245 @@
+"""
+Bulk email sending engine
+Fans out campaign sends over a bounded worker pool, within global and
+per-domain rate caps and configured send windows
+"""
+
+import os
+import time
+import threading
+from collections import deque
+from datetime import datetime, timedelta
+from concurrent.futures import Future, ThreadPoolExecutor
+from psycopg2.extras import RealDictCursor
+from .db import db_connection
+from .brevo_sender import BrevoEmailSender
+from .outbox import enqueue_emails
+
+BULK_SEND_WORKERS = int(os.getenv("BULK_SEND_WORKERS", "8"))
+# Caps on emails sent per hour, overall and per recipient domain
+BULK_SEND_MAX_PER_HOUR = int(os.getenv("BULK_SEND_MAX_PER_HOUR", "3000"))
+BULK_SEND_MAX_PER_DOMAIN_PER_HOUR = int(os.getenv("BULK_SEND_MAX_PER_DOMAIN_PER_HOUR", "120"))
+# Local time windows emails may go out in, e.g. "09:00-12:00,14:00-17:30" (empty = any time)
+BULK_SEND_WINDOWS = os.getenv("BULK_SEND_WINDOWS", "")
+
+
+class TokenBucket:
+    """Allows `per_hour` events per hour, in bursts of at most a minute's worth."""
+
+    def __init__(self, per_hour):
+        self.rate = per_hour / 3600.0
+        self.capacity = max(1.0, per_hour / 60.0)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, now):
+        """Seconds until a token is available."""
+        self._refill(now)
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def take(self):
+        self.tokens -= 1
+
+
+def parse_send_windows(windows):
+    """Parse "HH:MM-HH:MM,..." into a list of (start, end) datetime.time pairs."""
+    parsed = []
+    for window in filter(None, (w.strip() for w in windows.split(","))):
+        start, end = window.split("-")
+        parsed.append((
+            datetime.strptime(start.strip(), "%H:%M").time(),
+            datetime.strptime(end.strip(), "%H:%M").time()
+        ))
+    return parsed
+
+
+def seconds_until_window(windows, now=None):
+    """Seconds until the next send window opens, 0 when inside one (or none are configured)."""
+    if not windows:
+        return 0.0
+    now = now or datetime.now()
+    waits = []
+    for start, end in windows:
+        current = now.time()
+        # Windows with end < start run over midnight
+        inside = start <= current < end if start <= end else (current >= start or current < end)
+        if inside:
+            return 0.0
+        next_start = datetime.combine(now.date(), start)
+        if next_start <= now:
+            next_start += timedelta(days=1)
+        waits.append((next_start - now).total_seconds())
+    return min(waits)
+
+
+class BulkEmailSender:
+    """
+    Sends many emails through `BrevoEmailSender` without blocking the caller.
+
+    Messages are queued and handed to a pool of `workers` threads by a dispatcher
+    that only releases a send when the global and the recipient domain rate caps
+    allow it and the current time is inside a send window. Domains are served
+    round-robin, so one throttled domain never holds back the others.
+    Submitted emails are written to the outbox in one insert, tagged as bulk rows:
+    outbox dispatchers never send them, so they only go out within these caps and
+    windows. `resume` re-queues the ones a stopped process left pending.
+    Results go through the sender's buffered logger: the `email_sends` records and
+    their outbox rows are written for many sends at a time, in one transaction.
+
+    Args:
+        sender: BrevoEmailSender to send with (one is created if omitted)
+        workers: Concurrent Brevo API calls
+        max_per_hour: Global send cap
+        max_per_domain_per_hour: Send cap per recipient domain
+        send_windows: "HH:MM-HH:MM,..." local time windows
+    """
+
+    def __init__(self, sender=None, workers=BULK_SEND_WORKERS, max_per_hour=BULK_SEND_MAX_PER_HOUR,
+                 max_per_domain_per_hour=BULK_SEND_MAX_PER_DOMAIN_PER_HOUR, send_windows=BULK_SEND_WINDOWS):
+        self.sender = sender or BrevoEmailSender()
+        self.workers = workers
+        self.max_per_domain_per_hour = max_per_domain_per_hour
+        self.send_windows = parse_send_windows(send_windows)
+
+        self._global_bucket = TokenBucket(max_per_hour)
+        self._domain_buckets = {}
+        # Recipient domain -> queue of (message, send_id, tracking token, future); dict order is the round-robin order
+        self._queues = {}
+        self._cond = threading.Condition()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bulk-send")
+        # Keeps at most a couple of sends per worker queued in the executor
+        self._slots = threading.BoundedSemaphore(workers * 2)
+        self._dispatcher = None
+
+    def submit(self, messages):
+        """
+        Queue a batch of emails. Returns immediately.
+
+        Args:
+            messages: List of dicts with "lead_id", "to_email", "to_name", "subject",
+                      "html_content" and optional "reply_to_email"
+
+        Returns:
+            list: One Future per message, resolving to (send_id, success)
+        """
+        queued = enqueue_emails(messages, bulk=True)
+        return self._queue([
+            (message, send_id, tracking_token) for message, (send_id, tracking_token) in zip(messages, queued)
+        ])
+
+    def resume(self):
+        """
+        Queue the bulk emails left pending in the outbox, e.g. by a process that stopped
+        mid-campaign. Call it once at startup, from a single process, before submitting.
+        Sends delivered in the last flush interval before a crash may not be recorded
+        yet and are sent again.
+
+        Returns:
+            list: One Future per resumed email, resolving to (send_id, success)
+        """
+        with db_connection() as conn, conn.cursor(cursor_factory=RealDictCursor) as cur:
+            cur.execute("""
+                SELECT send_id, lead_id, to_email, to_name, subject, html_content, reply_to_email, tracking_token
+                FROM email_outbox
+                WHERE bulk AND status = 'pending'
+                ORDER BY created_at
+            """)
+            rows = cur.fetchall()
+        if rows:
+            print(f"[INFO] Resuming {len(rows)} pending bulk emails")
+        return self._queue([
+            ({key: row[key] for key in ("lead_id", "to_email", "to_name", "subject", "html_content", "reply_to_email")},
+             str(row["send_id"]), row["tracking_token"])
+            for row in rows
+        ])
+
+    def _queue(self, items):
+        """Hand (message, send_id, tracking token) items to the dispatcher. Returns their Futures."""
+        futures = []
+        with self._cond:
+            for message, send_id, tracking_token in items:
+                future = Future()
+                domain = message["to_email"].rsplit("@", 1)[-1].lower()
+                self._queues.setdefault(domain, deque()).append((message, send_id, tracking_token, future))
+                futures.append(future)
+            if self._dispatcher is None:
+                self._dispatcher = threading.Thread(target=self._dispatch_loop, name="bulk-send-dispatcher", daemon=True)
+                self._dispatcher.start()
+            self._cond.notify()
+        return futures
+
+    def send(self, messages):
+        """Send a batch of emails and wait for all of them. Returns a list of (send_id, success)."""
+        return [future.result() for future in self.submit(messages)]
+
+    def pending_count(self):
+        with self._cond:
+            return sum(len(queue) for queue in self._queues.values())
+
+    def _next_ready(self, now):
+        """Pop the next message whose domain has capacity, or return the seconds to wait for one."""
+        wait = None
+        for domain in list(self._queues):
+            bucket = self._domain_buckets.setdefault(domain, TokenBucket(self.max_per_domain_per_hour))
+            domain_wait = bucket.wait_time(now)
+            if domain_wait == 0:
+                bucket.take()
+                queue = self._queues.pop(domain)
+                item = queue.popleft()
+                if queue:
+                    # Re-inserted at the end: next time other domains go first
+                    self._queues[domain] = queue
+                return item, 0.0
+            wait = domain_wait if wait is None else min(wait, domain_wait)
+        return None, wait
+
+    def _dispatch_loop(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._queues)
+
+            window_wait = seconds_until_window(self.send_windows)
+            if window_wait > 0:
+                print(f"[INFO] Outside send windows, {self.pending_count()} emails wait {window_wait / 60:.0f} min")
+                time.sleep(min(window_wait, 300))
+                continue
+
+            global_wait = self._global_bucket.wait_time(time.monotonic())
+            if global_wait > 0:
+                time.sleep(global_wait)
+                continue
+
+            with self._cond:
+                item, wait = self._next_ready(time.monotonic())
+            if item is None:
+                time.sleep(min(wait or 1.0, 60))
+                continue
+
+            self._global_bucket.take()
+            self._slots.acquire()
+            self._executor.submit(self._send_one, *item)
+
+    def _send_one(self, message, send_id, tracking_token, future):
+        record = dict(
+            send_id=send_id, lead_id=message["lead_id"], lead_email=message["to_email"],
+            subject=message["subject"], body_html=message["html_content"], tracking_token=tracking_token,
+            campaign=self.sender.campaign_tag
+        )
+        try:
+            brevo_message_id = self.sender.deliver(
+                message["lead_id"], message["to_email"], message.get("to_name", ""), message["subject"],
+                message["html_content"], tracking_token, message.get("reply_to_email")
+            )
+            self.sender.send_logger.log(**record, brevo_message_id=brevo_message_id, status="sent",
+                                        sent_at=datetime.now())
+            future.set_result((send_id, True))
+        except Exception as e:
+            print(f"[ERROR] Failed to send email to {message['to_email']}: {e}")
+            self.sender.send_logger.log(**record, status="failed")
+            future.set_result((send_id, False))
+        finally:
+            self._slots.release()
@@ -0,0 +1,58 @@
+"""
+Shared Postgres connection pool
+One pool per process for the email sender and its logging
+"""
+
+import os
+import threading
+from contextlib import contextmanager
+from psycopg2.pool import ThreadedConnectionPool
+
+DB_POOL_MIN_CONNECTIONS = int(os.getenv("DB_POOL_MIN_CONNECTIONS", "1"))
+DB_POOL_MAX_CONNECTIONS = int(os.getenv("DB_POOL_MAX_CONNECTIONS", "10"))
+
+_pool = None
+_pool_lock = threading.Lock()
+# ThreadedConnectionPool raises when exhausted, this makes callers wait for a free connection instead
+_pool_slots = threading.BoundedSemaphore(DB_POOL_MAX_CONNECTIONS)
+
+
+def get_db_pool(dsn=None):
+    """Process-wide connection pool, created on first use."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadedConnectionPool(
+                DB_POOL_MIN_CONNECTIONS,
+                DB_POOL_MAX_CONNECTIONS,
+                dsn or os.getenv("DATABASE_URL")
+            )
+    return _pool
+
+
+@contextmanager
+def db_connection(dsn=None):
+    """
+    Borrow a pooled connection. Commits when the block succeeds,
+    rolls back when it raises, and always returns the connection to the pool.
+    """
+    pool = get_db_pool(dsn)
+    with _pool_slots:
+        conn = pool.getconn()
+        try:
+            yield conn
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            pool.putconn(conn, close=bool(conn.closed))
+
+
+def close_db_pool():
+    """Close every pooled connection."""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.closeall()
+            _pool = None
@@ -0,0 +1,56 @@
+"""
+Brevo message id -> send id cache
+Lets webhook events for the same email (opens, clicks) skip the database lookup
+"""
+
+import os
+import threading
+from collections import OrderedDict
+
+MESSAGE_ID_CACHE_SIZE = int(os.getenv("MESSAGE_ID_CACHE_SIZE", "100000"))
+
+
+class MessageIdCache:
+    """Thread safe LRU cache of Brevo message id -> send id."""
+
+    def __init__(self, max_size=MESSAGE_ID_CACHE_SIZE):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, message_id):
+        with self._lock:
+            send_id = self._entries.get(message_id)
+            if send_id is not None:
+                self._entries.move_to_end(message_id)
+            return send_id
+
+    def get_many(self, message_ids):
+        """Return ({message id: send id} of cached ids, set of missing ids)."""
+        found, missing = {}, set()
+        with self._lock:
+            for message_id in message_ids:
+                send_id = self._entries.get(message_id)
+                if send_id is None:
+                    missing.add(message_id)
+                else:
+                    self._entries.move_to_end(message_id)
+                    found[message_id] = send_id
+        return found, missing
+
+    def put(self, message_id, send_id):
+        if not message_id or not send_id:
+            return
+        with self._lock:
+            self._entries[message_id] = send_id
+            self._entries.move_to_end(message_id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def put_many(self, mapping):
+        for message_id, send_id in mapping.items():
+            self.put(message_id, send_id)
+
+
+# Shared by the sender and the webhook ingestion in the process
+message_id_cache = MessageIdCache()
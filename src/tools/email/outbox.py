@@ -0,0 +1,249 @@
+"""
+Transactional email outbox
+Emails are written to `email_outbox` when generated and sent by dispatchers,
+so sending is asynchronous, restart safe and never done twice by two dispatchers
+
+Run a dispatcher with: python -m src.tools.email.outbox
+"""
+
+import os
+import uuid
+import threading
+from datetime import datetime
+from psycopg2.extras import RealDictCursor, execute_values
+from .db import db_connection
+from .message_ids import message_id_cache
+from .rollups import increment_rollups, new_increments
+
+OUTBOX_WORKERS = int(os.getenv("OUTBOX_WORKERS", "4"))
+OUTBOX_POLL_INTERVAL = float(os.getenv("OUTBOX_POLL_INTERVAL", "1"))
+OUTBOX_MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", "5"))
+
+# Seconds an email queued by a sending process is held back from dispatchers:
+# the process sends it itself, dispatchers only pick it up if the process died
+OUTBOX_SEND_HOLD = int(os.getenv("OUTBOX_SEND_HOLD", "300"))
+
+OUTBOX_COLUMNS = (
+    "send_id", "lead_id", "to_email", "to_name", "subject", "html_content",
+    "reply_to_email", "tracking_token", "bulk", "available_at"
+)
+
+
+def _outbox_row(lead_id, to_email, to_name, subject, html_content, reply_to_email=None, hold_seconds=0, bulk=False):
+    send_id = str(uuid.uuid4())
+    tracking_token = str(uuid.uuid4())[:16]
+    return (send_id, lead_id, to_email, to_name, subject, html_content, reply_to_email, tracking_token,
+            bulk, hold_seconds)
+
+
+def enqueue_email(lead_id, to_email, to_name, subject, html_content, reply_to_email=None, conn=None, hold_seconds=0):
+    """
+    Write an email to the outbox. Pass `conn` to make it part of the caller's
+    transaction, so the email only exists if the rest of that transaction commits.
+
+    Args:
+        hold_seconds: Seconds before dispatchers may pick the email up, for a caller sending it itself
+
+    Returns:
+        str: The send_id the email will be logged under in `email_sends`
+    """
+    message = dict(lead_id=lead_id, to_email=to_email, to_name=to_name, subject=subject,
+                   html_content=html_content, reply_to_email=reply_to_email)
+    return enqueue_emails([message], conn=conn, hold_seconds=hold_seconds)[0][0]
+
+
+def enqueue_emails(messages, conn=None, hold_seconds=0, bulk=False):
+    """
+    Write several emails to the outbox with one multi-row insert.
+
+    Args:
+        messages: Dicts with "lead_id", "to_email", "to_name", "subject",
+                  "html_content" and optional "reply_to_email"
+        conn: Optional open connection, to write the emails in the caller's transaction
+        hold_seconds: Seconds before dispatchers may pick the emails up
+        bulk: Campaign emails sent by a BulkEmailSender within its caps, which dispatchers skip
+
+    Returns:
+        list: (send_id, tracking_token) of each email, in order
+    """
+    rows = [
+        _outbox_row(m["lead_id"], m["to_email"], m.get("to_name", ""), m["subject"], m["html_content"],
+                    m.get("reply_to_email"), hold_seconds, bulk)
+        for m in messages
+    ]
+    if not rows:
+        return []
+    query = f"INSERT INTO email_outbox ({', '.join(OUTBOX_COLUMNS)}) VALUES %s"
+    # available_at from the database clock, like the dispatchers' NOW()
+    template = "(%s, %s, %s, %s, %s, %s, %s, %s, %s, NOW() + make_interval(secs => %s))"
+    if conn is not None:
+        with conn.cursor() as cur:
+            execute_values(cur, query, rows, template=template, page_size=len(rows))
+    else:
+        with db_connection() as own_conn, own_conn.cursor() as cur:
+            execute_values(cur, query, rows, template=template, page_size=len(rows))
+    return [(row[0], row[7]) for row in rows]
+
+
+class OutboxDispatcher:
+    """
+    Sends the emails waiting in the outbox.
+
+    Each worker claims one row with `SELECT ... FOR UPDATE SKIP LOCKED` and keeps
+    it locked while the email goes out, then records it in `email_sends` and marks
+    it sent in the same transaction. Rows locked by another worker or dispatcher
+    process are skipped, so dispatchers scale horizontally without duplicate sends.
+    If a dispatcher dies mid-send its transaction rolls back and the row is retried.
+    Failed sends are retried with exponential backoff up to `OUTBOX_MAX_ATTEMPTS`.
+    `send` sends one given email right away, for senders that queue and send in process.
+    Bulk rows are skipped: BulkEmailSender sends them within its rate caps and windows.
+
+    The `email_outbox` table is created by the schema migrations (python -m src.tools.email.schema).
+
+    Args:
+        sender: BrevoEmailSender used to deliver (one is created if omitted)
+        workers: Rows sent concurrently by this dispatcher
+        poll_interval: Seconds to wait when the outbox is empty
+    """
+
+    def __init__(self, sender=None, workers=OUTBOX_WORKERS, poll_interval=OUTBOX_POLL_INTERVAL):
+        if sender is None:
+            from .brevo_sender import BrevoEmailSender
+            sender = BrevoEmailSender()
+        self.sender = sender
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self._stopping = threading.Event()
+
+    def run_forever(self):
+        """Dispatch until `stop` is called."""
+        threads = [
+            threading.Thread(target=self._worker_loop, name=f"outbox-{i}", daemon=True)
+            for i in range(self.workers)
+        ]
+        for thread in threads:
+            thread.start()
+        print(f"[OK] Outbox dispatcher running with {self.workers} workers")
+        for thread in threads:
+            thread.join()
+
+    def stop(self):
+        self._stopping.set()
+
+    def run_once(self):
+        """Send one outbox row. Returns False when nothing is ready."""
+        with db_connection() as conn:
+            with conn.cursor(cursor_factory=RealDictCursor) as cur:
+                cur.execute("""
+                    SELECT * FROM email_outbox
+                    WHERE status = 'pending' AND NOT bulk AND available_at <= NOW()
+                    ORDER BY available_at
+                    LIMIT 1
+                    FOR UPDATE SKIP LOCKED
+                """)
+                row = cur.fetchone()
+                if not row:
+                    return False
+                brevo_message_id = self._send_row(cur, row)
+        if brevo_message_id:
+            message_id_cache.put(brevo_message_id, str(row["send_id"]))
+        return True
+
+    def send(self, send_id):
+        """
+        Send a queued email now, even if it is still held back from dispatchers.
+
+        Returns:
+            bool: Whether the email was sent. False when delivery failed (the row stays
+            pending and is retried by dispatchers), or the email is not pending anymore
+            or is being sent by another dispatcher.
+        """
+        with db_connection() as conn:
+            with conn.cursor(cursor_factory=RealDictCursor) as cur:
+                cur.execute("""
+                    SELECT * FROM email_outbox
+                    WHERE send_id = %s AND status = 'pending'
+                    FOR UPDATE SKIP LOCKED
+                """, (send_id,))
+                row = cur.fetchone()
+                if not row:
+                    print(f"[WARNING] Email {send_id} is not pending in the outbox, not sent")
+                    return False
+                brevo_message_id = self._send_row(cur, row)
+        if brevo_message_id:
+            message_id_cache.put(brevo_message_id, str(row["send_id"]))
+        return brevo_message_id is not None
+
+    def _send_row(self, cur, row):
+        """Deliver a claimed row and record it in `email_sends`. Returns the Brevo message id, None on failure."""
+        try:
+            brevo_message_id = self.sender.deliver(
+                row["lead_id"], row["to_email"], row["to_name"], row["subject"],
+                row["html_content"], row["tracking_token"], row["reply_to_email"]
+            )
+        except Exception as e:
+            self._record_failure(cur, row, e)
+            return None
+
+        # Brevo message id goes in the sendgrid_message_id column
+        cur.execute("""
+            INSERT INTO email_sends
+            (send_id, lead_id, lead_email, subject, body_html, tracking_pixel_token,
+             sendgrid_message_id, status, sent_at, campaign)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, 'sent', NOW(), %s)
+            ON CONFLICT (send_id) DO NOTHING
+        """, (
+            row["send_id"], row["lead_id"], row["to_email"], row["subject"],
+            row["html_content"], row["tracking_token"], brevo_message_id,
+            self.sender.campaign_tag
+        ))
+        if cur.rowcount:
+            increments = new_increments()
+            increments[(datetime.now().date(), self.sender.campaign_tag)]["sent"] += 1
+            increment_rollups(cur, increments)
+        cur.execute("""
+            UPDATE email_outbox
+            SET status = 'sent', sent_at = NOW(), attempts = attempts + 1, last_error = NULL
+            WHERE send_id = %s
+        """, (row["send_id"],))
+        return brevo_message_id
+
+    def _record_failure(self, cur, row, error):
+        attempts = row["attempts"] + 1
+        if attempts >= OUTBOX_MAX_ATTEMPTS:
+            print(f"[ERROR] Giving up on email to {row['to_email']} after {attempts} attempts: {error}")
+            cur.execute("""
+                INSERT INTO email_sends
+                (send_id, lead_id, lead_email, subject, body_html, tracking_pixel_token, status, campaign)
+                VALUES (%s, %s, %s, %s, %s, %s, 'failed', %s)
+                ON CONFLICT (send_id) DO NOTHING
+            """, (
+                row["send_id"], row["lead_id"], row["to_email"], row["subject"],
+                row["html_content"], row["tracking_token"], self.sender.campaign_tag
+            ))
+            status = "failed"
+        else:
+            print(f"[WARNING] Email to {row['to_email']} failed (attempt {attempts}), retrying later: {error}")
+            status = "pending"
+        cur.execute("""
+            UPDATE email_outbox
+            SET status = %s, attempts = %s, last_error = %s,
+                available_at = NOW() + make_interval(secs => %s)
+            WHERE send_id = %s
+        """, (status, attempts, str(error), 2 ** attempts * 30, row["send_id"]))
+
+    def _worker_loop(self):
+        while not self._stopping.is_set():
+            try:
+                if not self.run_once():
+                    self._stopping.wait(self.poll_interval)
+            except Exception as e:
+                print(f"[ERROR] Outbox dispatcher error: {e}")
+                self._stopping.wait(self.poll_interval)
+
+
+if __name__ == "__main__":
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    OutboxDispatcher().run_forever()
@@ -0,0 +1,104 @@
+"""
+Daily email engagement rollups
+email_stats_daily keeps sent/delivered/opened/clicked/replied/bounced counts per
+day and campaign tag, incremented by the send and webhook paths, so stats read
+one row per day instead of scanning email_sends
+
+Rebuild from email_sends with: python -m src.tools.email.rollups backfill
+"""
+
+import sys
+from collections import Counter, defaultdict
+from psycopg2.extras import execute_values
+from .db import db_connection
+
+ROLLUP_METRICS = ("sent", "delivered", "opened", "clicked", "replied", "bounced")
+
+
+def new_increments():
+    """(day, campaign) -> Counter of metric increments."""
+    return defaultdict(Counter)
+
+
+def increment_rollups(cur, increments):
+    """Add the increments to the daily rollups with one upsert, in the caller's transaction."""
+    rows = [
+        (day, campaign or "", *(counts.get(metric, 0) for metric in ROLLUP_METRICS))
+        for (day, campaign), counts in increments.items()
+        if any(counts.values())
+    ]
+    if not rows:
+        return
+    execute_values(cur, f"""
+        INSERT INTO email_stats_daily (day, campaign, {', '.join(ROLLUP_METRICS)})
+        VALUES %s
+        ON CONFLICT (day, campaign) DO UPDATE SET
+            {', '.join(f'{m} = email_stats_daily.{m} + EXCLUDED.{m}' for m in ROLLUP_METRICS)}
+    """, rows, page_size=len(rows))
+
+
+def rebuild_rollups():
+    """
+    Recompute every daily rollup from email_sends.
+    Every metric is counted on the day of its event, like the incremental updates.
+    """
+    with db_connection() as conn, conn.cursor() as cur:
+        cur.execute("LOCK TABLE email_stats_daily IN EXCLUSIVE MODE")
+        cur.execute("DELETE FROM email_stats_daily")
+        cur.execute(f"""
+            INSERT INTO email_stats_daily (day, campaign, {', '.join(ROLLUP_METRICS)})
+            SELECT day, campaign, {', '.join(f'SUM({m})' for m in ROLLUP_METRICS)}
+            FROM (
+                SELECT sent_at::date AS day, COALESCE(campaign, '') AS campaign,
+                       1 AS sent, 0 AS delivered, 0 AS opened, 0 AS clicked, 0 AS replied, 0 AS bounced
+                FROM email_sends WHERE sent_at IS NOT NULL AND status <> 'failed'
+                UNION ALL
+                SELECT delivered_at::date, COALESCE(campaign, ''), 0, 1, 0, 0, 0, 0
+                FROM email_sends WHERE delivered_at IS NOT NULL
+                UNION ALL
+                SELECT opened_at::date, COALESCE(campaign, ''), 0, 0, 1, 0, 0, 0
+                FROM email_sends WHERE opened_at IS NOT NULL
+                UNION ALL
+                SELECT clicked_at::date, COALESCE(campaign, ''), 0, 0, 0, 1, 0, 0
+                FROM email_sends WHERE clicked_at IS NOT NULL
+                UNION ALL
+                SELECT replied_at::date, COALESCE(campaign, ''), 0, 0, 0, 0, 1, 0
+                FROM email_sends WHERE replied_at IS NOT NULL
+                UNION ALL
+                SELECT bounced_at::date, COALESCE(campaign, ''), 0, 0, 0, 0, 0, 1
+                FROM email_sends WHERE bounced_at IS NOT NULL
+            ) AS metrics
+            GROUP BY day, campaign
+        """)
+        print(f"[OK] Rebuilt {cur.rowcount} daily email stats rows")
+
+
+def get_daily_stats(days=7, campaign=None):
+    """
+    Sum the rollups of the last `days` days, optionally for one campaign tag.
+
+    Returns:
+        dict: Total per metric
+    """
+    query = f"""
+        SELECT {', '.join(f'COALESCE(SUM({m}), 0) AS {m}' for m in ROLLUP_METRICS)}
+        FROM email_stats_daily
+        WHERE day > CURRENT_DATE - %s
+    """
+    params = [days]
+    if campaign is not None:
+        query += " AND campaign = %s"
+        params.append(campaign)
+    with db_connection() as conn, conn.cursor() as cur:
+        cur.execute(query, params)
+        return dict(zip(ROLLUP_METRICS, (int(value) for value in cur.fetchone())))
+
+
+if __name__ == "__main__":
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    if sys.argv[1:] == ["backfill"]:
+        rebuild_rollups()
+    else:
+        print("Usage: python -m src.tools.email.rollups backfill")
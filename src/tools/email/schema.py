@@ -0,0 +1,190 @@
+"""
+Email tracking schema migrations
+Run with: python -m src.tools.email.schema
+"""
+
+from .db import db_connection
+
+MESSAGE_ID_INDEX = "idx_email_sends_message_id"
+
+
+def _index_is_valid(cur, index_name):
+    """True/False for a valid/invalid index (e.g. a failed CONCURRENTLY build), None if it doesn't exist."""
+    cur.execute("""
+        SELECT i.indisvalid FROM pg_index AS i
+        JOIN pg_class AS c ON c.oid = i.indexrelid
+        WHERE c.relname = %s
+    """, (index_name,))
+    row = cur.fetchone()
+    return row[0] if row else None
+
+
+def _create_message_id_index(cur):
+    """
+    Build the unique Brevo message id index without locking email_sends writes.
+    A failed or cancelled CONCURRENTLY build leaves an INVALID index behind, which
+    IF NOT EXISTS would silently accept: it is dropped and rebuilt instead.
+    """
+    if _index_is_valid(cur, MESSAGE_ID_INDEX) is False:
+        print(f"[WARNING] Dropping invalid index {MESSAGE_ID_INDEX} left by a failed build")
+        cur.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {MESSAGE_ID_INDEX}")
+
+    cur.execute("""
+        SELECT COUNT(*) FROM (
+            SELECT sendgrid_message_id FROM email_sends
+            WHERE sendgrid_message_id IS NOT NULL
+            GROUP BY sendgrid_message_id HAVING COUNT(*) > 1
+        ) AS duplicates
+    """)
+    duplicates = cur.fetchone()[0]
+    if duplicates:
+        raise RuntimeError(
+            f"{duplicates} Brevo message ids appear on several email_sends rows, "
+            f"remove the duplicates before building {MESSAGE_ID_INDEX}"
+        )
+
+    cur.execute(f"CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS {MESSAGE_ID_INDEX} ON email_sends(sendgrid_message_id)")
+    if not _index_is_valid(cur, MESSAGE_ID_INDEX):
+        raise RuntimeError(f"{MESSAGE_ID_INDEX} was created but is not valid")
+
+
+# (version, SQL or function of a cursor). CONCURRENTLY builds the index without locking email_sends writes.
+MIGRATIONS = [
+    ("001_unique_message_id", _create_message_id_index),
+    (
+        "002_email_sends_campaign",
+        "ALTER TABLE email_sends ADD COLUMN IF NOT EXISTS campaign VARCHAR(100)"
+    ),
+    (
+        "003_email_stats_daily",
+        """
+        CREATE TABLE IF NOT EXISTS email_stats_daily (
+            day DATE NOT NULL,
+            campaign VARCHAR(100) NOT NULL DEFAULT '',
+            sent INT NOT NULL DEFAULT 0,
+            delivered INT NOT NULL DEFAULT 0,
+            opened INT NOT NULL DEFAULT 0,
+            clicked INT NOT NULL DEFAULT 0,
+            replied INT NOT NULL DEFAULT 0,
+            bounced INT NOT NULL DEFAULT 0,
+            PRIMARY KEY (day, campaign)
+        )
+        """
+    ),
+    (
+        "004_email_outbox",
+        """
+        CREATE TABLE IF NOT EXISTS email_outbox (
+            send_id UUID PRIMARY KEY,
+            lead_id VARCHAR(255) NOT NULL,
+            to_email VARCHAR(255) NOT NULL,
+            to_name VARCHAR(255),
+            subject VARCHAR(500),
+            html_content TEXT,
+            reply_to_email VARCHAR(255),
+            tracking_token VARCHAR(100) NOT NULL,
+            status VARCHAR(20) NOT NULL DEFAULT 'pending',  -- pending, sent, failed
+            attempts INT NOT NULL DEFAULT 0,
+            last_error TEXT,
+            available_at TIMESTAMP NOT NULL DEFAULT NOW(),
+            created_at TIMESTAMP NOT NULL DEFAULT NOW(),
+            sent_at TIMESTAMP
+        );
+        CREATE INDEX IF NOT EXISTS idx_outbox_pending ON email_outbox(available_at) WHERE status = 'pending'
+        """
+    ),
+    (
+        # Date bounces are counted on in the rollups; existing bounces get their first bounce event
+        "005_email_sends_bounced_at",
+        """
+        ALTER TABLE email_sends ADD COLUMN IF NOT EXISTS bounced_at TIMESTAMP;
+        UPDATE email_sends AS s
+        SET bounced_at = COALESCE(
+            (SELECT MIN(e.event_timestamp) FROM email_events AS e
+             WHERE e.send_id = s.send_id
+               AND e.event_type IN ('hard_bounce', 'soft_bounce', 'invalid_email', 'blocked')),
+            s.sent_at, s.created_at
+        )
+        WHERE s.status = 'bounced' AND s.bounced_at IS NULL
+        """
+    ),
+    (
+        # Campaign emails of BulkEmailSender, which outbox dispatchers leave to it
+        "006_email_outbox_bulk",
+        "ALTER TABLE email_outbox ADD COLUMN IF NOT EXISTS bulk BOOLEAN NOT NULL DEFAULT FALSE"
+    ),
+]
+
+
+def apply_migrations():
+    """Apply the migrations not applied yet, in order."""
+    with db_connection() as conn:
+        # CREATE INDEX CONCURRENTLY can't run inside a transaction
+        conn.autocommit = True
+        try:
+            with conn.cursor() as cur:
+                cur.execute("""
+                    CREATE TABLE IF NOT EXISTS schema_migrations (
+                        version VARCHAR(100) PRIMARY KEY,
+                        applied_at TIMESTAMP NOT NULL DEFAULT NOW()
+                    )
+                """)
+                cur.execute("SELECT version FROM schema_migrations")
+                applied = {row[0] for row in cur.fetchall()}
+                if _index_is_valid(cur, MESSAGE_ID_INDEX) is False:
+                    # Recorded as applied but the build failed later (e.g. cancelled), run it again
+                    applied.discard("001_unique_message_id")
+                    cur.execute("DELETE FROM schema_migrations WHERE version = '001_unique_message_id'")
+
+                for version, sql in MIGRATIONS:
+                    if version in applied:
+                        continue
+                    print(f"[INFO] Applying migration {version}")
+                    if callable(sql):
+                        sql(cur)
+                    else:
+                        cur.execute(sql)
+                    cur.execute("INSERT INTO schema_migrations (version) VALUES (%s)", (version,))
+        finally:
+            conn.autocommit = False
+
+
+def check_message_id_index():
+    """
+    Warn when email_sends has no valid unique index on the Brevo message id column,
+    which makes every webhook message id lookup a table scan.
+
+    Returns:
+        bool: Whether a valid index exists
+    """
+    try:
+        with db_connection() as conn, conn.cursor() as cur:
+            cur.execute("""
+                SELECT i.indisvalid FROM pg_indexes AS p
+                JOIN pg_class AS c ON c.relname = p.indexname
+                JOIN pg_index AS i ON i.indexrelid = c.oid
+                WHERE p.tablename = 'email_sends'
+                  AND p.indexdef ILIKE 'CREATE UNIQUE INDEX%'
+                  AND p.indexdef ILIKE '%(sendgrid_message_id)%'
+            """)
+            valid = [row[0] for row in cur.fetchall()]
+    except Exception as e:
+        print(f"[WARNING] Could not check email_sends indexes: {e}")
+        return False
+
+    exists = any(valid)
+    if valid and not exists:
+        print("[WARNING] The unique index on email_sends.sendgrid_message_id is INVALID (failed build), "
+              "webhook lookups will scan the table. Rebuild it with: python -m src.tools.email.schema")
+    elif not exists:
+        print("[WARNING] email_sends.sendgrid_message_id has no unique index, "
+              "webhook lookups will scan the table. Run: python -m src.tools.email.schema")
+    return exists
+
+
+if __name__ == "__main__":
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    apply_migrations()
+    check_message_id_index()
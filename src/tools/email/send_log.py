@@ -0,0 +1,189 @@
+"""
+Buffered email send logging
+Groups email_sends records into multi-row inserts flushed on size or time
+"""
+
+import os
+import json
+import uuid
+import atexit
+import threading
+from psycopg2.extras import execute_values
+from .db import db_connection
+from .message_ids import message_id_cache
+from .rollups import increment_rollups, new_increments
+
+SEND_LOG_FLUSH_SIZE = int(os.getenv("SEND_LOG_FLUSH_SIZE", "100"))
+SEND_LOG_FLUSH_INTERVAL = float(os.getenv("SEND_LOG_FLUSH_INTERVAL", "2"))
+# Flushes a record that fails to insert is retried in before it goes to the dead letter file
+SEND_LOG_MAX_ATTEMPTS = int(os.getenv("SEND_LOG_MAX_ATTEMPTS", "5"))
+SEND_LOG_DEAD_LETTER_FILE = os.getenv("SEND_LOG_DEAD_LETTER_FILE", "email_sends_dead_letters.jsonl")
+
+SEND_LOG_COLUMNS = (
+    "send_id", "lead_id", "lead_email", "subject", "body_html",
+    "tracking_pixel_token", "sendgrid_message_id", "status", "sent_at", "campaign"
+)
+
+
+class EmailSendLogger:
+    """
+    Logs email sends to the `email_sends` table.
+
+    Send ids are UUIDs generated here (or the outbox send_id of the email), so they
+    are known before the row is written. The outbox row of a logged send is marked
+    sent or failed in the same transaction as its `email_sends` record. Records are buffered and written with one multi-row INSERT once `flush_size`
+    records are waiting or `flush_interval` seconds passed. Use `sync=True` when
+    the row must be in the database before `log` returns.
+
+    When a multi-row insert fails the records are retried one by one, so a bad
+    record can't hold back the others. A record failing `SEND_LOG_MAX_ATTEMPTS`
+    flushes in a row is appended to the dead letter file and dropped.
+    """
+
+    def __init__(self, flush_size=SEND_LOG_FLUSH_SIZE, flush_interval=SEND_LOG_FLUSH_INTERVAL, dsn=None,
+                 dead_letter_file=SEND_LOG_DEAD_LETTER_FILE):
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.dsn = dsn
+        self.dead_letter_file = dead_letter_file
+        self._buffer = []
+        # send_id -> failed inserts of records waiting to be retried
+        self._attempts = {}
+        self._cond = threading.Condition()
+        self._flush_lock = threading.Lock()
+        self._thread = None
+
+    def log(self, lead_id, lead_email, subject, body_html, tracking_token,
+            brevo_message_id=None, status="queued", sent_at=None, campaign=None, sync=False, send_id=None):
+        """
+        Record an email send.
+
+        Args:
+            send_id: Outbox send_id of the email, a new one is generated if omitted
+
+        Returns:
+            str: The send_id of the record
+        """
+        send_id = send_id or str(uuid.uuid4())
+        # Brevo message id goes in the sendgrid_message_id column
+        record = (send_id, lead_id, lead_email, subject, body_html,
+                  tracking_token, brevo_message_id, status, sent_at, campaign)
+        message_id_cache.put(brevo_message_id, send_id)
+        if sync:
+            self._insert([record])
+            return send_id
+
+        with self._cond:
+            self._buffer.append(record)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="email-send-log", daemon=True)
+                self._thread.start()
+                atexit.register(self.flush)
+            if len(self._buffer) >= self.flush_size:
+                self._cond.notify()
+        return send_id
+
+    def log_many(self, records, sync=False):
+        """Record several sends (dicts with the `log` arguments). Returns their send_ids."""
+        if sync:
+            rows = [
+                (r.get("send_id") or str(uuid.uuid4()), r["lead_id"], r["lead_email"], r["subject"], r["body_html"],
+                 r["tracking_token"], r.get("brevo_message_id"), r.get("status", "queued"), r.get("sent_at"),
+                 r.get("campaign"))
+                for r in records
+            ]
+            self._insert(rows)
+            for row in rows:
+                message_id_cache.put(row[6], row[0])
+            return [row[0] for row in rows]
+        return [self.log(**record) for record in records]
+
+    def is_pending(self, send_id):
+        """Whether a record is still waiting in the buffer."""
+        with self._cond:
+            return any(record[0] == send_id for record in self._buffer)
+
+    def flush(self):
+        """Write every buffered record now."""
+        with self._flush_lock:
+            with self._cond:
+                records, self._buffer = self._buffer, []
+            if not records:
+                return
+            if len(records) > 1:
+                try:
+                    self._insert(records)
+                    for record in records:
+                        self._attempts.pop(record[0], None)
+                    return
+                except Exception as e:
+                    print(f"[WARNING] Failed to log {len(records)} email sends in bulk, logging them one by one: {e}")
+
+            retry, failed = [], []
+            for record in records:
+                try:
+                    self._insert([record])
+                    self._attempts.pop(record[0], None)
+                    continue
+                except Exception as e:
+                    error = e
+                attempts = self._attempts.get(record[0], 0) + 1
+                if attempts >= SEND_LOG_MAX_ATTEMPTS:
+                    self._attempts.pop(record[0], None)
+                    failed.append(record)
+                else:
+                    self._attempts[record[0]] = attempts
+                    retry.append(record)
+            if retry:
+                print(f"[ERROR] Failed to log {len(retry)} email sends, will retry: {error}")
+                with self._cond:
+                    self._buffer[:0] = retry
+            if failed:
+                self._dead_letter(failed, error)
+
+    def _dead_letter(self, records, error):
+        """Append records that keep failing to the dead letter file, to be replayed by hand."""
+        try:
+            with open(self.dead_letter_file, "a", encoding="utf-8") as f:
+                for record in records:
+                    row = dict(zip(SEND_LOG_COLUMNS, record))
+                    f.write(json.dumps({"error": str(error), "record": row}, default=str) + "\n")
+            print(f"[ERROR] Moved {len(records)} email sends to {self.dead_letter_file} "
+                  f"after {SEND_LOG_MAX_ATTEMPTS} failed inserts")
+        except OSError as e:
+            print(f"[ERROR] Dropped {len(records)} email sends, could not write the dead letter file: {e}")
+
+    def _run(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: len(self._buffer) >= self.flush_size, timeout=self.flush_interval)
+            self.flush()
+
+    def _insert(self, records):
+        with db_connection(self.dsn) as conn:
+            with conn.cursor() as cur:
+                execute_values(
+                    cur,
+                    f"INSERT INTO email_sends ({', '.join(SEND_LOG_COLUMNS)}) VALUES %s",
+                    records,
+                    page_size=len(records)
+                )
+                # Close the outbox rows of these sends, if they came from the outbox
+                execute_values(cur, """
+                    UPDATE email_outbox AS o
+                    SET status = v.status, sent_at = v.sent_at, attempts = o.attempts + 1, last_error = NULL
+                    FROM (VALUES %s) AS v(send_id, status, sent_at)
+                    WHERE o.send_id = v.send_id::uuid AND o.status = 'pending'
+                """, [(record[0], record[7], record[8]) for record in records],
+                   template="(%s, %s, %s::timestamp)", page_size=len(records))
+                # Count the sends in the daily rollups, in the same transaction
+                increments = new_increments()
+                for record in records:
+                    status, sent_at, campaign = record[7], record[8], record[9]
+                    if status == "sent" and sent_at:
+                        increments[(sent_at.date(), campaign)]["sent"] += 1
+                increment_rollups(cur, increments)
+
+
+# Shared by every sender in the process
+email_send_logger = EmailSendLogger()
@@ -1,7 +1,52 @@
-import os, re
+import io, re, os, json
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import httplib2
+from google_auth_httplib2 import AuthorizedHttp
 from googleapiclient.discovery import build
-from googleapiclient.http import MediaFileUpload
+from googleapiclient.http import MediaIoBaseUpload
 from src.utils import get_google_credentials
+from src.instrumentation import instrumentation
+
+# Reports of a lead uploaded in parallel
+MAX_UPLOAD_WORKERS = 4
+# (folder, title) -> (doc id, content hash) of uploaded documents, to skip unchanged re-uploads
+DOCS_MANIFEST_FILE = os.getenv("GOOGLE_DOCS_MANIFEST_FILE", "google_docs_manifest.json")
+
+
+def _utf16_len(text):
+    """Length of text in UTF-16 code units, the unit of Google Docs indexes."""
+    return len(text.encode("utf-16-le")) // 2
+
+
+def _minimal_edit_requests(old_text, new_text):
+    """
+    Docs batchUpdate requests turning old_text into new_text by replacing only
+    the span between their common prefix and common suffix.
+    Both texts end with the document's final newline, which is never edited.
+    """
+    prefix = 0
+    limit = min(len(old_text), len(new_text))
+    # The prefix stops before the final newline, so an append or a truncation edits
+    # inside the body instead of at the segment end index, which Docs rejects
+    while prefix < limit - 1 and old_text[prefix] == new_text[prefix]:
+        prefix += 1
+    suffix = 0
+    while suffix < limit - prefix and old_text[-1 - suffix] == new_text[-1 - suffix]:
+        suffix += 1
+
+    start = 1 + _utf16_len(old_text[:prefix])
+    end = 1 + _utf16_len(old_text[:len(old_text) - suffix])
+    inserted = new_text[prefix:len(new_text) - suffix]
+
+    requests = []
+    if end > start:
+        requests.append({"deleteContentRange": {"range": {"startIndex": start, "endIndex": end}}})
+    if inserted:
+        requests.append({"insertText": {"location": {"index": start}, "text": inserted}})
+    return requests
+
 
 class GoogleDocsManager:
     def __init__(self, credentials=None):
@@ -16,6 +61,17 @@ class GoogleDocsManager:
         self.docs_service = None
         self.drive_service = None
 
+        # Folder name -> (folder id, folder link), so each folder is looked up once
+        self._folder_cache = {}
+        # Folders already shared with anyone, so the permission is only created once
+        self._shared_folders = set()
+        self._folder_lock = threading.Lock()
+        # httplib2 is not thread safe: every worker thread gets its own authorized connection
+        self._thread_local = threading.local()
+        self.manifest_path = DOCS_MANIFEST_FILE
+        self._manifest_lock = threading.Lock()
+        self._manifest = self._load_manifest()
+
         if self.credentials:
             try:
                 self.docs_service = build('docs', 'v1', credentials=self.credentials)
@@ -26,53 +82,74 @@ class GoogleDocsManager:
         else:
             print("ℹ️ Google Docs Manager initialized without credentials (feature disabled)")
 
+    def _http(self):
+        """Authorized HTTP connection for the current thread."""
+        http = getattr(self._thread_local, "http", None)
+        if http is None:
+            http = AuthorizedHttp(self.credentials, http=httplib2.Http())
+            self._thread_local.http = http
+        return http
+
     def add_document(self, content, doc_title, folder_name, make_shareable=False, folder_shareable=False, markdown=False):
         """
         Create a Google Document and save it in the specified folder.
         """
+        results = self.add_documents(
+            [{"content": content, "doc_title": doc_title, "markdown": markdown}],
+            folder_name,
+            make_shareable=make_shareable,
+            folder_shareable=folder_shareable
+        )
+        return results[0] if results else None
+
+    def add_documents(self, documents, folder_name, make_shareable=False, folder_shareable=False):
+        """
+        Create several Google Documents in the specified folder.
+
+        Each document is created directly inside the folder with a single upload,
+        uploads run in parallel, and all share permissions go in one batch request.
+
+        Args:
+            documents: List of dicts with "content", "doc_title" and optional "markdown"
+            folder_name: Drive folder to save the documents in
+            make_shareable: Make every document readable by anyone with the link
+            folder_shareable: Make the folder readable by anyone with the link
+
+        Returns:
+            list: One result dict (document_url, shareable_url, folder_url) or None per document
+        """
         if not self.docs_service or not self.drive_service:
             print("[WARNING] Google Docs services not initialized. Skipping document creation.")
-            return None
+            return [None] * len(documents)
 
-        try:
-            # Ensure the folder exists
-            folder_id, folder_url = self._get_or_create_folder(folder_name, make_shareable=folder_shareable)
-            if not folder_id:
-                raise ValueError("Failed to get or create the folder.")
+        # Ensure the folder exists
+        folder_id, folder_url = self.get_or_create_folder(folder_name, make_shareable=folder_shareable)
+        if not folder_id:
+            print("An error occurred: Failed to get or create the folder.")
+            return [None] * len(documents)
 
-            if markdown:
-                # Convert Markdown to Google Doc
-                doc_id = self._convert_markdown_to_google_doc(content, doc_title)
-            else:
-                # Create a new Google Document and add content
-                doc = self.docs_service.documents().create(body={"title": doc_title}).execute()
-                doc_id = doc.get('documentId')
-
-                # Add content to the document
-                requests = [{"insertText": {"location": {"index": 1}, "text": content}}]
-                self.docs_service.documents().batchUpdate(documentId=doc_id, body={"requests": requests}).execute()
-
-            # Move the document to the folder
-            self.drive_service.files().update(
-                fileId=doc_id,
-                addParents=folder_id,
-                removeParents="root",
-                fields="id, parents"
-            ).execute()
-
-            shareable_url = None
-            if make_shareable:
-                shareable_url = self._make_document_shareable(doc_id)
-
-            document_url = f"https://docs.google.com/document/d/{doc_id}"
-            return {
-                "document_url": document_url,  
-                "shareable_url": shareable_url,
+        with ThreadPoolExecutor(max_workers=MAX_UPLOAD_WORKERS) as executor:
+            files = list(executor.map(
+                lambda document: self.sync_document(
+                    document["content"], document["doc_title"], folder_id, document.get("markdown", False)
+                ),
+                documents
+            ))
+
+        if make_shareable:
+            self._make_documents_shareable([file["id"] for file in files if file])
+
+        results = []
+        for file in files:
+            if not file:
+                results.append(None)
+                continue
+            results.append({
+                "document_url": f"https://docs.google.com/document/d/{file['id']}",
+                "shareable_url": file.get("webViewLink") if make_shareable else None,
                 "folder_url": folder_url
-            }
-        except Exception as e:
-            print(f"An error occurred: {e}")
-            return None
+            })
+        return results
 
     def get_document(self, doc_url):
         """
@@ -101,76 +178,258 @@ class GoogleDocsManager:
         except Exception as e:
             print(f"An error occurred: {e}")
             return None
-        
-    def _get_or_create_folder(self, folder_name, make_shareable=False):
+
+    @instrumentation.tracked("google_docs")
+    def get_or_create_folder(self, folder_name, make_shareable=False):
         """
         Get the ID and link of an existing folder with the specified name, or create one if it doesn't exist.
+        Results are cached per folder name, so Drive is only queried the first time.
         """
         try:
-            # Search for the folder
-            query = f"mimeType='application/vnd.google-apps.folder' and name='{folder_name}' and trashed=false"
-            results = self.drive_service.files().list(q=query, spaces='drive', fields="files(id, name, webViewLink)").execute()
-            files = results.get('files', [])
-            
-            if files:
-                # Folder exists
-                folder = files[0]
-                folder_id = folder['id']
-                folder_link = folder.get('webViewLink')
-            else:
-                # Folder doesn't exist, create it
-                file_metadata = {
-                    'name': folder_name,
-                    'mimeType': 'application/vnd.google-apps.folder'
-                }
-                folder = self.drive_service.files().create(body=file_metadata, fields='id, webViewLink').execute()
-                folder_id = folder['id']
-                folder_link = folder.get('webViewLink')
-
-            # Make the folder shareable if required
-            if make_shareable:
-                self.drive_service.permissions().create(
-                    fileId=folder_id,
-                    body={"type": "anyone", "role": "reader"},
-                    fields="id"
-                ).execute()
+            with self._folder_lock:
+                if folder_name in self._folder_cache:
+                    instrumentation.record_cache_hit("google_docs")
+                    folder_id, folder_link = self._folder_cache[folder_name]
+                else:
+                    folder = self._search_folder(folder_name)
+                    if not folder:
+                        # Folder doesn't exist, create it
+                        file_metadata = {
+                            'name': folder_name,
+                            'mimeType': 'application/vnd.google-apps.folder'
+                        }
+                        folder = self.drive_service.files().create(body=file_metadata, fields='id, webViewLink').execute(http=self._http())
+                    folder_id = folder['id']
+                    folder_link = folder.get('webViewLink')
+                    self._folder_cache[folder_name] = (folder_id, folder_link)
+
+                # Make the folder shareable if required
+                if make_shareable and folder_id not in self._shared_folders:
+                    self.drive_service.permissions().create(
+                        fileId=folder_id,
+                        body={"type": "anyone", "role": "reader"},
+                        fields="id"
+                    ).execute(http=self._http())
+                    self._shared_folders.add(folder_id)
 
             return folder_id, folder_link
         except Exception as e:
             print(f"An error occurred while retrieving or creating the folder: {e}")
             return None, None
 
-    def _make_document_shareable(self, doc_id):
-        """Make a document shareable with anyone who has the link."""
+    @instrumentation.tracked("google_docs")
+    def find_folder(self, folder_name):
+        """
+        Look up an existing folder by name (cache first, then Drive) without creating it.
+        Drive errors are raised, so callers can tell them apart from a missing folder.
+
+        Returns:
+            tuple: (folder id, folder link), or None if Drive has no such folder
+        """
+        with self._folder_lock:
+            if folder_name in self._folder_cache:
+                instrumentation.record_cache_hit("google_docs")
+                return self._folder_cache[folder_name]
+            folder = self._search_folder(folder_name)
+            if not folder:
+                return None
+            self._folder_cache[folder_name] = (folder['id'], folder.get('webViewLink'))
+            return self._folder_cache[folder_name]
+
+    def _search_folder(self, folder_name):
+        """The first non-trashed Drive folder with this name, or None."""
+        escaped_name = folder_name.replace("\\", "\\\\").replace("'", "\\'")
+        query = f"mimeType='application/vnd.google-apps.folder' and name='{escaped_name}' and trashed=false"
+        results = self.drive_service.files().list(q=query, spaces='drive', fields="files(id, name, webViewLink)").execute(http=self._http())
+        files = results.get('files', [])
+        return files[0] if files else None
+
+    def _upload_document(self, content, title, folder_id, markdown=False):
+        """
+        Create a Google Document inside the folder from text or Markdown content,
+        with a single Drive upload (Drive converts the file to a Google Doc).
+        """
         try:
-            self.drive_service.permissions().create(
-                fileId=doc_id,
-                body={"type": "anyone", "role": "reader"},
-                fields="id"
-            ).execute()
-            file_info = self.drive_service.files().get(fileId=doc_id, fields="webViewLink").execute()
-            return file_info.get("webViewLink")
+            file_metadata = {
+                "name": title,
+                "mimeType": "application/vnd.google-apps.document",
+                "parents": [folder_id]
+            }
+            media = MediaIoBaseUpload(
+                io.BytesIO(content.encode("utf-8")),
+                mimetype="text/markdown" if markdown else "text/plain"
+            )
+            return self.drive_service.files().create(
+                body=file_metadata, media_body=media, fields="id, webViewLink"
+            ).execute(http=self._http())
         except Exception as e:
-            print(f"Failed to make document shareable: {e}")
+            print(f"Failed to create Google Doc '{title}': {e}")
             return None
 
-    def _convert_markdown_to_google_doc(self, markdown_content, title):
-        """Convert Markdown content to a Google Document."""
+    @instrumentation.tracked("google_docs")
+    def create_placeholder(self, kind="document", shareable=True):
+        """
+        Create an empty Google Doc (or folder) so its link can be handed out
+        before the content exists. Filled later with `fill_document` / `rename_file`.
+
+        Returns:
+            dict: {"id", "link"} of the placeholder, or None on failure
+        """
+        mime_type = "application/vnd.google-apps.folder" if kind == "folder" else "application/vnd.google-apps.document"
+        try:
+            file = self.drive_service.files().create(
+                body={"name": f"Pending {kind}", "mimeType": mime_type},
+                fields="id, webViewLink"
+            ).execute(http=self._http())
+            if shareable:
+                self._make_documents_shareable([file["id"]])
+            return {"id": file["id"], "link": file.get("webViewLink")}
+        except Exception as e:
+            print(f"Failed to create placeholder {kind}: {e}")
+            return None
+
+    def fill_document(self, doc_id, content, title, folder_id, markdown=False):
+        """
+        Upload content into an existing (placeholder) Google Doc, renaming it and
+        moving it into the folder, with a single Drive call.
+        """
+        media = MediaIoBaseUpload(
+            io.BytesIO(content.encode("utf-8")),
+            mimetype="text/markdown" if markdown else "text/plain"
+        )
+        return self.drive_service.files().update(
+            fileId=doc_id,
+            body={"name": title},
+            addParents=folder_id,
+            removeParents="root",
+            media_body=media,
+            fields="id, webViewLink"
+        ).execute(http=self._http())
+
+    @instrumentation.tracked("google_docs")
+    def rename_file(self, file_id, name):
+        """Rename a Drive file or folder."""
+        return self.drive_service.files().update(
+            fileId=file_id, body={"name": name}, fields="id"
+        ).execute(http=self._http())
+
+    def remember_folder(self, folder_name, folder_id, folder_link, shared=False):
+        """Register a folder created elsewhere (e.g. a placeholder) under its name."""
+        with self._folder_lock:
+            self._folder_cache[folder_name] = (folder_id, folder_link)
+            if shared:
+                self._shared_folders.add(folder_id)
+
+    def get_cached_folder(self, folder_name):
+        """Return the cached (folder id, folder link) for a name, or None without calling Drive."""
+        with self._folder_lock:
+            return self._folder_cache.get(folder_name)
+
+    @instrumentation.tracked("google_docs")
+    def sync_document(self, content, title, folder_id, markdown=False, doc_id=None):
+        """
+        Make the document `title` in the folder hold `content`, with as few Drive calls as possible.
+
+        Documents already uploaded are tracked in a local manifest: unchanged content
+        is skipped, changed content updates the existing document in place.
+        Otherwise the content is uploaded into `doc_id` (a reserved placeholder) or a new document.
+
+        Returns:
+            dict: The document "id" and "webViewLink", or None on failure
+        """
+        key = f"{folder_id}/{title}"
+        content_hash = hashlib.sha256(f"{int(markdown)}:{content}".encode("utf-8")).hexdigest()
+        entry = self.find_document(folder_id, title)
+
+        if entry and (doc_id is None or doc_id == entry["id"]):
+            if entry["hash"] == content_hash:
+                print(f"[INFO] '{title}' unchanged, skipping upload")
+                instrumentation.record_cache_hit("google_docs")
+                return {"id": entry["id"], "webViewLink": entry.get("link")}
+            if self._update_document(entry["id"], content, markdown):
+                self._record_upload(key, entry["id"], entry.get("link"), content_hash)
+                return {"id": entry["id"], "webViewLink": entry.get("link")}
+
+        if doc_id:
+            file = self.fill_document(doc_id, content, title, folder_id, markdown=markdown)
+        else:
+            file = self._upload_document(content, title, folder_id, markdown)
+        if file:
+            self._record_upload(key, file["id"], file.get("webViewLink"), content_hash)
+        return file
+
+    def find_document(self, folder_id, title):
+        """Manifest entry ("id", "link", "hash") of a document uploaded earlier, or None."""
+        with self._manifest_lock:
+            return self._manifest.get(f"{folder_id}/{title}")
+
+    def _update_document(self, doc_id, content, markdown=False):
+        """Update an existing Google Doc in place. Returns False if it could not be updated."""
         try:
-            # Save the Markdown content as a temporary file
-            temp_file_path = "temp_markdown.md"
-            with open(temp_file_path, "w") as file:
-                file.write(markdown_content)
+            if markdown:
+                # Text edits would lose the formatting converted from Markdown, re-convert in place instead
+                media = MediaIoBaseUpload(io.BytesIO(content.encode("utf-8")), mimetype="text/markdown")
+                self.drive_service.files().update(
+                    fileId=doc_id, media_body=media, fields="id"
+                ).execute(http=self._http())
+                return True
 
-            # Upload the Markdown file to Google Drive
-            file_metadata = {"name": title, "mimeType": "application/vnd.google-apps.document"}
-            media = MediaFileUpload(temp_file_path, mimetype="text/markdown")
-            file = self.drive_service.files().create(body=file_metadata, media_body=media, fields="id").execute()
+            document = self.docs_service.documents().get(documentId=doc_id).execute(http=self._http())
+            old_text = ""
+            for element in document.get('body', {}).get('content', []):
+                if 'paragraph' in element:
+                    for text_run in element['paragraph'].get('elements', []):
+                        old_text += text_run.get('textRun', {}).get('content', '')
 
-            # Cleanup the temporary file
-            os.remove(temp_file_path)
+            new_text = content if content.endswith("\n") else content + "\n"
+            requests = _minimal_edit_requests(old_text or "\n", new_text)
+            if requests:
+                self.docs_service.documents().batchUpdate(
+                    documentId=doc_id, body={"requests": requests}
+                ).execute(http=self._http())
+            return True
+        except Exception as e:
+            print(f"[WARNING] Failed to update Google Doc {doc_id} in place, uploading a new one: {e}")
+            return False
+
+    def _load_manifest(self):
+        if not os.path.exists(self.manifest_path):
+            return {}
+        try:
+            with open(self.manifest_path, "r", encoding="utf-8") as file:
+                return json.load(file)
+        except (OSError, ValueError) as e:
+            print(f"[WARNING] Could not read Google Docs manifest, starting fresh: {e}")
+            return {}
+
+    def _record_upload(self, key, doc_id, link, content_hash):
+        with self._manifest_lock:
+            self._manifest[key] = {"id": doc_id, "link": link, "hash": content_hash}
+            temp_path = f"{self.manifest_path}.tmp"
+            with open(temp_path, "w", encoding="utf-8") as file:
+                json.dump(self._manifest, file, indent=2)
+            os.replace(temp_path, self.manifest_path)
 
-            return file.get("id")
+    def _make_documents_shareable(self, doc_ids):
+        """Make documents shareable with anyone who has the link, in one batch request."""
+        if not doc_ids:
+            return
+
+        def on_response(request_id, response, exception):
+            if exception:
+                print(f"Failed to make document {request_id} shareable: {exception}")
+
+        try:
+            batch = self.drive_service.new_batch_http_request(callback=on_response)
+            for doc_id in doc_ids:
+                batch.add(
+                    self.drive_service.permissions().create(
+                        fileId=doc_id,
+                        body={"type": "anyone", "role": "reader"},
+                        fields="id"
+                    ),
+                    request_id=doc_id
+                )
+            batch.execute(http=self._http())
         except Exception as e:
-            print(f"Failed to convert Markdown to Google Doc: {e}")
-            return None
+            print(f"Failed to make documents shareable: {e}")
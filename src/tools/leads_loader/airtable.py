@@ -1,3 +1,4 @@
+from datetime import datetime, timezone
 from pyairtable import Table
 from pyairtable.formulas import match
 from .lead_loader_base import LeadLoaderBase
@@ -6,6 +7,12 @@ class AirtableLeadLoader(LeadLoaderBase):
     def __init__(self, access_token, base_id, table_name):
         # Use the access_token instead of api_key
         self.table = Table(access_token, base_id, table_name)
+        self.base_id = base_id
+        self.table_name = table_name
+
+    @property
+    def watermark_key(self):
+        return f"airtable:{self.base_id}:{self.table_name}"
 
     def fetch_records(self, lead_ids=None, status_filter="NEW"):
         """
@@ -30,6 +37,24 @@ class AirtableLeadLoader(LeadLoaderBase):
                 for record in records
             ]
 
+    def fetch_records_since(self, watermark, status_filter="NEW"):
+        """
+        Fetches leads matching the status whose LAST_MODIFIED_TIME() is after the watermark.
+        The new watermark is the time the query was issued, so edits made during
+        the fetch are picked up again on the next run.
+        """
+        fetched_at = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.000Z")
+        formula = match({"Status": status_filter})
+        if watermark:
+            formula = f"AND({formula}, IS_AFTER(LAST_MODIFIED_TIME(), DATETIME_PARSE('{watermark}')))"
+
+        records = self.table.all(formula=formula)
+        leads = [
+            {"id": record["id"], **record.get("fields", {})}
+            for record in records
+        ]
+        return leads, fetched_at
+
     def update_record(self, lead_id, updates: dict):
         """
         Updates a record in Airtable, adding new fields dynamically if they don't exist.
@@ -33,6 +33,7 @@ class ApolloLeadLoader(LeadLoaderBase):
     def _load_csv(self):
         """Load leads from CSV file exported from Apollo"""
         try:
+            self._csv_mtime = os.path.getmtime(self.csv_file_path)
             with open(self.csv_file_path, 'r', encoding='utf-8') as file:
                 reader = csv.DictReader(file)
                 self.leads_data = []
@@ -83,6 +84,54 @@ class ApolloLeadLoader(LeadLoaderBase):
             print("[ERROR] No data source configured. Provide either csv_file_path or api_key.")
             return []
 
+    @property
+    def watermark_key(self):
+        if self.csv_file_path:
+            return f"apollo_csv:{os.path.abspath(self.csv_file_path)}"
+        return "apollo_api"
+
+    def fetch_records_since(self, watermark: Optional[Dict], status_filter: str = "NEW"):
+        """
+        Fetch leads added to the Apollo CSV export since the last run
+
+        The watermark holds the file mtime and the number of rows already read.
+        An unchanged file returns nothing; a grown file returns only the appended rows;
+        a file with fewer rows than the offset is treated as a new export and re-read.
+        The API source has no change tracking and falls back to a full fetch.
+
+        Args:
+            watermark: {"mtime": float, "rows": int} from the last run, or None
+            status_filter: Filter by status
+
+        Returns:
+            tuple: (records, new_watermark)
+        """
+        if not self.csv_file_path:
+            return super().fetch_records_since(watermark, status_filter)
+
+        try:
+            mtime = os.path.getmtime(self.csv_file_path)
+        except OSError as e:
+            print(f"[ERROR] Cannot stat CSV file: {str(e)}")
+            return [], watermark
+
+        watermark = watermark or {}
+        if watermark.get("mtime") == mtime:
+            return [], watermark
+
+        offset = watermark.get("rows", 0)
+        # Reload only if the file changed after this loader read it
+        if mtime > getattr(self, "_csv_mtime", 0):
+            self._load_csv()
+        if offset > len(self.leads_data):
+            offset = 0
+
+        new_leads = [
+            lead for lead in self.leads_data[offset:]
+            if lead.get("Status") == status_filter
+        ]
+        return new_leads, {"mtime": mtime, "rows": len(self.leads_data)}
+
     def _fetch_from_csv(self, lead_ids: Optional[List[str]] = None, status_filter: str = "NEW") -> List[Dict]:
         """Fetch leads from loaded CSV data"""
         if lead_ids:
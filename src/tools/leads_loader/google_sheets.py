@@ -40,6 +40,38 @@ class GoogleSheetLeadLoader(LeadLoaderBase):
             print(f"Error fetching records from Google Sheets: {e}")
             return []
 
+    @property
+    def watermark_key(self):
+        return f"google_sheets:{self.spreadsheet_id}:{self.sheet_name}"
+
+    def fetch_records_since(self, watermark, status_filter="NEW"):
+        """
+        Fetches leads matching the status from rows appended after the watermark.
+        The watermark is the last sheet row number read, so only new rows are downloaded.
+        Edits to rows that were already read are not detected.
+        """
+        last_row = int(watermark or 1)  # Row 1 holds the headers
+        try:
+            result = self.sheet_service.spreadsheets().values().batchGet(
+                spreadsheetId=self.spreadsheet_id,
+                ranges=[f"{self.sheet_name}!1:1", f"{self.sheet_name}!A{last_row + 1}:ZZ"]
+            ).execute()
+            value_ranges = result.get("valueRanges", [])
+            headers = value_ranges[0].get("values", [[]])[0]
+            rows = value_ranges[1].get("values", []) if len(value_ranges) > 1 else []
+
+            records = []
+            for i, row in enumerate(rows, start=last_row + 1):
+                record = dict(zip(headers, row))
+                record["id"] = f"{i}"  # Add row number as an ID
+                if record.get("Status") == status_filter:
+                    records.append(record)
+
+            return records, last_row + len(rows)
+        except HttpError as e:
+            print(f"Error fetching incremental records from Google Sheets: {e}")
+            return [], watermark
+
     def update_record(self, id, fields_to_update):
         try:
             # Fetch the header row to identify column indices
@@ -1,6 +1,6 @@
 import os
 import hubspot
-from hubspot.crm.contacts import SimplePublicObjectInput, ApiException
+from hubspot.crm.contacts import SimplePublicObjectInput, PublicObjectSearchRequest, ApiException
 from .lead_loader_base import LeadLoaderBase
 
 HUBSPOT_CONTACTS_PROPERTIES = ["email", "firstname", "lastname", "hs_lead_status", "address", "phone"]
@@ -10,6 +10,10 @@ class HubSpotLeadLoader(LeadLoaderBase):
         # Use access_token instead of environment variable for more flexibility
         self.client = hubspot.Client.create(access_token=access_token or os.getenv("HUBSPOT_API_KEY"))
 
+    @property
+    def watermark_key(self):
+        return "hubspot:contacts"
+
     def fetch_records(self, lead_ids=None, status_filter="NEW"):
         """
         Fetches leads from HubSpot. If lead IDs are provided, fetch those specific records.
@@ -48,6 +52,48 @@ class HubSpotLeadLoader(LeadLoaderBase):
             print(f"Error fetching records from HubSpot: {e}")
             return []
 
+    def fetch_records_since(self, watermark, status_filter="NEW"):
+        """
+        Fetches leads matching the status whose `lastmodifieddate` is after the watermark,
+        using the CRM search API so HubSpot does the filtering server side.
+        The watermark is the highest `lastmodifieddate` seen, in epoch milliseconds.
+        """
+        filters = [{"propertyName": "hs_lead_status", "operator": "EQ", "value": status_filter}]
+        if watermark:
+            filters.append({"propertyName": "lastmodifieddate", "operator": "GT", "value": str(watermark)})
+
+        records = []
+        new_watermark = watermark
+        after = None
+        try:
+            while True:
+                search_request = PublicObjectSearchRequest(
+                    filter_groups=[{"filters": filters}],
+                    properties=HUBSPOT_CONTACTS_PROPERTIES + ["lastmodifieddate"],
+                    sorts=[{"propertyName": "lastmodifieddate", "direction": "ASCENDING"}],
+                    limit=100,
+                    after=after,
+                )
+                api_response = self.client.crm.contacts.search_api.do_search(
+                    public_object_search_request=search_request
+                )
+                for contact in api_response.results:
+                    records.append({"id": contact.id, **(contact.properties or {})})
+                    if contact.updated_at:
+                        modified_ms = int(contact.updated_at.timestamp() * 1000)
+                        new_watermark = max(new_watermark or 0, modified_ms)
+
+                # Check for more pages
+                if not api_response.paging or not api_response.paging.next:
+                    break
+                after = api_response.paging.next.after
+        except ApiException as e:
+            print(f"Error fetching incremental records from HubSpot: {e}")
+            # Keep the old watermark so nothing is skipped
+            return records, watermark
+
+        return records, new_watermark
+
     def update_record(self, lead_id, fields_to_update):
         try:
             # Prepare the fields to update in HubSpot
@@ -1,4 +1,14 @@
+import os
+import json
 from abc import ABC, abstractmethod
+from src.instrumentation import instrumentation
+
+# File where each loader persists its incremental sync watermark
+WATERMARKS_FILE = os.getenv("LEAD_WATERMARKS_FILE", "lead_watermarks.json")
+
+
+# Loader methods calling the CRM, timed as "crm" calls for every loader
+CRM_METHODS = ("fetch_records", "fetch_records_since", "update_record")
 
 
 class LeadLoaderBase(ABC):
@@ -8,6 +18,12 @@ class LeadLoaderBase(ABC):
         "ATTEMPTED_TO_CONTACT"
     ]
 
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        for name in CRM_METHODS:
+            if name in cls.__dict__:
+                setattr(cls, name, instrumentation.tracked("crm", cls.__name__)(cls.__dict__[name]))
+
     @abstractmethod
     def fetch_records(self, status_filter="NEW"):
         """
@@ -23,6 +39,68 @@ class LeadLoaderBase(ABC):
         """
         pass
 
+    def fetch_records_since(self, watermark, status_filter="NEW"):
+        """
+        Fetch records matching the status that were added or changed after the watermark.
+        Loaders supporting incremental sync override this; the default does a full fetch.
+
+        Args:
+            watermark: Last persisted watermark, None on the first run
+            status_filter: Filter by status
+
+        Returns:
+            tuple: (records, new_watermark)
+        """
+        return self.fetch_records(status_filter=status_filter), watermark
+
+    @property
+    def watermark_key(self):
+        """
+        Key identifying this loader's data source in the watermarks file.
+        Subclasses should include the source identifier (table, sheet, file...).
+        """
+        return self.__class__.__name__
+
+    def get_watermark(self):
+        """
+        Get the persisted watermark for this loader, None if never synced.
+        """
+        return self._load_watermarks().get(self.watermark_key)
+
+    def save_watermark(self, watermark):
+        """
+        Persist the watermark for this loader (atomic write).
+        """
+        watermarks = self._load_watermarks()
+        watermarks[self.watermark_key] = watermark
+        self._write_watermarks(watermarks)
+
+    def reset_watermark(self):
+        """
+        Forget the watermark so the next incremental fetch is a full sync.
+        """
+        watermarks = self._load_watermarks()
+        if watermarks.pop(self.watermark_key, None) is not None:
+            self._write_watermarks(watermarks)
+
+    @staticmethod
+    def _load_watermarks():
+        if not os.path.exists(WATERMARKS_FILE):
+            return {}
+        try:
+            with open(WATERMARKS_FILE, "r", encoding="utf-8") as file:
+                return json.load(file)
+        except (OSError, ValueError) as e:
+            print(f"[WARNING] Could not read lead watermarks, doing a full sync: {e}")
+            return {}
+
+    @staticmethod
+    def _write_watermarks(watermarks):
+        temp_path = f"{WATERMARKS_FILE}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as file:
+            json.dump(watermarks, file, indent=2, default=str)
+        os.replace(temp_path, WATERMARKS_FILE)
+
     def fetch_new_leads(self):
         """
         Get leads with status "NEW" by default.
@@ -33,6 +111,35 @@ class LeadLoaderBase(ABC):
             print(f"Error fetching new leads: {e}")
             return []
 
+    def fetch_incremental_leads(self, status_filter="NEW"):
+        """
+        Get leads with the given status that are new or changed since the last committed run.
+        The new watermark is kept pending until `commit_watermark` is called, so leads
+        from a run that crashes midway are fetched again next time.
+        """
+        try:
+            records, self._pending_watermark = self.fetch_records_since(
+                self.get_watermark(), status_filter=status_filter
+            )
+            return records
+        except Exception as e:
+            print(f"Error fetching incremental leads: {e}")
+            self._pending_watermark = None
+            return []
+
+    def commit_watermark(self):
+        """
+        Persist the watermark of the last incremental fetch once its leads are processed.
+        """
+        watermark = getattr(self, "_pending_watermark", None)
+        if watermark is None:
+            return
+        try:
+            self.save_watermark(watermark)
+            self._pending_watermark = None
+        except OSError as e:
+            print(f"Error saving lead watermark: {e}")
+
     def update_lead_status(self, lead_id, status):
         """
         Update the lead's status if it's valid.
@@ -9,6 +9,14 @@ except ImportError:
     SUPABASE_AVAILABLE = False
     print("[WARNING] Supabase not installed. Run: pip install supabase")
 
+# Rows sent per upsert request when syncing leads in bulk
+SUPABASE_UPSERT_BATCH_SIZE = 500
+
+
+def normalize_email(email) -> str:
+    """Normalize an email address for deduplication"""
+    return (email or "").strip().lower()
+
 
 class SupabaseLeadLoader(LeadLoaderBase):
     """
@@ -60,6 +68,40 @@ class SupabaseLeadLoader(LeadLoaderBase):
             print(f"❌ Error fetching from Supabase: {str(e)}")
             return []
 
+    @property
+    def watermark_key(self):
+        return f"supabase:{self.supabase_url}:{self.table_name}"
+
+    def fetch_records_since(self, watermark: Optional[str], status_filter: str = "NEW"):
+        """
+        Fetch leads matching the status whose `updated_at` is after the watermark.
+        Relies on `updated_at` being bumped on every update (e.g. a moddatetime trigger).
+
+        Args:
+            watermark: Highest `updated_at` seen on the last run, None for a full sync
+            status_filter: Filter by status
+
+        Returns:
+            tuple: (records, new_watermark)
+        """
+        try:
+            query = self.client.table(self.table_name).select("*").eq("Status", status_filter)
+            if watermark:
+                query = query.gt("updated_at", watermark)
+            response = query.order("updated_at").execute()
+            records = response.data if response.data else []
+
+            new_watermark = watermark
+            for record in records:
+                updated_at = record.get("updated_at")
+                if updated_at and (new_watermark is None or updated_at > new_watermark):
+                    new_watermark = updated_at
+            return records, new_watermark
+
+        except Exception as e:
+            print(f"❌ Error fetching incremental leads from Supabase: {str(e)}")
+            return [], watermark
+
     def update_record(self, lead_id: str, updates: Dict) -> Dict:
         """
         Update a lead record in Supabase
@@ -133,15 +175,118 @@ class SupabaseLeadLoader(LeadLoaderBase):
             print(f"❌ Error bulk inserting leads: {str(e)}")
             return []
 
-    def sync_from_apollo(self, apollo_loader):
+    def bulk_upsert_leads(self, leads_data: List[Dict], on_conflict: str = "Email",
+                          batch_size: int = SUPABASE_UPSERT_BATCH_SIZE) -> Dict[str, int]:
+        """
+        Upsert leads into Supabase in batches, keyed on the email column
+
+        Leads are deduplicated locally by normalized email (the last occurrence wins),
+        then each batch costs one lookup of existing emails plus one upsert call,
+        so the number of round-trips scales with the number of batches, not rows.
+        Existing rows are matched case-insensitively and keep their stored casing.
+        Requires a unique constraint on the `on_conflict` column.
+
+        Args:
+            leads_data: List of lead data dictionaries
+            on_conflict: Unique column used to resolve conflicts
+            batch_size: Number of rows sent per upsert request
+
+        Returns:
+            Dict with "inserted", "updated" and "skipped" counts
         """
-        Sync leads from Apollo to Supabase
+        counts = {"inserted": 0, "updated": 0, "skipped": 0}
+
+        # Dedupe by normalized email, rows without an email can't be upserted
+        rows_by_email = {}
+        for lead in leads_data:
+            row = self._to_table_row(lead)
+            email = row.get(on_conflict)
+            if not email:
+                counts["skipped"] += 1
+                continue
+            if email in rows_by_email:
+                counts["skipped"] += 1
+            rows_by_email[email] = row
+
+        rows = list(rows_by_email.values())
+        for start in range(0, len(rows), batch_size):
+            batch = rows[start:start + batch_size]
+            emails = [row[on_conflict] for row in batch]
+            try:
+                # One lookup per batch to tell inserts from updates
+                stored_emails = self._find_stored_emails(emails, on_conflict)
+
+                # Rows stored with another casing keep it, so the upsert conflicts
+                # on them instead of inserting a lowercase duplicate
+                batch = [
+                    {**row, on_conflict: stored_emails.get(row[on_conflict], row[on_conflict])}
+                    for row in batch
+                ]
+                self.client.table(self.table_name).upsert(
+                    batch, on_conflict=on_conflict
+                ).execute()
+
+                updated = sum(1 for email in emails if email in stored_emails)
+                counts["updated"] += updated
+                counts["inserted"] += len(batch) - updated
+            except Exception as e:
+                print(f"❌ Error upserting batch {start // batch_size + 1}: {str(e)}")
+                counts["skipped"] += len(batch)
+
+        return counts
+
+    def _find_stored_emails(self, emails: List[str], on_conflict: str = "Email") -> Dict[str, str]:
+        """
+        Look up existing rows case-insensitively, in one request
+
+        Rows created before emails were normalized may be stored with mixed case,
+        which an exact `in` filter on the lowercase emails would miss.
+
+        Args:
+            emails: Normalized emails to look up
+            on_conflict: Email column of the leads table
+
+        Returns:
+            Dict mapping each normalized email found to the casing stored in the table
+        """
+        # Quoted so dots and commas in addresses don't break the filter syntax
+        filters = ",".join(
+            '{}.ilike."{}"'.format(on_conflict, email.replace("\\", "\\\\").replace('"', '\\"'))
+            for email in emails
+        )
+        existing = self.client.table(self.table_name).select(on_conflict).or_(filters).execute()
+
+        wanted = set(emails)
+        stored_emails = {}
+        for record in existing.data or []:
+            stored = record.get(on_conflict)
+            # ilike treats "_" as a wildcard, keep exact matches only
+            email = normalize_email(stored)
+            if email in wanted and (email not in stored_emails or stored == email):
+                stored_emails[email] = stored
+        return stored_emails
+
+    @staticmethod
+    def _to_table_row(lead: Dict) -> Dict:
+        """
+        Convert a loader lead into a row for the leads table.
+        Drops the source `id` (the table generates its own UUID) and the non-column `raw_data`.
+        """
+        row = {k: v for k, v in lead.items() if k not in ("id", "raw_data")}
+        if "Email" in row:
+            row["Email"] = normalize_email(row["Email"])
+        return row
+
+    def sync_from_apollo(self, apollo_loader, batch_size: int = SUPABASE_UPSERT_BATCH_SIZE):
+        """
+        Sync leads from Apollo to Supabase using batched upserts on the email column
 
         Args:
             apollo_loader: ApolloLeadLoader instance with loaded data
+            batch_size: Number of rows sent per upsert request
 
         Returns:
-            Number of synced leads
+            Number of synced leads (inserted + updated)
         """
         try:
             # Get all leads from Apollo
@@ -151,23 +296,13 @@ class SupabaseLeadLoader(LeadLoaderBase):
                 print("[WARNING] No leads to sync from Apollo")
                 return 0
 
-            # Insert into Supabase (handling duplicates)
-            synced_count = 0
-            for lead in apollo_leads:
-                # Check if lead already exists
-                existing = self.client.table(self.table_name).select("id").eq("Email", lead.get("Email")).execute()
-
-                if not existing.data:
-                    # Insert new lead
-                    self.insert_lead(lead)
-                    synced_count += 1
-                else:
-                    # Update existing lead
-                    existing_id = existing.data[0]["id"]
-                    self.update_record(existing_id, lead)
-                    synced_count += 1
-
-            print(f"[OK] Synced {synced_count} leads from Apollo to Supabase")
+            counts = self.bulk_upsert_leads(apollo_leads, batch_size=batch_size)
+            synced_count = counts["inserted"] + counts["updated"]
+
+            print(
+                f"[OK] Synced {synced_count} leads from Apollo to Supabase "
+                f"({counts['inserted']} inserted, {counts['updated']} updated, {counts['skipped']} skipped)"
+            )
             return synced_count
 
         except Exception as e:
@@ -0,0 +1,202 @@
+"""
+Hybrid case study retriever
+Fuses BM25 keyword scores with embedding similarity over case study chunks,
+then reranks the top candidates per case study before choosing one
+"""
+
+import re
+import numpy as np
+from .local_embeddings import TOKEN_PATTERN
+
+# Words carrying no signal for matching a lead report to a case study
+STOPWORDS = frozenset("""
+a an and are as at be by for from has have in is it its of on or that the their this to was were
+will with we our you your they them he she his her not but can also more most into about which who
+""".split())
+
+
+def tokenize(text: str):
+    return [token for token in TOKEN_PATTERN.findall(text.lower()) if token not in STOPWORDS]
+
+
+def chunk_text(text: str, max_words: int = 200, overlap: int = 40):
+    """
+    Split a document into chunks of about `max_words` words on paragraph boundaries.
+    Paragraphs longer than a chunk are split with an overlap of `overlap` words.
+    """
+    chunks, current, current_words = [], [], 0
+    for paragraph in re.split(r"\n\s*\n", text):
+        words = paragraph.split()
+        if not words:
+            continue
+        if current and current_words + len(words) > max_words:
+            chunks.append("\n\n".join(current))
+            current, current_words = [], 0
+        if len(words) > max_words:
+            step = max_words - overlap
+            for start in range(0, len(words), step):
+                chunks.append(" ".join(words[start:start + max_words]))
+                if start + max_words >= len(words):
+                    break
+            continue
+        current.append(paragraph.strip())
+        current_words += len(words)
+    if current:
+        chunks.append("\n\n".join(current))
+    return chunks
+
+
+def join_chunks(chunks, overlap: int = 40):
+    """
+    Rebuild a document from its chunks in order, the inverse of `chunk_text`.
+    Words repeated at the start of a chunk split from a long paragraph are dropped.
+    """
+    text, previous_words = "", []
+    for chunk in chunks:
+        words = chunk.split()
+        if previous_words and len(words) > overlap and words[:overlap] == previous_words[-overlap:]:
+            text += " " + " ".join(words[overlap:])
+        else:
+            text += ("\n\n" if text else "") + chunk
+        previous_words = words
+    return text
+
+
+class BM25Index:
+    """
+    Okapi BM25 over a fixed set of chunks, precomputed as a dense (chunks x vocabulary)
+    weight matrix so a batch of queries is scored with a single matrix product.
+    """
+
+    def __init__(self, texts, k1: float = 1.5, b: float = 0.75):
+        tokenized = [tokenize(text) for text in texts]
+        self.vocabulary = {}
+        for tokens in tokenized:
+            for token in tokens:
+                self.vocabulary.setdefault(token, len(self.vocabulary))
+
+        term_counts = np.zeros((len(texts), len(self.vocabulary)), dtype=np.float32)
+        for row, tokens in enumerate(tokenized):
+            for token in tokens:
+                term_counts[row, self.vocabulary[token]] += 1
+
+        lengths = term_counts.sum(axis=1, keepdims=True)
+        average_length = lengths.mean() if len(texts) else 0.0
+        document_frequency = (term_counts > 0).sum(axis=0)
+        idf = np.log(1 + (len(texts) - document_frequency + 0.5) / (document_frequency + 0.5))
+
+        length_norm = k1 * (1 - b + b * lengths / max(average_length, 1e-9))
+        self.weights = (idf * term_counts * (k1 + 1) / (term_counts + length_norm)).astype(np.float32)
+
+    def score_batch(self, queries):
+        """BM25 scores as a (queries x chunks) matrix, each query term counted once."""
+        query_terms = np.zeros((len(queries), len(self.vocabulary)), dtype=np.float32)
+        for row, query in enumerate(queries):
+            for token in set(tokenize(query)):
+                column = self.vocabulary.get(token)
+                if column is not None:
+                    query_terms[row, column] = 1.0
+        return query_terms @ self.weights.T
+
+
+def _min_max(scores):
+    """Scale each row to [0, 1] so BM25 and cosine scores can be mixed."""
+    low = scores.min(axis=1, keepdims=True)
+    spread = scores.max(axis=1, keepdims=True) - low
+    spread[spread == 0] = 1.0
+    return (scores - low) / spread
+
+
+class HybridRetriever:
+    """
+    Picks the case study best matching a query.
+
+    Chunk scores are `alpha * cosine + (1 - alpha) * BM25`, both min-max scaled per query.
+    The top `candidates` chunks are then reranked per source document: its best chunk
+    score plus a small bonus for every other candidate chunk from the same document,
+    which favours case studies matching the query in several places.
+    """
+
+    def __init__(self, chunks, chunk_vectors, embedding_function, alpha: float = 0.6,
+                 candidates: int = 8, coverage_bonus: float = 0.1):
+        self.chunks = chunks
+        self.sources = [chunk.metadata.get("source", "") for chunk in chunks]
+        vectors = np.asarray(chunk_vectors, dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True) if len(vectors) else None
+        if norms is not None:
+            norms[norms == 0] = 1.0
+            vectors = vectors / norms
+        self.chunk_vectors = vectors
+        self.embedding_function = embedding_function
+        self.bm25 = BM25Index([chunk.page_content for chunk in chunks])
+        self.alpha = alpha
+        self.candidates = candidates
+        self.coverage_bonus = coverage_bonus
+
+        chunks_by_source = {}
+        for chunk in chunks:
+            chunks_by_source.setdefault(chunk.metadata.get("source", ""), []).append(chunk)
+        self.documents = {
+            source: join_chunks(
+                chunk.page_content
+                for chunk in sorted(source_chunks, key=lambda chunk: chunk.metadata.get("chunk", 0))
+            )
+            for source, source_chunks in chunks_by_source.items()
+        }
+
+    def embed_queries(self, queries):
+        """Embed all queries in one call to the embedding function."""
+        if hasattr(self.embedding_function, "embed_matrix"):
+            vectors = self.embedding_function.embed_matrix(queries)
+        else:
+            vectors = np.asarray(self.embedding_function.embed_documents(list(queries)), dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return vectors / norms
+
+    def score_batch(self, queries, query_vectors=None):
+        """Fused chunk scores as a (queries x chunks) matrix."""
+        if query_vectors is None:
+            query_vectors = self.embed_queries(queries)
+        vector_scores = np.asarray(query_vectors, dtype=np.float32) @ self.chunk_vectors.T
+        keyword_scores = self.bm25.score_batch(queries)
+        return self.alpha * _min_max(vector_scores) + (1 - self.alpha) * _min_max(keyword_scores)
+
+    def retrieve_batch(self, queries, k: int = 1, query_vectors=None):
+        """
+        Rank case studies for many queries in one vectorized pass.
+
+        Returns:
+            list: For each query, up to `k` (source, score) pairs sorted by decreasing score
+        """
+        if not queries:
+            return []
+        if not self.chunks:
+            return [[] for _ in queries]
+
+        scores = self.score_batch(queries, query_vectors)
+        candidates = min(self.candidates, scores.shape[1])
+        top = np.argpartition(-scores, candidates - 1, axis=1)[:, :candidates]
+
+        results = []
+        for row, chunk_ids in enumerate(top):
+            by_source = {}
+            for chunk_id in chunk_ids:
+                by_source.setdefault(self.sources[chunk_id], []).append(float(scores[row, chunk_id]))
+            reranked = sorted(
+                (
+                    (source, max(values) + self.coverage_bonus * (len(values) - 1))
+                    for source, values in by_source.items()
+                ),
+                key=lambda item: item[1],
+                reverse=True,
+            )
+            results.append(reranked[:k])
+        return results
+
+    def document(self, source: str) -> str:
+        """Full text of an indexed case study, rebuilt from its stored chunks."""
+        return self.documents.get(source, "")
+
+    def retrieve(self, query: str, k: int = 1):
+        return self.retrieve_batch([query], k)[0]
@@ -0,0 +1,54 @@
+"""
+Local embedding functions for case study retrieval
+Run fully offline, no embeddings API needed
+"""
+
+import re
+import zlib
+import numpy as np
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+
+class HashingEmbeddings:
+    """
+    Feature hashing embeddings over word unigrams and bigrams.
+
+    Each token is hashed into one of `n_features` buckets with a sign bit,
+    term frequencies are log-scaled and the vector is L2-normalized, so the
+    dot product of two embeddings is their cosine similarity.
+    Implements the `embed_documents` / `embed_query` interface of LangChain embeddings.
+    """
+
+    def __init__(self, n_features: int = 4096, use_bigrams: bool = True):
+        self.n_features = n_features
+        self.use_bigrams = use_bigrams
+        self.model = f"hashing-{n_features}{'-bigrams' if use_bigrams else ''}"
+
+    def _tokens(self, text: str):
+        words = TOKEN_PATTERN.findall(text.lower())
+        tokens = list(words)
+        if self.use_bigrams:
+            tokens += [f"{a} {b}" for a, b in zip(words, words[1:])]
+        return tokens
+
+    def embed_matrix(self, texts) -> np.ndarray:
+        """Embed texts into a (len(texts), n_features) float32 matrix of unit rows."""
+        matrix = np.zeros((len(texts), self.n_features), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for token in self._tokens(text):
+                hashed = zlib.crc32(token.encode("utf-8"))
+                sign = 1.0 if hashed & 0x80000000 else -1.0
+                matrix[row, hashed % self.n_features] += sign
+
+        # Sublinear term frequency, keeps the sign of each bucket
+        matrix = np.sign(matrix) * np.log1p(np.abs(matrix))
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return (matrix / norms).astype(np.float32)
+
+    def embed_documents(self, texts):
+        return self.embed_matrix(texts).tolist()
+
+    def embed_query(self, text):
+        return self.embed_matrix([text])[0].tolist()
@@ -0,0 +1,160 @@
+"""
+NumPy vector index for case study retrieval
+Stores L2-normalized float32 embeddings in a memory-mapped .npy matrix
+"""
+
+import os
+import json
+import shutil
+import threading
+import numpy as np
+from langchain_core.documents import Document
+
+
+class NumpyVectorIndex:
+    """
+    Small in-process vector index: one float32 matrix of unit embeddings plus a JSON
+    file with the documents. Similarity search is a single matrix-vector product.
+
+    Exposes the subset of the LangChain vector store API used by the RAG tool
+    (`add_documents`, `delete`, `similarity_search`), so it can replace Chroma.
+    """
+
+    def __init__(self, index_path: str, embedding_function):
+        self.index_path = index_path
+        self.embedding_function = embedding_function
+        self.fingerprint = f"{type(embedding_function).__name__}:{getattr(embedding_function, 'model', '')}"
+        self._matrix_path = os.path.join(index_path, "embeddings.npy")
+        self._documents_path = os.path.join(index_path, "documents.json")
+        self._write_lock = threading.Lock()
+        # (ids, documents, matrix) swapped as a whole so readers always see a consistent snapshot
+        self._snapshot = ([], [], None)
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self._documents_path) or not os.path.exists(self._matrix_path):
+            # Drop leftovers (e.g. a sync manifest) of an incomplete index
+            shutil.rmtree(self.index_path, ignore_errors=True)
+            return
+        with open(self._documents_path, "r", encoding="utf-8") as file:
+            stored = json.load(file)
+
+        if stored.get("fingerprint") != self.fingerprint:
+            # Vectors from another embedding model can't be compared, start over
+            print("[INFO] Embedding model changed, rebuilding NumPy case study index")
+            shutil.rmtree(self.index_path, ignore_errors=True)
+            return
+
+        documents = [
+            Document(page_content=doc["page_content"], metadata=doc["metadata"])
+            for doc in stored["documents"]
+        ]
+        matrix = np.load(self._matrix_path, mmap_mode="r")
+        self._snapshot = (stored["ids"], documents, matrix)
+
+    def _save(self, ids, documents, matrix):
+        os.makedirs(self.index_path, exist_ok=True)
+
+        # Release our own mapping of the old file before replacing it
+        self._snapshot = (ids, documents, matrix)
+        temp_matrix_path = f"{self._matrix_path}.tmp"
+        with open(temp_matrix_path, "wb") as file:
+            np.save(file, matrix)
+        os.replace(temp_matrix_path, self._matrix_path)
+
+        temp_documents_path = f"{self._documents_path}.tmp"
+        with open(temp_documents_path, "w", encoding="utf-8") as file:
+            json.dump({
+                "fingerprint": self.fingerprint,
+                "ids": ids,
+                "documents": [{"page_content": d.page_content, "metadata": d.metadata} for d in documents],
+            }, file)
+        os.replace(temp_documents_path, self._documents_path)
+
+        self._snapshot = (ids, documents, np.load(self._matrix_path, mmap_mode="r"))
+
+    def get_chunks(self):
+        """
+        Every indexed document with its embedding, from one consistent snapshot.
+
+        Returns:
+            tuple: (list of Documents, float32 matrix of their unit embeddings)
+        """
+        _, documents, matrix = self._snapshot
+        if matrix is None:
+            return [], np.zeros((0, 0), dtype=np.float32)
+        return list(documents), np.asarray(matrix, dtype=np.float32)
+
+    def reset(self):
+        """Drop every indexed document, e.g. before re-indexing with another embedding model."""
+        with self._write_lock:
+            self._snapshot = ([], [], None)
+            for path in (self._matrix_path, self._documents_path):
+                if os.path.exists(path):
+                    os.remove(path)
+
+    def embed_texts(self, texts) -> np.ndarray:
+        """Embed texts with the index embedding function into unit float32 rows."""
+        if hasattr(self.embedding_function, "embed_matrix"):
+            vectors = self.embedding_function.embed_matrix(texts)
+        else:
+            vectors = np.asarray(self.embedding_function.embed_documents(texts), dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return (vectors / norms).astype(np.float32)
+
+    def add_documents(self, documents, ids=None):
+        if not documents:
+            return []
+        ids = ids or [f"doc-{i}" for i in range(len(documents))]
+        vectors = self.embed_texts([doc.page_content for doc in documents])
+        with self._write_lock:
+            old_ids, old_documents, old_matrix = self._snapshot
+            if old_matrix is None or len(old_ids) == 0:
+                matrix = vectors
+            else:
+                matrix = np.vstack([np.asarray(old_matrix), vectors])
+            self._save(old_ids + list(ids), old_documents + list(documents), matrix)
+        return ids
+
+    def delete(self, ids=None, where=None):
+        """Delete documents by id, or by metadata equality (e.g. where={"source": path})."""
+        with self._write_lock:
+            old_ids, old_documents, old_matrix = self._snapshot
+            keep = [
+                i for i, (doc_id, doc) in enumerate(zip(old_ids, old_documents))
+                if not (
+                    (ids is not None and doc_id in ids)
+                    or (where and all(doc.metadata.get(k) == v for k, v in where.items()))
+                )
+            ]
+            if len(keep) == len(old_ids):
+                return
+            matrix = np.asarray(old_matrix)[keep]
+            self._save([old_ids[i] for i in keep], [old_documents[i] for i in keep], matrix)
+
+    def search_vectors(self, query_matrix: np.ndarray, k: int = 1):
+        """
+        Top-k search for a batch of unit query vectors with one matrix product.
+
+        Returns:
+            list: For each query, a list of (Document, score) sorted by decreasing score
+        """
+        _, documents, matrix = self._snapshot
+        if matrix is None or len(documents) == 0:
+            return [[] for _ in range(len(query_matrix))]
+
+        scores = np.asarray(query_matrix, dtype=np.float32) @ np.asarray(matrix).T
+        k = min(k, len(documents))
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        results = []
+        for row, candidates in enumerate(top):
+            ordered = candidates[np.argsort(-scores[row, candidates])]
+            results.append([(documents[i], float(scores[row, i])) for i in ordered])
+        return results
+
+    def similarity_search_with_score(self, query: str, k: int = 4):
+        return self.search_vectors(self.embed_texts([query]), k)[0]
+
+    def similarity_search(self, query: str, k: int = 4):
+        return [doc for doc, _ in self.similarity_search_with_score(query, k)]
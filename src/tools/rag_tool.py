@@ -1,9 +1,51 @@
 import os
-from langchain_community.document_loaders import DirectoryLoader
-from langchain_chroma import Chroma
+import json
+import asyncio
+import hashlib
+import threading
+from concurrent.futures import Future
+import numpy as np
+from langchain_core.documents import Document
+from src.instrumentation import instrumentation
+from .rag.hybrid_retriever import HybridRetriever, chunk_text
+
+# Vector store backend: "chroma" (persistent Chroma database) or "numpy" (memory-mapped matrix)
+RAG_BACKEND = os.getenv("RAG_BACKEND", "chroma").lower()
+
+DATABASE_PATH = "database"
+NUMPY_INDEX_PATH = os.path.join(DATABASE_PATH, "numpy_index")
+CASE_STUDIES_PATH = os.path.join("data", "case_studies")
+# Content hash of every indexed case study, used to only re-embed what changed
+INDEX_MANIFEST_PATH = os.path.join(DATABASE_PATH, "case_studies_manifest.json")
+# Bumped when the way documents are split into indexed chunks changes
+INDEX_VERSION = "chunks-v1"
+
+# Most RAG queries sharing one embedding call
+RAG_MAX_BATCH_SIZE = 64
+
+# Process-wide vector store and hybrid retriever, built once and shared by all queries
+_vector_store = None
+_retriever = None
+_vector_store_lock = threading.Lock()
+# Files signature (name, mtime, size) at the last index sync
+_indexed_signature = None
 
 def get_embeddings():
-    """Get embeddings based on LLM provider configuration."""
+    """
+    Get embeddings based on LLM provider configuration.
+    EMBEDDINGS_PROVIDER can select an offline model instead:
+    "local" (feature hashing, no dependency) or "huggingface" (sentence-transformers on CPU).
+    """
+    embeddings_provider = os.getenv("EMBEDDINGS_PROVIDER", "").lower()
+    if embeddings_provider == "local":
+        from .rag.local_embeddings import HashingEmbeddings
+        return HashingEmbeddings()
+    if embeddings_provider == "huggingface":
+        from langchain_community.embeddings import HuggingFaceEmbeddings
+        return HuggingFaceEmbeddings(
+            model_name=os.getenv("LOCAL_EMBEDDINGS_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
+        )
+
     llm_provider = os.getenv("LLM_PROVIDER", "openai").lower()
 
     if llm_provider == "openai":
@@ -19,25 +61,279 @@ def get_embeddings():
 
     return embeddings
 
-def get_vector_store():
-    """Get or create the vector store."""
-    database_path = "database"
-    embeddings = get_embeddings()
+def get_embeddings_fingerprint(embeddings):
+    """Identifies the embedding model: vectors of different models can't be mixed in one index."""
+    model = getattr(embeddings, "model", None) or getattr(embeddings, "model_name", None) or ""
+    return f"{type(embeddings).__name__}:{model}"
+
+def _store_embeddings(vectorstore):
+    return vectorstore.embedding_function if RAG_BACKEND == "numpy" else vectorstore.embeddings
 
-    if os.path.exists(database_path) and os.listdir(database_path):
-        # Use the existing vector store
-        vectorstore = Chroma(persist_directory=database_path, embedding_function=embeddings)
+def _reset_index(vectorstore):
+    """Delete every vector of the store (Chroma recreates its collection, so the dimension can change)."""
+    if RAG_BACKEND == "numpy":
+        vectorstore.reset()
     else:
-        # Load documents and create a new vector store
-        loader = DirectoryLoader("./data/case_studies")
-        docs = loader.load()
-        vectorstore = Chroma.from_documents(docs, embeddings, persist_directory=database_path)
+        vectorstore.reset_collection()
+
+def get_case_study_files():
+    """List case study source files, with paths as stored in the documents metadata."""
+    if not os.path.isdir(CASE_STUDIES_PATH):
+        return []
+    return sorted(
+        os.path.join(CASE_STUDIES_PATH, name)
+        for name in os.listdir(CASE_STUDIES_PATH)
+        if os.path.isfile(os.path.join(CASE_STUDIES_PATH, name))
+    )
+
+def get_case_studies_signature():
+    """Cheap signature of the case studies folder, changes when a file is added, edited or removed."""
+    signature = []
+    for path in get_case_study_files():
+        stat = os.stat(path)
+        signature.append((path, stat.st_mtime_ns, stat.st_size))
+    return tuple(signature)
+
+def compute_file_hash(path):
+    with open(path, "rb") as file:
+        return hashlib.sha256(file.read()).hexdigest()
+
+def load_case_study(path):
+    """Load a case study file as a document."""
+    with open(path, "r", encoding="utf-8") as file:
+        return Document(page_content=file.read(), metadata={"source": path})
+
+def load_case_study_chunks(path):
+    """Load a case study file split into the chunks that get indexed."""
+    document = load_case_study(path)
+    return [
+        Document(page_content=chunk, metadata={"source": path, "chunk": i})
+        for i, chunk in enumerate(chunk_text(document.page_content))
+    ]
+
+def _load_manifest(manifest_path):
+    if not os.path.exists(manifest_path):
+        return {}
+    try:
+        with open(manifest_path, "r", encoding="utf-8") as file:
+            return json.load(file)
+    except (OSError, ValueError) as e:
+        print(f"[WARNING] Could not read case study index manifest, re-indexing: {e}")
+        return {}
+
+def _save_manifest(manifest, manifest_path):
+    os.makedirs(os.path.dirname(manifest_path), exist_ok=True)
+    temp_path = f"{manifest_path}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as file:
+        json.dump(manifest, file, indent=2)
+    os.replace(temp_path, manifest_path)
+
+def get_manifest_path():
+    """Each backend keeps its own manifest next to its vectors."""
+    if RAG_BACKEND == "numpy":
+        return os.path.join(NUMPY_INDEX_PATH, "manifest.json")
+    return INDEX_MANIFEST_PATH
+
+def sync_case_study_index(vectorstore):
+    """
+    Bring the vector store in line with the case studies folder.
+    Only added or changed files (by content hash) are embedded, vectors of
+    removed files are deleted. The manifest records the embedding model: when it
+    changes (or an index predates the fingerprint) every file is re-embedded
+    into an emptied store.
+
+    Returns:
+        dict: Lists of "added", "updated" and "removed" source paths
+    """
+    manifest_path = get_manifest_path()
+    stored = _load_manifest(manifest_path)
+    fingerprint = get_embeddings_fingerprint(_store_embeddings(vectorstore))
+    if stored.get("embeddings") == fingerprint:
+        manifest = stored.get("files", {})
+    else:
+        if stored:
+            print(f"[INFO] Case study index was not built with {fingerprint}, re-indexing every case study")
+        _reset_index(vectorstore)
+        manifest = {}
+    current_hashes = {
+        path: f"{INDEX_VERSION}:{compute_file_hash(path)}" for path in get_case_study_files()
+    }
+    changes = {"added": [], "updated": [], "removed": []}
+
+    for path in manifest:
+        if path not in current_hashes:
+            vectorstore.delete(where={"source": path})
+            changes["removed"].append(path)
+
+    for path, content_hash in current_hashes.items():
+        if manifest.get(path) == content_hash:
+            continue
+        # Drop any previous version of this document before adding the new one
+        vectorstore.delete(where={"source": path})
+        chunks = load_case_study_chunks(path)
+        file_hash = content_hash.split(":")[-1][:16]
+        vectorstore.add_documents(chunks, ids=[f"{path}:{file_hash}:{i}" for i in range(len(chunks))])
+        changes["updated" if path in manifest else "added"].append(path)
 
+    if any(changes.values()) or stored.get("embeddings") != fingerprint:
+        _save_manifest({"embeddings": fingerprint, "files": current_hashes}, manifest_path)
+        print(
+            f"[OK] Case study index synced: {len(changes['added'])} added, "
+            f"{len(changes['updated'])} updated, {len(changes['removed'])} removed"
+        )
+    return changes
+
+def get_vector_store():
+    """Open the configured vector store backend and sync it with the case studies folder."""
+    embeddings = get_embeddings()
+    if RAG_BACKEND == "numpy":
+        # No Chroma import needed, queries are a matrix-vector product
+        from .rag.numpy_index import NumpyVectorIndex
+        vectorstore = NumpyVectorIndex(NUMPY_INDEX_PATH, embeddings)
+    else:
+        from langchain_chroma import Chroma
+        vectorstore = Chroma(persist_directory=DATABASE_PATH, embedding_function=embeddings)
+    sync_case_study_index(vectorstore)
     return vectorstore
 
+def get_store_chunks(vectorstore):
+    """
+    Read back every indexed chunk with its embedding, without re-embedding anything.
+
+    Returns:
+        tuple: (list of chunk Documents, float32 matrix of their embeddings)
+    """
+    if RAG_BACKEND == "numpy":
+        return vectorstore.get_chunks()
+
+    stored = vectorstore.get(include=["documents", "metadatas", "embeddings"])
+    chunks = [
+        Document(page_content=content, metadata=metadata or {})
+        for content, metadata in zip(stored["documents"], stored["metadatas"])
+    ]
+    return chunks, np.asarray(stored["embeddings"], dtype=np.float32)
+
+def _build_retriever(vectorstore):
+    chunks, vectors = get_store_chunks(vectorstore)
+    return HybridRetriever(chunks, vectors, _store_embeddings(vectorstore))
+
+def get_shared_vector_store():
+    """
+    Get the process-wide vector store, creating it on first use.
+    Safe to call from several threads, the store is only built once.
+    The index is re-synced whenever the case studies folder changed since the last sync.
+    """
+    get_shared_retriever()
+    return _vector_store
+
+def get_shared_retriever():
+    """
+    Get the process-wide hybrid retriever over the shared vector store.
+    Rebuilt (from stored vectors, no embedding calls) after every index sync.
+    """
+    global _vector_store, _retriever, _indexed_signature
+    signature = get_case_studies_signature()
+    if _retriever is None or signature != _indexed_signature:
+        with _vector_store_lock:
+            if _vector_store is None:
+                _vector_store = get_vector_store()
+                _retriever = _build_retriever(_vector_store)
+                _indexed_signature = signature
+            elif _retriever is None or signature != _indexed_signature:
+                sync_case_study_index(_vector_store)
+                _retriever = _build_retriever(_vector_store)
+                _indexed_signature = signature
+    return _retriever
+
+def refresh_case_study_index():
+    """
+    Re-sync the case study index on demand (e.g. after editing `data/case_studies`).
+    """
+    global _retriever, _indexed_signature
+    vectorstore = get_shared_vector_store()
+    with _vector_store_lock:
+        changes = sync_case_study_index(vectorstore)
+        _retriever = _build_retriever(vectorstore)
+        _indexed_signature = get_case_studies_signature()
+    return changes
+
+def warm_up_vector_store():
+    """
+    Build the shared vector store ahead of the first query (call at startup).
+    Returns False if it could not be built, queries will then retry lazily.
+    """
+    try:
+        get_shared_retriever()
+        return True
+    except Exception as e:
+        print(f"[WARNING] Could not warm up case study vector store: {str(e)}")
+        return False
+
+@instrumentation.tracked("rag")
+def fetch_similar_case_studies(descriptions):
+    """
+    Fetch the most similar case study for each description.
+    All descriptions are embedded in one call and scored in one vectorized pass.
+    The text comes from the index, so no case study file is read per query.
+    """
+    retriever = get_shared_retriever()
+    matches = retriever.retrieve_batch(list(descriptions), k=1)
+    return [retriever.document(match[0][0]) if match else "" for match in matches]
+
 def fetch_similar_case_study(description):
-    """Fetch the most similar case study to the given description."""
-    vectorstore = get_vector_store()
-    vectorstore_retreiver = vectorstore.as_retriever(search_kwargs={"k": 1})
-    docs = vectorstore_retreiver.invoke(description)
-    return docs[0].page_content
\ No newline at end of file
+    """
+    Fetch the most similar case study to the given description,
+    using hybrid BM25 + vector retrieval over case study chunks.
+    """
+    return fetch_similar_case_studies([description])[0]
+
+class CaseStudyBatcher:
+    """
+    Coalesces case study lookups from concurrently processed leads.
+
+    A lookup made while no batch is running is sent right away, so sequential leads
+    pay nothing extra. Lookups submitted while a batch is running wait for it and then
+    go out together (up to `max_batch_size`): they are embedded in a single provider
+    call and scored in one matrix product, then each caller gets its own result back.
+    """
+
+    def __init__(self, max_batch_size=RAG_MAX_BATCH_SIZE):
+        self.max_batch_size = max_batch_size
+        self._pending = []
+        self._running = False
+        self._cond = threading.Condition()
+
+    def fetch(self, description):
+        """Return the most similar case study, sharing the lookup with concurrent callers."""
+        future = Future()
+        with self._cond:
+            self._pending.append((description, future))
+
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: future.done() or not self._running)
+                if future.done():
+                    break
+                # No batch running: this caller runs the queries waiting so far
+                self._running = True
+                batch = self._pending[:self.max_batch_size]
+                self._pending = self._pending[self.max_batch_size:]
+            try:
+                results = fetch_similar_case_studies([query for query, _ in batch])
+                for (_, pending_future), result in zip(batch, results):
+                    pending_future.set_result(result)
+            except Exception as e:
+                for _, pending_future in batch:
+                    pending_future.set_exception(e)
+            finally:
+                with self._cond:
+                    self._running = False
+                    self._cond.notify_all()
+
+        return future.result()
+
+case_study_batcher = CaseStudyBatcher()
+
+async def afetch_similar_case_study(description):
+    """Async version of `fetch_similar_case_study`, runs the search off the event loop."""
+    return await asyncio.to_thread(fetch_similar_case_study, description)
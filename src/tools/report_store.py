@@ -0,0 +1,177 @@
+"""
+Local report store
+Saves every lead's reports under reports/<company>/<lead>/ with atomic writes,
+optional compression and a SQLite index of lead id -> report files
+"""
+
+import os
+import re
+import gzip
+import time
+import queue
+import atexit
+import sqlite3
+import hashlib
+import threading
+
+REPORTS_DIR = os.getenv("REPORTS_DIR", "reports")
+# none, gzip or zstd (needs the zstandard package, falls back to gzip)
+REPORTS_COMPRESSION = os.getenv("REPORTS_COMPRESSION", "none").lower()
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS reports (
+    lead_id TEXT NOT NULL,
+    title TEXT NOT NULL,
+    path TEXT NOT NULL,
+    sha256 TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    saved_at REAL NOT NULL,
+    PRIMARY KEY (lead_id, title)
+);
+"""
+
+
+def _slug(text, default="unknown"):
+    """Filesystem safe name."""
+    slug = re.sub(r"[^\w.-]+", "_", str(text or "")).strip("._")
+    return slug[:80] or default
+
+
+def _compressor(compression):
+    """Return (file extension, compress function) for a compression name."""
+    if compression == "zstd":
+        try:
+            import zstandard
+            return ".zst", zstandard.ZstdCompressor().compress
+        except ImportError:
+            print("[WARNING] zstandard not installed, compressing reports with gzip instead")
+            compression = "gzip"
+    if compression == "gzip":
+        return ".gz", gzip.compress
+    return "", None
+
+
+class LocalReportStore:
+    """
+    Stores reports on disk, one folder per lead, without clobbering other leads' files.
+
+    Each report is written to a temporary file then renamed into place, so a crash
+    never leaves a half written report. Writes run on a single background thread;
+    reports whose content did not change since the last save are not rewritten.
+
+    Args:
+        root: Reports folder
+        compression: none, gzip or zstd
+    """
+
+    def __init__(self, root=REPORTS_DIR, compression=REPORTS_COMPRESSION):
+        self.root = root
+        self.extension, self._compress = _compressor(compression)
+        os.makedirs(root, exist_ok=True)
+
+        self._conn = sqlite3.connect(os.path.join(root, "index.db"), check_same_thread=False)
+        self._conn.executescript(SCHEMA)
+        self._conn.commit()
+        self._db_lock = threading.Lock()
+
+        self._queue = queue.Queue()
+        self._worker = threading.Thread(target=self._write_loop, name="report-store", daemon=True)
+        self._worker.start()
+        atexit.register(self.flush)
+
+    def save(self, lead_id, lead_name, company_name, reports):
+        """
+        Queue the reports of a lead for saving. Returns immediately.
+
+        Args:
+            lead_id: Lead the reports belong to
+            lead_name: Lead name, used in the folder name
+            company_name: Company name, used as the parent folder
+            reports: List of Report objects (empty or string entries are skipped)
+        """
+        folder = os.path.join(self.root, _slug(company_name), f"{_slug(lead_name)}_{_slug(lead_id)}")
+        for report in reports:
+            if not report or isinstance(report, str):
+                continue
+            self._queue.put((lead_id, folder, report))
+
+    def pending_count(self):
+        return self._queue.qsize()
+
+    def flush(self):
+        """Block until every queued report is written."""
+        self._queue.join()
+
+    def get_reports(self, lead_id):
+        """
+        Look up the saved reports of a lead in the index.
+
+        Returns:
+            list: Dicts with "title", "path", "sha256", "size" and "saved_at"
+        """
+        with self._db_lock:
+            rows = self._conn.execute(
+                "SELECT title, path, sha256, size, saved_at FROM reports WHERE lead_id = ? ORDER BY title",
+                (lead_id,)
+            ).fetchall()
+        return [dict(zip(("title", "path", "sha256", "size", "saved_at"), row)) for row in rows]
+
+    def load(self, lead_id, title):
+        """Return the content of a saved report, or None if there is none."""
+        with self._db_lock:
+            row = self._conn.execute(
+                "SELECT path FROM reports WHERE lead_id = ? AND title = ?", (lead_id, title)
+            ).fetchone()
+        if not row or not os.path.exists(row[0]):
+            return None
+        with open(row[0], "rb") as file:
+            data = file.read()
+        if row[0].endswith(".gz"):
+            data = gzip.decompress(data)
+        elif row[0].endswith(".zst"):
+            import zstandard
+            data = zstandard.ZstdDecompressor().decompress(data)
+        return data.decode("utf-8")
+
+    def _write_loop(self):
+        while True:
+            lead_id, folder, report = self._queue.get()
+            try:
+                self._write_report(lead_id, folder, report)
+            except Exception as e:
+                print(f"[ERROR] Failed to save report '{report.title}' locally: {e}")
+            finally:
+                self._queue.task_done()
+
+    def _write_report(self, lead_id, folder, report):
+        title = str(report.title or "Unknown_Report")
+        data = report.content.encode("utf-8")
+        content_hash = hashlib.sha256(data).hexdigest()
+
+        with self._db_lock:
+            row = self._conn.execute(
+                "SELECT path, sha256 FROM reports WHERE lead_id = ? AND title = ?", (lead_id, title)
+            ).fetchone()
+        if row and row[1] == content_hash and os.path.exists(row[0]):
+            return
+
+        os.makedirs(folder, exist_ok=True)
+        extension = ".md" if report.is_markdown else ".txt"
+        path = os.path.join(folder, f"{_slug(title, 'Unknown_Report')}{extension}{self.extension}")
+        if self._compress:
+            data = self._compress(data)
+
+        temp_path = f"{path}.tmp"
+        with open(temp_path, "wb") as file:
+            file.write(data)
+        os.replace(temp_path, path)
+
+        with self._db_lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO reports (lead_id, title, path, sha256, size, saved_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (lead_id, title, path, content_hash, len(data), time.time())
+            )
+            self._conn.commit()
+        # A report saved earlier with another compression setting is now stale
+        if row and row[0] != path and os.path.exists(row[0]):
+            os.remove(row[0])
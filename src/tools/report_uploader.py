@@ -0,0 +1,320 @@
+"""
+Background Google Docs report uploader
+Durable SQLite queue of (lead, report) upload jobs processed by worker threads
+"""
+
+import os
+import time
+import atexit
+import sqlite3
+import threading
+from src.instrumentation import instrumentation
+
+REPORT_UPLOADS_DB = os.getenv("REPORT_UPLOADS_DB", "report_uploads.db")
+# Placeholder docs/folders kept ready so shareable links can be handed out without Drive I/O
+PLACEHOLDER_POOL_SIZE = 4
+MAX_UPLOAD_ATTEMPTS = 5
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS upload_jobs (
+    job_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind TEXT NOT NULL,                       -- document, folder (rename a reserved folder)
+    lead_id TEXT,
+    folder_name TEXT NOT NULL,
+    title TEXT,
+    content TEXT,
+    markdown INTEGER NOT NULL DEFAULT 0,
+    file_id TEXT,                             -- reserved placeholder to fill, NULL to create a new doc
+    status TEXT NOT NULL DEFAULT 'pending',   -- pending, in_progress, done, failed
+    attempts INTEGER NOT NULL DEFAULT 0,
+    last_error TEXT,
+    next_attempt_at REAL NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_upload_jobs_status ON upload_jobs(status, next_attempt_at);
+
+CREATE TABLE IF NOT EXISTS placeholders (
+    file_id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    link TEXT
+);
+
+CREATE TABLE IF NOT EXISTS folders (
+    folder_name TEXT PRIMARY KEY,
+    folder_id TEXT NOT NULL,
+    link TEXT
+);
+"""
+
+
+class ReportUploader:
+    """
+    Uploads reports to Google Docs in the background.
+
+    Jobs are persisted in SQLite before being acknowledged, so uploads left
+    pending when the process stops resume on the next start. Worker threads
+    upload in parallel and retry failures with exponential backoff.
+
+    Links that must be known before the upload (e.g. the outreach report link
+    used in the email) come from a pool of pre-created shareable placeholder
+    docs and folders, filled in place by the upload job.
+    """
+
+    def __init__(self, docs_manager, db_path=REPORT_UPLOADS_DB, workers=3, pool_size=PLACEHOLDER_POOL_SIZE):
+        self.docs_manager = docs_manager
+        self.db_path = db_path
+        self.workers = workers
+        self.pool_size = pool_size
+
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.executescript(SCHEMA)
+        self._conn.commit()
+        self._db_lock = threading.Lock()
+        self._jobs_available = threading.Event()
+        self._refill_needed = threading.Event()
+        self._stopping = threading.Event()
+        self._threads = []
+
+    def start(self):
+        """Start worker threads, resuming jobs interrupted by a previous run."""
+        with self._db_lock:
+            self._conn.execute("UPDATE upload_jobs SET status = 'pending' WHERE status = 'in_progress'")
+            self._conn.commit()
+
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._worker_loop, name=f"report-upload-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        refill_thread = threading.Thread(target=self._refill_loop, name="report-upload-pool", daemon=True)
+        refill_thread.start()
+        self._threads.append(refill_thread)
+
+        self._jobs_available.set()
+        self._refill_needed.set()
+        atexit.register(self.stop)
+
+    def stop(self, timeout=60):
+        """Wait (up to `timeout` seconds) for queued uploads, then stop the workers."""
+        self.drain(timeout)
+        self._stopping.set()
+        self._jobs_available.set()
+        self._refill_needed.set()
+
+    def drain(self, timeout=None):
+        """Block until no upload is pending. Returns False on timeout."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self.pending_count() > 0:
+            if deadline is not None and time.monotonic() > deadline:
+                print(f"[WARNING] {self.pending_count()} report uploads still pending, they will resume on next start")
+                return False
+            time.sleep(0.2)
+        return True
+
+    def pending_count(self):
+        with self._db_lock:
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM upload_jobs WHERE status IN ('pending', 'in_progress')"
+            ).fetchone()[0]
+
+    def enqueue_report(self, lead_id, folder_name, title, content, markdown=False, file_id=None):
+        """
+        Queue one report upload. Returns as soon as the job is persisted.
+
+        Args:
+            lead_id: Lead the report belongs to
+            folder_name: Drive folder to save the report in
+            title: Document title
+            content: Report content
+            markdown: Whether the content is Markdown
+            file_id: Reserved placeholder doc to fill, from `reserve_document`
+        """
+        self._insert_job("document", lead_id, folder_name, title, content, markdown, file_id)
+
+    def reserve_document(self, folder_name, title, folder_shareable=True):
+        """
+        Reserve a shareable Google Doc and its folder before the content exists.
+        Reuses the document uploaded earlier under the same title, otherwise it is
+        served from the placeholder pool, so it normally costs no Drive call.
+
+        Returns:
+            dict: "file_id", "document_url", "shareable_url", "folder_url", or None on failure
+        """
+        folder = self._reserve_folder(folder_name, folder_shareable)
+        if not folder or not folder[0]:
+            return None
+        document = self.docs_manager.find_document(folder[0], title) or self._take_placeholder("document")
+        if not document:
+            return None
+        return {
+            "file_id": document["id"],
+            "document_url": f"https://docs.google.com/document/d/{document['id']}",
+            "shareable_url": document["link"],
+            "folder_url": folder[1]
+        }
+
+    def _insert_job(self, kind, lead_id, folder_name, title=None, content=None, markdown=False, file_id=None):
+        with self._db_lock:
+            self._conn.execute(
+                """
+                INSERT INTO upload_jobs (kind, lead_id, folder_name, title, content, markdown, file_id, created_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                (kind, lead_id, folder_name, title, content, int(markdown), file_id, time.time())
+            )
+            self._conn.commit()
+        self._jobs_available.set()
+
+    def _lookup_folder(self, folder_name):
+        cached = self.docs_manager.get_cached_folder(folder_name)
+        if cached:
+            return cached
+        with self._db_lock:
+            row = self._conn.execute(
+                "SELECT folder_id, link FROM folders WHERE folder_name = ?", (folder_name,)
+            ).fetchone()
+        if row:
+            self.docs_manager.remember_folder(folder_name, row[0], row[1])
+        return row
+
+    def _reserve_folder(self, folder_name, shareable):
+        folder = self._lookup_folder(folder_name)
+        if folder:
+            return folder
+        if not shareable:
+            return self.docs_manager.get_or_create_folder(folder_name)
+
+        # The queue DB may be new while Drive already has the folder: reuse it, like get_or_create_folder
+        try:
+            existing = self.docs_manager.find_folder(folder_name)
+        except Exception as e:
+            print(f"[WARNING] Could not look up folder '{folder_name}' in Drive: {e}")
+            return None
+        if existing:
+            folder = self.docs_manager.get_or_create_folder(folder_name, make_shareable=True)
+            if folder[0]:
+                self._save_folder(folder_name, *folder)
+            return folder
+
+        placeholder = self._take_placeholder("folder")
+        if not placeholder:
+            return None
+        self._save_folder(folder_name, placeholder["id"], placeholder["link"])
+        self.docs_manager.remember_folder(folder_name, placeholder["id"], placeholder["link"], shared=True)
+        # Give the placeholder folder its real name in the background
+        self._insert_job("folder", None, folder_name, file_id=placeholder["id"])
+        return placeholder["id"], placeholder["link"]
+
+    def _save_folder(self, folder_name, folder_id, link):
+        with self._db_lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO folders (folder_name, folder_id, link) VALUES (?, ?, ?)",
+                (folder_name, folder_id, link)
+            )
+            self._conn.commit()
+
+    def _take_placeholder(self, kind):
+        with self._db_lock:
+            row = self._conn.execute(
+                "SELECT file_id, link FROM placeholders WHERE kind = ? LIMIT 1", (kind,)
+            ).fetchone()
+            if row:
+                self._conn.execute("DELETE FROM placeholders WHERE file_id = ?", (row[0],))
+                self._conn.commit()
+        self._refill_needed.set()
+        if row:
+            return {"id": row[0], "link": row[1]}
+        # Pool is empty, create one now
+        return self.docs_manager.create_placeholder(kind, shareable=True)
+
+    def _refill_loop(self):
+        while not self._stopping.is_set():
+            self._refill_needed.wait(60)
+            self._refill_needed.clear()
+            if self._stopping.is_set():
+                return
+            for kind in ("document", "folder"):
+                with self._db_lock:
+                    available = self._conn.execute(
+                        "SELECT COUNT(*) FROM placeholders WHERE kind = ?", (kind,)
+                    ).fetchone()[0]
+                for _ in range(self.pool_size - available):
+                    placeholder = self.docs_manager.create_placeholder(kind, shareable=True)
+                    if not placeholder:
+                        break
+                    with self._db_lock:
+                        self._conn.execute(
+                            "INSERT INTO placeholders (file_id, kind, link) VALUES (?, ?, ?)",
+                            (placeholder["id"], kind, placeholder["link"])
+                        )
+                        self._conn.commit()
+
+    def _claim_job(self):
+        with self._db_lock:
+            row = self._conn.execute(
+                """
+                SELECT job_id, kind, lead_id, folder_name, title, content, markdown, file_id, attempts
+                FROM upload_jobs
+                WHERE status = 'pending' AND next_attempt_at <= ?
+                ORDER BY job_id LIMIT 1
+                """,
+                (time.time(),)
+            ).fetchone()
+            if row:
+                self._conn.execute("UPDATE upload_jobs SET status = 'in_progress' WHERE job_id = ?", (row[0],))
+                self._conn.commit()
+        if not row:
+            return None
+        keys = ("job_id", "kind", "lead_id", "folder_name", "title", "content", "markdown", "file_id", "attempts")
+        return dict(zip(keys, row))
+
+    def _worker_loop(self):
+        while not self._stopping.is_set():
+            job = self._claim_job()
+            if not job:
+                self._jobs_available.wait(1)
+                self._jobs_available.clear()
+                continue
+            try:
+                self._run_job(job)
+                self._finish_job(job["job_id"])
+            except Exception as e:
+                self._retry_job(job, e)
+
+    def _run_job(self, job):
+        if job["kind"] == "folder":
+            self.docs_manager.rename_file(job["file_id"], job["folder_name"])
+            return
+
+        folder = self._lookup_folder(job["folder_name"])
+        folder_id = folder[0] if folder else self.docs_manager.get_or_create_folder(job["folder_name"])[0]
+        if not folder_id:
+            raise RuntimeError(f"Failed to get or create folder '{job['folder_name']}'")
+
+        if not self.docs_manager.sync_document(
+            job["content"], job["title"], folder_id, markdown=bool(job["markdown"]), doc_id=job["file_id"]
+        ):
+            raise RuntimeError(f"Failed to upload '{job['title']}'")
+
+    def _finish_job(self, job_id):
+        with self._db_lock:
+            # Content is no longer needed once uploaded
+            self._conn.execute(
+                "UPDATE upload_jobs SET status = 'done', content = NULL WHERE job_id = ?", (job_id,)
+            )
+            self._conn.commit()
+
+    def _retry_job(self, job, error):
+        attempts = job["attempts"] + 1
+        status = "failed" if attempts >= MAX_UPLOAD_ATTEMPTS else "pending"
+        instrumentation.record_retry("google_docs")
+        with self._db_lock:
+            self._conn.execute(
+                """
+                UPDATE upload_jobs
+                SET status = ?, attempts = ?, last_error = ?, next_attempt_at = ?
+                WHERE job_id = ?
+                """,
+                (status, attempts, str(error), time.time() + 2 ** attempts, job["job_id"])
+            )
+            self._conn.commit()
+        print(f"[WARNING] Upload of '{job['title'] or job['folder_name']}' failed (attempt {attempts}): {error}")
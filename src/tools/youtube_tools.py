@@ -1,9 +1,45 @@
-import re, os
+import re, os, json
+import threading
+import httplib2
 import googleapiclient.discovery
+from src.instrumentation import instrumentation
+
+# Per-channel stats cache, repeat runs only fetch videos uploaded since the last sync
+YOUTUBE_CACHE_FILE = os.getenv("YOUTUBE_CACHE_FILE", "youtube_cache.json")
+# Number of most recent videos whose statistics are refreshed on every run (one videos.list call)
+YOUTUBE_STATS_REFRESH_COUNT = 50
+
+_youtube_client = None
+_youtube_client_lock = threading.Lock()
+_cache_lock = threading.Lock()
+# httplib2 is not thread safe: requests of each thread go through its own connection
+_thread_local = threading.local()
+
+
+def get_youtube_client():
+    """
+    Get the shared YouTube Data API client, built once per process.
+    Its requests must be executed with `http=_http()`, never on the client's own connection.
+    """
+    global _youtube_client
+    with _youtube_client_lock:
+        if _youtube_client is None:
+            _youtube_client = googleapiclient.discovery.build(
+                "youtube", "v3", developerKey=os.getenv("YOUTUBE_API_KEY"), cache_discovery=False
+            )
+        return _youtube_client
+
+def _http():
+    """The calling thread's HTTP connection, passed to every request's execute()."""
+    http = getattr(_thread_local, "http", None)
+    if http is None:
+        http = httplib2.Http()
+        _thread_local.http = http
+    return http
 
 def extract_channel_name(url):
     # Regular expression to extract the channel name after '@'
-    match = re.search(r"@([a-zA-Z0-9_]+)", url)
+    match = re.search(r"@([a-zA-Z0-9_.-]+)", url)
     if match:
         return match.group(1)
     else:
@@ -11,100 +47,152 @@ def extract_channel_name(url):
 
 def get_channel_id_by_name(channel_name):
     """
-    Get the channel ID from the channel name.
+    Get the channel ID from the channel handle (1 quota unit).
+    Falls back to a channel search (100 quota units) for legacy names without a handle.
     """
-    youtube = googleapiclient.discovery.build("youtube", "v3", developerKey=os.getenv("YOUTUBE_API_KEY"))
-    request = youtube.search().list(
+    youtube = get_youtube_client()
+    response = youtube.channels().list(
+        part="id",
+        forHandle=f"@{channel_name}"
+    ).execute(http=_http())
+    if response.get("items"):
+        return response["items"][0]["id"]
+
+    response = youtube.search().list(
         part="snippet",
         q=channel_name,
         type="channel",
         maxResults=1
-    )
-    response = request.execute()
+    ).execute(http=_http())
     if response["items"]:
         return response["items"][0]["id"]["channelId"]
     else:
         raise ValueError(f"No channel found with the name: {channel_name}")
 
-def get_channel_videos_stats(channel_id):
+def _load_channel_cache(channel_id):
+    with _cache_lock:
+        if not os.path.exists(YOUTUBE_CACHE_FILE):
+            return {}
+        try:
+            with open(YOUTUBE_CACHE_FILE, "r", encoding="utf-8") as file:
+                return json.load(file).get(channel_id, {})
+        except (OSError, ValueError) as e:
+            print(f"[WARNING] Could not read YouTube cache: {e}")
+            return {}
+
+def _save_channel_cache(channel_id, channel_cache):
+    with _cache_lock:
+        cache = {}
+        if os.path.exists(YOUTUBE_CACHE_FILE):
+            try:
+                with open(YOUTUBE_CACHE_FILE, "r", encoding="utf-8") as file:
+                    cache = json.load(file)
+            except (OSError, ValueError):
+                cache = {}
+        cache[channel_id] = channel_cache
+        temp_path = f"{YOUTUBE_CACHE_FILE}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as file:
+            json.dump(cache, file)
+        os.replace(temp_path, YOUTUBE_CACHE_FILE)
+
+def _fetch_new_uploads(youtube, uploads_playlist_id, known_video_ids):
     """
-    Get total videos count, details of the last 15 videos, 
-    and average views and likes for all videos.
+    Walk the uploads playlist (newest first, 1 quota unit per page of 50)
+    until reaching a video that is already cached.
     """
-    youtube = googleapiclient.discovery.build("youtube", "v3", developerKey=os.getenv("YOUTUBE_API_KEY"))
-    
-    # Fetch channel statistics for the total video count
-    channel_request = youtube.channels().list(
-        part="statistics",
-        id=channel_id
-    )
-    channel_response = channel_request.execute()
-    total_videos = int(channel_response["items"][0]["statistics"]["videoCount"])
-    subscriber_count = int(channel_response["items"][0]["statistics"]["subscriberCount"])
-
-    # Fetch the last 15 videos
-    video_ids = []
-    videos_request = youtube.search().list(
-        part="id,snippet",
-        channelId=channel_id,
-        maxResults=15,
-        order="date"  # Sort by date to get the latest videos
-    )
-    videos_response = videos_request.execute()
-
-    videos_data = []
-    for item in videos_response["items"]:
-        if item["id"]["kind"] == "youtube#video":
-            video_ids.append(item["id"]["videoId"])
-            videos_data.append({
-                "title": item["snippet"]["title"],
-                "description": item["snippet"]["description"],
-                "published_at": item["snippet"]["publishedAt"],
-            })
-
-    # Fetch statistics (views, likes, etc.) for all videos
-    all_video_ids = []
+    new_videos = []
     page_token = None
     while True:
-        search_request = youtube.search().list(
-            part="id",
-            channelId=channel_id,
+        response = youtube.playlistItems().list(
+            part="snippet,contentDetails",
+            playlistId=uploads_playlist_id,
             maxResults=50,
             pageToken=page_token
-        )
-        search_response = search_request.execute()
+        ).execute(http=_http())
 
-        all_video_ids += [
-            item["id"]["videoId"]
-            for item in search_response["items"]
-            if item["id"]["kind"] == "youtube#video"
-        ]
+        for item in response["items"]:
+            video_id = item["contentDetails"]["videoId"]
+            if video_id in known_video_ids:
+                return new_videos
+            new_videos.append({
+                "id": video_id,
+                "title": item["snippet"]["title"],
+                "description": item["snippet"]["description"],
+                "published_at": item["contentDetails"].get("videoPublishedAt", item["snippet"]["publishedAt"]),
+            })
 
         # Check for more pages
-        page_token = search_response.get("nextPageToken")
+        page_token = response.get("nextPageToken")
         if not page_token:
-            break
-
-    # Divide video IDs into chunks of 50 (API limit)
-    video_chunks = [all_video_ids[i:i + 50] for i in range(0, len(all_video_ids), 50)]
-    total_views, total_likes, stats_count = 0, 0, 0
+            return new_videos
 
-    for chunk in video_chunks:
-        stats_request = youtube.videos().list(
+def _fetch_videos_statistics(youtube, video_ids):
+    """
+    Fetch views and likes for the given videos in batches of 50 ids (1 quota unit per batch).
+    """
+    stats = {}
+    for i in range(0, len(video_ids), 50):
+        response = youtube.videos().list(
             part="statistics",
-            id=",".join(chunk)
-        )
-        stats_response = stats_request.execute()
+            id=",".join(video_ids[i:i + 50])
+        ).execute(http=_http())
+        for item in response["items"]:
+            statistics = item["statistics"]
+            stats[item["id"]] = {
+                "views": int(statistics.get("viewCount", 0)),
+                "likes": int(statistics.get("likeCount", 0)),
+            }
+    return stats
 
-        for item in stats_response["items"]:
-            stats = item["statistics"]
-            total_views += int(stats.get("viewCount", 0))
-            total_likes += int(stats.get("likeCount", 0))
-            stats_count += 1
+def get_channel_videos_stats(channel_id):
+    """
+    Get total videos count, details of the last 15 videos,
+    and average views and likes for all videos.
+
+    Per-video statistics are cached per channel: only videos uploaded since the
+    last sync are listed, and only the most recent videos get their counts refreshed.
+    """
+    youtube = get_youtube_client()
+
+    # Fetch channel statistics and the uploads playlist id in one call
+    channel_response = youtube.channels().list(
+        part="statistics,contentDetails",
+        id=channel_id
+    ).execute(http=_http())
+    channel = channel_response["items"][0]
+    total_videos = int(channel["statistics"]["videoCount"])
+    subscriber_count = int(channel["statistics"].get("subscriberCount", 0))
+    uploads_playlist_id = channel["contentDetails"]["relatedPlaylists"]["uploads"]
+
+    # Only fetch uploads newer than the last sync
+    channel_cache = _load_channel_cache(channel_id)
+    cached_videos = channel_cache.get("videos", [])
+    new_videos = _fetch_new_uploads(youtube, uploads_playlist_id, {video["id"] for video in cached_videos})
+
+    # Uploads playlist is ordered newest first
+    videos = new_videos + cached_videos
+
+    # Fetch stats for new videos, and refresh the most recent ones whose counts still move
+    refresh_ids = [video["id"] for video in videos[:max(len(new_videos), YOUTUBE_STATS_REFRESH_COUNT)]]
+    fresh_stats = _fetch_videos_statistics(youtube, refresh_ids)
+    for video in videos[:len(refresh_ids)]:
+        video.update(fresh_stats.get(video["id"], {"views": video.get("views", 0), "likes": video.get("likes", 0)}))
+    if refresh_ids or not channel_cache:
+        _save_channel_cache(channel_id, {"videos": videos})
+
+    videos_data = [
+        {
+            "title": video["title"],
+            "description": video["description"],
+            "published_at": video["published_at"],
+        }
+        for video in videos[:15]
+    ]
 
     # Calculate averages
-    avg_views = total_views / stats_count if stats_count > 0 else 0
-    avg_likes = total_likes / stats_count if stats_count > 0 else 0
+    stats_count = len(videos)
+    avg_views = sum(video["views"] for video in videos) / stats_count if stats_count > 0 else 0
+    avg_likes = sum(video["likes"] for video in videos) / stats_count if stats_count > 0 else 0
 
     return {
         "total_videos": total_videos,
@@ -113,7 +201,8 @@ def get_channel_videos_stats(channel_id):
         "average_views": avg_views,
         "average_likes": avg_likes
     }
-    
+
+@instrumentation.tracked("youtube")
 def get_youtube_stats(channel_url):
     channel_name = extract_channel_name(channel_url)
     channel_id = get_channel_id_by_name(channel_name)
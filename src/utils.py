@@ -5,6 +5,7 @@ from langchain_core.output_parsers import StrOutputParser
 from google_auth_oauthlib.flow import InstalledAppFlow
 from google.auth.transport.requests import Request
 from google.oauth2.credentials import Credentials
+from .instrumentation import instrumentation, LLMUsageCallback
 
 # Set the scopes for Google API
 SCOPES = [
@@ -73,33 +74,6 @@ def get_report(reports, report_name: str):
             return report.content
     return ""
 
-def save_reports_locally(reports):
-    # Define the local folder path
-    reports_folder = "reports"
-
-    # Create folder if it does not exist
-    if not os.path.exists(reports_folder):
-        os.makedirs(reports_folder)
-
-    # Save each report as a file in the folder
-    for report in reports:
-        # Skip empty strings or invalid report objects
-        if not report or isinstance(report, str):
-            continue
-
-        # Ensure title is a string (not a method)
-        title = str(report.title) if hasattr(report, 'title') else "Unknown_Report"
-        # Call title() if it's a method
-        if callable(title):
-            title = "Unknown_Report"
-
-        # Sanitize filename
-        title = title.replace('/', '_').replace('\\', '_').replace(':', '_')
-
-        file_path = os.path.join(reports_folder, f"{title}.txt")
-        with open(file_path, "w", encoding="utf-8") as file:
-            file.write(report.content)
-
 def get_llm_by_provider(llm_provider, model):
     # Else find provider
     if llm_provider == "openai":
@@ -154,7 +128,12 @@ def invoke_llm(
     else: # Esle use parse string output
         llm = llm | StrOutputParser()
 
-    # Invoke LLM
-    output = llm.invoke(messages)
+    # Invoke LLM, recording latency, token usage and estimated cost
+    with instrumentation.track(llm_provider, model) as call:
+        output = llm.invoke(messages, config={"callbacks": [LLMUsageCallback(call)]})
+        if not call["tokens_reported"]:
+            # Provider did not report usage, estimate ~4 characters per token
+            call["input_tokens"] = (len(system_prompt) + len(user_message)) // 4
+            call["output_tokens"] = len(str(output)) // 4
 
     return output
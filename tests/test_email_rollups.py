@@ -0,0 +1,95 @@
+"""
+Daily email rollups: rebuilding them from email_sends must give the same totals
+as the incremental updates made by the send logger and the webhook ingestion.
+
+Uses the database in TEST_DATABASE_URL, or a throwaway embedded Postgres
+(pip install pgserver). Never point it at a production database: tables are truncated.
+"""
+
+import os
+import tempfile
+from datetime import datetime, timedelta
+import pytest
+
+pytest.importorskip("psycopg2")
+
+
+@pytest.fixture(scope="module")
+def database():
+    database_url = os.getenv("TEST_DATABASE_URL")
+    server = None
+    if not database_url:
+        pgserver = pytest.importorskip("pgserver")
+        server = pgserver.get_server(tempfile.mkdtemp(prefix="rollups-test-"), cleanup_mode="stop")
+        database_url = server.get_uri()
+
+    from src.tools.email import db
+    from src.tools.email.schema import apply_migrations
+    from benchmarks.webhook_benchmark import BENCHMARK_SCHEMA
+
+    db.get_db_pool(database_url)
+    with db.db_connection() as conn, conn.cursor() as cur:
+        cur.execute(BENCHMARK_SCHEMA)
+    apply_migrations()
+    with db.db_connection() as conn, conn.cursor() as cur:
+        cur.execute("TRUNCATE email_events, email_sends, email_stats_daily, leads CASCADE")
+    yield db
+    db.close_db_pool()
+    if server is not None:
+        server.cleanup()
+
+
+def read_rollups(db):
+    with db.db_connection() as conn, conn.cursor() as cur:
+        cur.execute("""
+            SELECT day, campaign, sent, delivered, opened, clicked, replied, bounced
+            FROM email_stats_daily
+            WHERE sent + delivered + opened + clicked + replied + bounced > 0
+            ORDER BY day, campaign
+        """)
+        return cur.fetchall()
+
+
+def test_rebuild_matches_incremental_totals(database):
+    from src.api.event_ingestion import BrevoEventBuffer
+    from src.tools.email.rollups import rebuild_rollups
+    from src.tools.email.send_log import EmailSendLogger
+
+    sent_at = datetime(2026, 3, 2, 23, 30)
+    logger = EmailSendLogger()
+    sends = [
+        dict(lead_id=f"lead-{i}", lead_email=f"lead{i}@example.com", subject="Hi", body_html="<p>Hi</p>",
+             tracking_token=f"token-{i}", brevo_message_id=f"<msg-{i}@brevo>", status="sent",
+             sent_at=sent_at, campaign="spring" if i % 2 else None)
+        for i in range(6)
+    ]
+    logger.log_many(sends, sync=True)
+
+    def ts(days, hours=0):
+        return (sent_at + timedelta(days=days, hours=hours)).timestamp()
+
+    events = [
+        {"event": "delivered", "message-id": "<msg-0@brevo>", "ts": ts(0, 1)},
+        {"event": "delivered", "message-id": "<msg-1@brevo>", "ts": ts(1)},
+        {"event": "opened", "message-id": "<msg-1@brevo>", "ts": ts(2)},
+        {"event": "opened", "message-id": "<msg-1@brevo>", "ts": ts(3)},
+        {"event": "click", "message-id": "<msg-1@brevo>", "ts": ts(3)},
+        # Bounces land days after the send
+        {"event": "soft_bounce", "message-id": "<msg-2@brevo>", "ts": ts(1)},
+        {"event": "hard_bounce", "message-id": "<msg-3@brevo>", "ts": ts(4)},
+        {"event": "spam", "message-id": "<msg-4@brevo>", "ts": ts(2)},
+        {"event": "blocked", "message-id": "<msg-4@brevo>", "ts": ts(2, 1)},
+    ]
+    # A second bounce of the same send, in a later flush, is not counted again
+    late_events = [{"event": "hard_bounce", "message-id": "<msg-2@brevo>", "ts": ts(5)}]
+
+    buffer = BrevoEventBuffer()
+    buffer.add_many(events)
+    assert buffer.flush() == len(events)
+    buffer.add_many(late_events)
+    assert buffer.flush() == len(late_events)
+
+    incremental = read_rollups(database)
+    assert sum(row[7] for row in incremental) == 3
+    rebuild_rollups()
+    assert read_rollups(database) == incremental
@@ -0,0 +1,58 @@
+"""
+Minimal Google Docs edits: applying the batchUpdate requests to the old text
+must give the new text, without touching the document's final newline.
+"""
+
+import pytest
+
+pytest.importorskip("googleapiclient")
+pytest.importorskip("google_auth_httplib2")
+
+from src.tools.google_docs_tools import _minimal_edit_requests, _utf16_len
+
+
+def apply_requests(text, requests):
+    """Apply deleteContentRange/insertText requests like Docs does (body starts at index 1)."""
+    units = text.encode("utf-16-le")
+    for request in requests:
+        if "deleteContentRange" in request:
+            span = request["deleteContentRange"]["range"]
+            start, end = span["startIndex"], span["endIndex"]
+            # The final newline (segment end) can't be deleted
+            assert 1 <= start < end <= _utf16_len(text)
+            units = units[:2 * (start - 1)] + units[2 * (end - 1):]
+        else:
+            index = request["insertText"]["location"]["index"]
+            # Inserting at the segment end index is rejected
+            assert 1 <= index <= len(units) // 2
+            inserted = request["insertText"]["text"].encode("utf-16-le")
+            units = units[:2 * (index - 1)] + inserted + units[2 * (index - 1):]
+        text = units.decode("utf-16-le")
+    return text
+
+
+@pytest.mark.parametrize("old, new", [
+    ("ab\n", "ab\ncd\n"),                 # append
+    ("ab\ncd\n", "ab\n"),                 # truncate
+    ("ab\n", "ab\n\n"),                   # append a blank line
+    ("\n", "hello\n"),                    # empty document
+    ("hello\n", "\n"),                    # clear the document
+    ("one two three\n", "one 2 three\n"), # edit in the middle
+    ("café 👋\nend\n", "café 👋\nend\nmore\n"),  # indexes count UTF-16 units
+])
+def test_requests_turn_old_text_into_new_text(old, new):
+    assert apply_requests(old, _minimal_edit_requests(old, new)) == new
+
+
+def test_append_inserts_before_final_newline():
+    requests = _minimal_edit_requests("ab\n", "ab\ncd\n")
+    assert requests == [{"insertText": {"location": {"index": 3}, "text": "\ncd"}}]
+
+
+def test_truncate_keeps_final_newline():
+    requests = _minimal_edit_requests("ab\ncd\n", "ab\n")
+    assert requests == [{"deleteContentRange": {"range": {"startIndex": 3, "endIndex": 6}}}]
+
+
+def test_unchanged_text_needs_no_requests():
+    assert _minimal_edit_requests("same\n", "same\n") == []